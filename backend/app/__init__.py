@@ -3,36 +3,55 @@ from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from app.config import Config
+from app import bandwidth, causal, cli, compression, metrics, profiling, storage
+from app.logging_config import init_logging
+from app.models.mongo_models import mongo
 from app.models.mysql_user import db
-from app.models.mongo_models import mongo  # ← Importiere mongo
+from app.services import recommender, event_buffer, rollups, file_gc, change_feed
 
 # Importiere Blueprints
 from app.routes.auth_routes import auth_bp
 from app.routes.song_routes import song_bp
 from app.routes.playlist_routes import playlist_bp
 from app.routes.favorite_routes import favorite_bp
+from app.routes.event_routes import event_bp
+from app.routes.stats_routes import stats_bp
+from app.routes.sync_routes import sync_bp
 
-def create_app():
+def create_app(config_object=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_object)
+    init_logging(app)
 
     # Init Extensions
     db.init_app(app)
-    CORS(app)
+    mongo.init_app(app)
+    storage.init_app(app)
+    causal.init_app(app)
+    # Browser dürfen den Causal-Token nur lesen, wenn er freigegeben ist
+    CORS(app, expose_headers=[causal.CAUSAL_HEADER])
     JWTManager(app)
+    metrics.init_app(app)
+    profiling.init_app(app)
+    compression.init_app(app)
+    bandwidth.init_app(app)
+    recommender.init_app(app)
+    event_buffer.init_app(app)
+    rollups.init_app(app)
+    file_gc.init_app(app)
+    change_feed.init_app(app)
+    cli.init_app(app)
 
-    # MongoDB verbinden (im App-Kontext!)
-    with app.app_context():
-        mongo.connect()
+    # Datenbankverbindungen entstehen erst beim ersten Zugriff im jeweiligen
+    # (Worker-)Prozess; Tabellen und Indizes legt `flask init-db` an
 
     # Blueprints registrieren
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(song_bp, url_prefix='/songs')
     app.register_blueprint(playlist_bp, url_prefix='/playlists')
     app.register_blueprint(favorite_bp, url_prefix='/favorites')
-
-    # MySQL Tabellen erstellen
-    with app.app_context():
-        db.create_all()
+    app.register_blueprint(event_bp, url_prefix='/events')
+    app.register_blueprint(stats_bp, url_prefix='/stats')
+    app.register_blueprint(sync_bp, url_prefix='/sync')
 
     return app
\ No newline at end of file
@@ -0,0 +1,244 @@
+# Bandbreitenbegrenzung für Streams und Downloads per Token Bucket, je
+# User und Route (bw:<route>:<user_id>). Der Body wird nach jedem Block
+# "bezahlt": Ein Bucket darf ins Minus gehen, der Worker schläft dann, bis
+# die Schuld abgetragen ist. Parallele Downloads eines Users teilen sich so
+# automatisch dessen Rate.
+#
+# Vorrang fürs Abspielen: Mit BANDWIDTH_UPLINK_RATE gibt es zusätzlich einen
+# gemeinsamen Uplink-Bucket. Streams buchen dort ab, ohne zu warten;
+# Downloads warten, bis wieder Kapazität frei ist, und bekommen damit nur,
+# was die Streams übrig lassen.
+#
+# Das Warten belegt einen Worker-Thread. Damit gebremste Downloads nicht
+# alle Threads belegen und das Abspielen aushungern, sind sie pro Worker
+# und pro User (im Worker) begrenzt; darüber gibt es 429.
+#
+# Der Zustand gilt für alle Worker: in Redis (BANDWIDTH_REDIS_URL), sonst in
+# kleinen Dateien unter BANDWIDTH_STATE_DIR mit flock (alle Worker eines
+# Hosts). Begrenzte Antworten gehen nicht über sendfile. Bei
+# X-Accel-Redirect begrenzt nginx selbst (X-Accel-Limit-Rate, pro
+# Verbindung); signierte Redirects und X-Sendfile bleiben unbegrenzt.
+import collections
+import fcntl
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+
+from flask import current_app, jsonify
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+SHAPE_CHUNK = 64 * 1024  # Bytes pro Abbuchung (begrenzt die Redis-Roundtrips)
+BUCKET_TTL = 3600
+UPLINK_KEY = 'bw:uplink'
+REDIS_RETRY_AFTER = 10  # Sekunden ohne Redis nach einem Fehler
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: Bucket; ARGV: Menge, Rate, Burst, jetzt, TTL. Liefert den neuen
+# Stand als String (Redis würde Lua-Zahlen auf Integer kürzen)
+RESERVE_SCRIPT = '''
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local amount, rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.max(-burst, math.min(burst, tokens + math.max(0, now - ts) * rate) - amount)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[5]))
+return tostring(tokens)
+'''
+
+
+def refill(tokens, ts, amount, rate, burst, now):
+    # Schulden höchstens bis -burst, damit ein Bucket nicht beliebig lange sperrt
+    return max(-burst, min(burst, tokens + max(0.0, now - ts) * rate) - amount)
+
+
+class FileBuckets:
+    # Eine Datei pro Bucket (tokens, ts), gesperrt per flock: gemeinsam für
+    # alle Worker eines Hosts, ohne zusätzlichen Server
+    RECORD = struct.Struct('dd')
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        # user_id ist Client-Eingabe (JWT): nicht direkt als Dateiname
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def reserve(self, key, amount, rate, burst):
+        """Bucket belasten und den neuen Stand liefern (negativ = Schuld)."""
+        fd = os.open(self._path(key), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            raw = os.pread(fd, self.RECORD.size, 0)
+            tokens, ts = self.RECORD.unpack(raw) if len(raw) == self.RECORD.size else (burst, now)
+            tokens = refill(tokens, ts, amount, rate, burst, now)
+            os.pwrite(fd, self.RECORD.pack(tokens, now), 0)
+        finally:
+            os.close(fd)  # gibt auch die Sperre frei
+        return tokens
+
+
+class RedisBuckets:
+    def __init__(self, url, timeout=0.2):
+        if redis is None:
+            raise RuntimeError('BANDWIDTH_REDIS_URL benötigt das Paket redis')
+        # Kurze Timeouts: ein nicht erreichbares Redis darf nicht jeden
+        # Block eines Downloads aufhalten
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.script = self.client.register_script(RESERVE_SCRIPT)
+        self.down_until = 0.0
+
+    def reserve(self, key, amount, rate, burst):
+        now = time.time()
+        if now < self.down_until:
+            raise ConnectionError('Redis vorübergehend nicht erreichbar')
+        try:
+            return float(self.script(keys=[key], args=[amount, rate, burst, now, BUCKET_TTL]))
+        except Exception:
+            self.down_until = now + REDIS_RETRY_AFTER
+            raise
+
+
+class Shaper:
+    def __init__(self, buckets, rates, uplink_rate=0, burst_seconds=2.0, max_per_worker=2, max_per_user=1):
+        self.buckets = buckets
+        self.rates = rates  # {'stream': Bytes/s, 'download': Bytes/s}, 0 = unbegrenzt
+        self.uplink_rate = uplink_rate
+        self.burst_seconds = burst_seconds
+        self.max_per_worker = max_per_worker
+        self.max_per_user = max_per_user
+        self._active = collections.Counter()
+        self._slots_lock = threading.Lock()
+
+    def _reserve(self, key, amount, rate):
+        try:
+            tokens = self.buckets.reserve(key, amount, rate, rate * self.burst_seconds)
+        except Exception:
+            # Lieber ungebremst ausliefern als den Stream abbrechen
+            logger.warning('Bandbreiten-Bucket nicht erreichbar', exc_info=True)
+            return 0.0
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def pay(self, user_id, route, amount):
+        """Wartezeit in Sekunden für amount gesendete Bytes."""
+        wait = 0.0
+        rate = self.rates.get(route, 0)
+        if rate:
+            wait = self._reserve(f'bw:{route}:{user_id}', amount, rate)
+        if self.uplink_rate:
+            uplink_wait = self._reserve(UPLINK_KEY, amount, self.uplink_rate)
+            if route != 'stream':
+                wait = max(wait, uplink_wait)
+        return wait
+
+    def limited(self, route):
+        return bool(self.rates.get(route) or self.uplink_rate)
+
+    def may_wait(self, route):
+        # Streams warten nur mit eigener Rate, nie auf den Uplink
+        return bool(self.rates.get(route) or (self.uplink_rate and route != 'stream'))
+
+    def acquire(self, user_id):
+        """Platz für eine gebremste Antwort in diesem Worker, sonst False."""
+        with self._slots_lock:
+            if sum(self._active.values()) >= self.max_per_worker or self._active[user_id] >= self.max_per_user:
+                return False
+            self._active[user_id] += 1
+            return True
+
+    def release(self, user_id):
+        with self._slots_lock:
+            self._active[user_id] -= 1
+            if self._active[user_id] <= 0:
+                del self._active[user_id]
+
+
+class ShapedBody:
+    # Ersetzt response.response; close() reicht an den Original-Body weiter
+    # und gibt einen belegten Platz (slot) wieder frei
+    def __init__(self, body, shaper, user_id, route, slot=False):
+        self.body = body
+        self.shaper = shaper
+        self.user_id = user_id
+        self.route = route
+        self.slot = slot
+
+    def __iter__(self):
+        pending = 0
+        for chunk in self.body:
+            yield chunk
+            pending += len(chunk)
+            if pending >= SHAPE_CHUNK:
+                self._pay(pending)
+                pending = 0
+
+    def _pay(self, amount):
+        wait = self.shaper.pay(self.user_id, self.route, amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    def close(self):
+        if self.slot:
+            self.slot = False
+            self.shaper.release(self.user_id)
+        if hasattr(self.body, 'close'):
+            self.body.close()
+
+
+def shape(response, user_id, route):
+    """Begrenzt den Body einer Stream-/Download-Antwort (200/206)."""
+    shaper = current_app.extensions.get('bandwidth')
+    if shaper is None or not shaper.limited(route) or response.status_code not in (200, 206):
+        return response
+    if 'X-Accel-Redirect' in response.headers:
+        rate = shaper.rates.get(route, 0)
+        if rate:
+            response.headers['X-Accel-Limit-Rate'] = str(int(rate))
+        return response
+    if 'X-Sendfile' in response.headers:
+        return response
+    slot = shaper.may_wait(route)
+    if slot and not shaper.acquire(user_id):
+        response.close()
+        rejected = jsonify({'error': 'Zu viele gleichzeitige Downloads, bitte später erneut versuchen'})
+        rejected.status_code = 429
+        rejected.headers['Retry-After'] = '10'
+        return rejected
+    response.response = ShapedBody(response.response, shaper, user_id, route, slot)
+    response.direct_passthrough = True
+    return response
+
+
+def init_app(app):
+    rates = {
+        'stream': app.config.get('BANDWIDTH_STREAM_RATE', 0),
+        'download': app.config.get('BANDWIDTH_DOWNLOAD_RATE', 0)
+    }
+    uplink_rate = app.config.get('BANDWIDTH_UPLINK_RATE', 0)
+    if not any(rates.values()) and not uplink_rate:
+        return None
+    url = app.config.get('BANDWIDTH_REDIS_URL')
+    if url:
+        buckets = RedisBuckets(url, app.config.get('BANDWIDTH_REDIS_TIMEOUT', 0.2))
+    else:
+        buckets = FileBuckets(app.config['BANDWIDTH_STATE_DIR'])
+    shaper = Shaper(
+        buckets,
+        rates,
+        uplink_rate,
+        app.config.get('BANDWIDTH_BURST_SECONDS', 2.0),
+        max_per_worker=app.config.get('BANDWIDTH_MAX_PER_WORKER', 2),
+        max_per_user=app.config.get('BANDWIDTH_MAX_PER_USER', 1)
+    )
+    app.extensions['bandwidth'] = shaper
+    return shaper
@@ -0,0 +1,83 @@
+# Read-your-writes über Requests hinweg. Jeder Request nutzt eine kausal
+# konsistente MongoDB-Session (mongo.session()). Nach einem Request mit
+# Datenbankzugriff bekommt der Client die operationTime/clusterTime der
+# Session als X-Causal-Token zurück und schickt ihn beim nächsten Request
+# mit; die neue Session wird darauf vorgespult, sodass auch ein Read vom
+# Secondary (z. B. /songs/list direkt nach dem Upload) den Write sieht.
+#
+# Der Token ist mit SECRET_KEY signiert: die Zeiten landen ungeprüft in der
+# Session und würden von dort an den Cluster weitergereicht. Ein ungültiger
+# Token wird ignoriert, der Request liest dann vom Primary.
+import logging
+
+from bson import json_util
+from flask import current_app, g, request
+from itsdangerous import BadData, URLSafeSerializer
+
+from app.models.mongo_models import mongo
+
+CAUSAL_HEADER = 'X-Causal-Token'
+MAX_TOKEN_LENGTH = 2048
+TOKEN_SALT = 'causal-token'
+
+logger = logging.getLogger(__name__)
+
+
+def serializer(secret_key):
+    # json_util statt json: Timestamps bleiben BSON-Timestamps
+    return URLSafeSerializer(secret_key, salt=TOKEN_SALT, serializer=json_util)
+
+
+def encode_token(session, secret_key):
+    if session.operation_time is None or session.cluster_time is None:
+        return None
+    return serializer(secret_key).dumps({'operationTime': session.operation_time, 'clusterTime': session.cluster_time})
+
+
+def decode_token(token, secret_key):
+    """(operationTime, clusterTime); BadData bei falscher Signatur oder Form."""
+    try:
+        data = serializer(secret_key).loads(token)
+        return data['operationTime'], data['clusterTime']
+    except (TypeError, KeyError) as e:
+        raise BadData('Ungültiger Causal-Token') from e
+
+
+def init_app(app):
+    if not app.config.get('MONGO_CAUSAL_SESSIONS', True):
+        return
+
+    @app.before_request
+    def apply_causal_token():
+        token = request.headers.get(CAUSAL_HEADER)
+        if not token:
+            return
+        try:
+            if len(token) > MAX_TOKEN_LENGTH:
+                raise BadData('Causal-Token zu lang')
+            operation_time, cluster_time = decode_token(token, current_app.config['SECRET_KEY'])
+        except BadData:
+            # Gefälscht oder kaputt: nicht an den Cluster weiterreichen, sondern
+            # ohne Token vom Primary lesen (statt 400)
+            logger.debug('Ungültiger Causal-Token ignoriert')
+            g.read_primary = True
+            return
+        session = mongo.session()
+        if session is not None:
+            session.advance_cluster_time(cluster_time)
+            session.advance_operation_time(operation_time)
+
+    @app.after_request
+    def expose_causal_token(response):
+        session = g.get('mongo_session')
+        if session is not None:
+            token = encode_token(session, current_app.config['SECRET_KEY'])
+            if token:
+                response.headers[CAUSAL_HEADER] = token
+        return response
+
+    @app.teardown_request
+    def end_session(exc):
+        session = g.pop('mongo_session', None)
+        if session is not None:
+            session.end_session()
@@ -0,0 +1,24 @@
+# Einmalige Schritte, die nicht bei jedem Worker-Start laufen sollen
+import click
+
+from app.models.mongo_models import Playlist, mongo
+from app.models.mysql_user import db
+
+
+def init_app(app):
+    @app.cli.command('init-db')
+    def init_db():
+        """Legt MySQL-Tabellen und MongoDB-Indizes an und ergänzt Altbestand."""
+        db.create_all()
+        mongo.connect().ensure_indexes()
+        # Playlists von vor song_count/total_duration_ms bekommen die Felder
+        # einmalig, statt bis zur nächsten Reparatur falsche Werte zu zeigen
+        _, backfilled = Playlist.recompute_aggregates(missing_only=True)
+        click.echo(f'Datenbanken initialisiert ({backfilled} Playlists ergänzt)')
+
+    @app.cli.command('repair-playlists')
+    @click.option('--batch-size', default=500, show_default=True)
+    def repair_playlists(batch_size):
+        """Berechnet song_count und total_duration_ms aller Playlists neu."""
+        scanned, fixed = Playlist.recompute_aggregates(batch_size)
+        click.echo(f'{scanned} Playlists geprüft, {fixed} korrigiert')
@@ -0,0 +1,174 @@
+# gzip/Brotli-Kompression für JSON-Antworten ab COMPRESSION_MIN_SIZE.
+# Jede Antwort bekommt ein ETag aus dem Hash des unkomprimierten Bodys
+# (plus Kodierung, da sich die Bytes unterscheiden). Passt If-None-Match,
+# gibt es ein 304 ohne Body; sonst wird die komprimierte Fassung aus einem
+# LRU-Cache unter diesem ETag geholt, sodass wiederholtes Pollen derselben
+# Bibliothek nur einen Hash kostet. Audio (send_file, audio/*) wird nie
+# angefasst. Brotli nur, wenn das Paket brotli installiert ist.
+#
+# Listen-Routen fragen den Cache schon vor der DB-Abfrage (lookup): Zu einem
+# billigen Versionsstand der Bibliothek (Library.version) merkt sich der
+# Cache das ETag der zuletzt ausgelieferten Antwort. Passt der Stand, gibt
+# es 304 bzw. die gecachten komprimierten Bytes ohne Abfrage und ohne JSON.
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app, g, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+
+
+class CompressedCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def choose_encoding(accept_encodings):
+    # Brotli bevorzugen (kleiner), sonst gzip; q=0 gilt als abgelehnt
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        # Brotli-Qualität 0-11, gzip-Level 1-9 -> ähnlicher Aufwand
+        return brotli.compress(data, quality=min(11, level))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _is_compressible(response, min_size):
+    return (
+        response.status_code == 200
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and 'Content-Encoding' not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+        and (response.content_length or 0) >= min_size
+    )
+
+
+def _digest_key(key, version):
+    return ('digest', key, version)
+
+
+def _small_key(key):
+    return ('small', key)
+
+
+def lookup(key, get_version):
+    """Antwort aus dem Cache für key beim Stand get_version() oder None."""
+    cache = current_app.extensions.get('compression_cache')
+    if cache is None or request.method != 'GET':
+        return None
+    # Den Stand nur abfragen, wenn der Cache überhaupt antworten kann: der
+    # Client muss ein ETag schicken oder komprimiert annehmen, und die letzte
+    # Antwort unter key darf nicht zu klein (ohne ETag/Cache) gewesen sein
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None and not request.if_none_match:
+        return None
+    response = None
+    if not cache.get(_small_key(key)):
+        # compress_response merkt sich das ETag der frisch erzeugten Antwort
+        g.compression_key = _digest_key(key, get_version())
+        response = _cached_response(cache, cache.get(g.compression_key), encoding)
+    if response is None:
+        # Die Route fragt ab; compress_response merkt sich, ob es sich lohnt
+        g.compression_lookup = key
+    return response
+
+
+def _cached_response(cache, digest, encoding):
+    if digest is None:
+        return None
+    etag = f'{digest}-{encoding}' if encoding else digest
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        compressed = cache.get(etag) if encoding else None
+        if compressed is None:
+            return None
+        response = current_app.response_class(compressed, mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+    level = app.config.get('COMPRESSION_LEVEL', 6)
+    cache = CompressedCache(app.config.get('COMPRESSION_CACHE_SIZE', 256))
+    app.extensions['compression_cache'] = cache
+
+    @app.after_request
+    def compress_response(response):
+        if request.method != 'GET':
+            return response
+        compressible = _is_compressible(response, min_size)
+        if 'compression_lookup' in g and response.status_code == 200:
+            # Zu kleine Antworten: künftig ohne Abfrage des Stands
+            if compressible:
+                cache.discard(_small_key(g.compression_lookup))
+            else:
+                cache.put(_small_key(g.compression_lookup), True)
+        if not compressible:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        data = response.get_data()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if 'compression_key' in g:
+            cache.put(g.compression_key, digest)
+        etag = f'{digest}-{encoding}' if encoding else digest
+        response.set_etag(etag)
+
+        if request.if_none_match.contains(etag):
+            response.status_code = 304
+            response.set_data(b'')
+            response.headers.pop('Content-Length', None)
+            return response
+        if encoding is None:
+            return response
+
+        compressed = cache.get(etag)
+        if compressed is None:
+            compressed = compress(data, encoding, level)
+            cache.put(etag, compressed)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -1,5 +1,6 @@
 # app/config.py
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,4 +17,86 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     MONGO_URI = os.environ.get('MONGO_URI')
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.getcwd(), 'uploads')
-    MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
+    SIMILARITY_INDEX_PATH = os.environ.get('SIMILARITY_INDEX_PATH') or os.path.join(os.getcwd(), 'data', 'similarity.npz')
+    EVENT_FLUSH_SIZE = int(os.environ.get('EVENT_FLUSH_SIZE', 500))
+    EVENT_FLUSH_INTERVAL = float(os.environ.get('EVENT_FLUSH_INTERVAL', 2.0))
+    EVENT_BUFFER_MAX = int(os.environ.get('EVENT_BUFFER_MAX', 20000))
+    SHUFFLE_WEIGHTS_TTL = int(os.environ.get('SHUFFLE_WEIGHTS_TTL', 300))
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    # Zugriff auf /metrics: Bearer-Token und/oder erlaubte Client-Adressen
+    # (hinter einem Proxy die Adresse, die Flask als remote_addr sieht)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1')
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # z. B. "app.routes=0.1" -> nur 10 % der Debug/Info-Logs dieser Logger
+    LOG_SAMPLING = os.environ.get('LOG_SAMPLING', '')
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.0))
+    PROFILING_ADMIN_IDS = [u for u in os.environ.get('PROFILING_ADMIN_IDS', '').split(',') if u]
+    PROFILING_DIR = os.environ.get('PROFILING_DIR') or os.path.join(os.getcwd(), 'profiles')
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+    COMPRESSION_CACHE_SIZE = int(os.environ.get('COMPRESSION_CACHE_SIZE', 256))
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    S3_REGION = os.environ.get('S3_REGION')
+    S3_ACCESS_KEY = os.environ.get('S3_ACCESS_KEY')
+    S3_SECRET_KEY = os.environ.get('S3_SECRET_KEY')
+    # Streams/Downloads per Redirect auf eine signierte URL ausliefern
+    STORAGE_REDIRECT = os.environ.get('STORAGE_REDIRECT', 'false').lower() == 'true'
+    PRESIGN_EXPIRES = int(os.environ.get('PRESIGN_EXPIRES', 3600))
+    # Auslieferung an den Proxy abgeben: '' (Flask liefert), 'x-accel'
+    # (nginx) oder 'x-sendfile' (Apache/lighttpd). Für nginx z. B.:
+    #   location /protected-audio/ { internal; alias /app/uploads/; }
+    AUDIO_OFFLOAD = os.environ.get('AUDIO_OFFLOAD', '')
+    AUDIO_OFFLOAD_PREFIX = os.environ.get('AUDIO_OFFLOAD_PREFIX', '/protected-audio/')
+    FILE_GC_BATCH_SIZE = int(os.environ.get('FILE_GC_BATCH_SIZE', 500))
+    FILE_GC_MIN_AGE = int(os.environ.get('FILE_GC_MIN_AGE', 3600))
+    # Sekunden zwischen zwei Batches im Hintergrund (0 = nur `flask gc-files`)
+    FILE_GC_INTERVAL = float(os.environ.get('FILE_GC_INTERVAL', 0))
+    # Listen/Polls auf Secondaries (z. B. 'secondaryPreferred'); Besitz-Checks
+    # und Writes bleiben auf dem Primary. Nur sinnvoll, wenn alle Clients den
+    # X-Causal-Token zurückschicken, sonst fehlt direkt nach dem Upload der
+    # neue Song in der Liste. Lokal testbar mit einem Replica Set, z. B.
+    #   mongod --replSet rs0 ... && mongosh --eval 'rs.initiate()'
+    #   MONGO_URI=mongodb://localhost:27017/?replicaSet=rs0
+    MONGO_LIST_READ_PREFERENCE = os.environ.get('MONGO_LIST_READ_PREFERENCE', 'primary')
+    # Einzelne Methoden überschreiben, z. B. "Song.get_by_user=primary"
+    MONGO_READ_PREFERENCES = os.environ.get('MONGO_READ_PREFERENCES', '')
+    MONGO_CAUSAL_SESSIONS = os.environ.get('MONGO_CAUSAL_SESSIONS', 'true').lower() == 'true'
+    # GET /sync: Überlappung in Sekunden und Aufbewahrung der Löschungen
+    SYNC_LOOKBACK = int(os.environ.get('SYNC_LOOKBACK', 10))
+    SYNC_TOMBSTONE_TTL = int(os.environ.get('SYNC_TOMBSTONE_TTL', 30 * 24 * 3600))
+    # GET /events/stream (SSE, braucht ein Replica Set): Heartbeat in
+    # Sekunden, Queue pro Client, Ringpuffer für Last-Event-ID, offene
+    # Streams pro Worker (gthread: jeder belegt einen der GUNICORN_THREADS,
+    # daher klein; gevent: hoch)
+    CHANGE_FEED_ENABLED = os.environ.get('CHANGE_FEED_ENABLED', 'true').lower() == 'true'
+    SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 15))
+    SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', 100))
+    SSE_REPLAY_SIZE = int(os.environ.get('SSE_REPLAY_SIZE', 1000))
+    SSE_MAX_CONNECTIONS = int(os.environ.get(
+        'SSE_MAX_CONNECTIONS',
+        500 if os.environ.get('GUNICORN_WORKER_CLASS') in ('gevent', 'eventlet') else 2
+    ))
+    # Bytes/s pro User und Route (0 = unbegrenzt). Abspielen bleibt frei,
+    # Bulk-Downloads werden gebremst; mit BANDWIDTH_UPLINK_RATE bekommen
+    # Downloads nur, was die laufenden Streams vom Uplink übrig lassen
+    BANDWIDTH_STREAM_RATE = int(os.environ.get('BANDWIDTH_STREAM_RATE', 0))
+    BANDWIDTH_DOWNLOAD_RATE = int(os.environ.get('BANDWIDTH_DOWNLOAD_RATE', 4 * 1024 * 1024))
+    BANDWIDTH_UPLINK_RATE = int(os.environ.get('BANDWIDTH_UPLINK_RATE', 0))
+    BANDWIDTH_BURST_SECONDS = float(os.environ.get('BANDWIDTH_BURST_SECONDS', 2.0))
+    # Gemeinsamer Zustand aller Worker, z. B. redis://localhost:6379/0;
+    # ohne Redis Dateien mit flock unter BANDWIDTH_STATE_DIR (ein Host)
+    BANDWIDTH_REDIS_URL = os.environ.get('BANDWIDTH_REDIS_URL', '')
+    BANDWIDTH_REDIS_TIMEOUT = float(os.environ.get('BANDWIDTH_REDIS_TIMEOUT', 0.2))
+    BANDWIDTH_STATE_DIR = os.environ.get(
+        'BANDWIDTH_STATE_DIR', os.path.join(tempfile.gettempdir(), 'skipify-bandwidth')
+    )
+    # Gebremste Antworten belegen während des Wartens einen Thread: höchstens
+    # so viele pro Worker (Rest bleibt fürs Abspielen) und pro User im Worker
+    BANDWIDTH_MAX_PER_WORKER = int(os.environ.get('BANDWIDTH_MAX_PER_WORKER', 2))
+    BANDWIDTH_MAX_PER_USER = int(os.environ.get('BANDWIDTH_MAX_PER_USER', 1))
@@ -0,0 +1,156 @@
+# Strukturiertes JSON-Logging. Die Request-Threads stellen Records nur in
+# eine Queue (QueueHandler); geschrieben wird von einem QueueListener-Thread,
+# sodass ein blockierendes stdout keinen Request aufhält. Jeder Record trägt
+# die request_id des Requests (Header X-Request-ID oder neu erzeugt).
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+QUEUE_SIZE = 10000
+
+# Attribute, die jeder LogRecord hat; alles andere stammt aus extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None)
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        elif record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    # rates: {'app.routes': 0.1} -> nur 10 % der Records unter WARNING
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + '.'):
+                return random.random() < rate
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Nachricht und Traceback im Request-Thread auflösen (args und
+        # exc_info sind nicht immer picklebar/threadsicher), die
+        # JSON-Formatierung übernimmt der Listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Volle Queue verwirft den Record statt den Request zu blockieren
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def parse_sampling(value):
+    rates = {}
+    for part in (value or '').split(','):
+        if '=' in part:
+            name, rate = part.split('=', 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+_listener = None
+_log_queue = None
+
+
+def _start_listener():
+    global _listener
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(_log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork():
+    # Der Listener-Thread existiert im Kindprozess nicht mehr; stop() würde
+    # nur ein Sentinel in die Queue legen, daher einfach neu starten
+    global _listener
+    if _listener is not None:
+        _listener = None
+        _start_listener()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def init_logging(app):
+    global _log_queue
+    _stop_listener()
+    _log_queue = queue.Queue(QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(_log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(SamplingFilter(parse_sampling(app.config.get('LOG_SAMPLING'))))
+
+    logger = logging.getLogger('app')
+    logger.handlers = [queue_handler]
+    logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    logger.propagate = False
+
+    _start_listener()
+    atexit.register(_stop_listener)
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def expose_request_id(response):
+        if 'request_id' in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
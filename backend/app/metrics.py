@@ -0,0 +1,136 @@
+# Prometheus-Metriken (prometheus_client): Latenz-Histogramme,
+# Status-Zähler und In-Flight-Gauges pro Endpoint sowie Dauer jeder
+# MongoDB- (CommandListener) und SQLAlchemy-Operation (Engine-Events).
+# Export unter /metrics im Prometheus-Textformat.
+#
+# Mehrere Worker: Ist PROMETHEUS_MULTIPROC_DIR gesetzt (gunicorn.conf.py tut
+# das), schreibt jeder Prozess seine Werte dorthin und /metrics fasst alle
+# Worker zusammen, egal welcher Worker den Scrape bekommt. Ohne die
+# Variable gelten die Werte pro Prozess (Entwicklung, Tests).
+#
+# /metrics ist nur mit METRICS_TOKEN (Authorization: Bearer ...) oder von
+# einer Adresse aus METRICS_ALLOWED_IPS erreichbar.
+import hmac
+import os
+import time
+
+from flask import Response, abort, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.models.mongo_models import mongo
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'skipify_http_request_duration_seconds', 'Dauer der HTTP-Requests', ('method', 'endpoint'),
+    buckets=DEFAULT_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'skipify_http_requests_total', 'Anzahl HTTP-Requests nach Status', ('method', 'endpoint', 'status')
+)
+# livesum: über alle lebenden Worker summiert
+REQUESTS_IN_FLIGHT = Gauge(
+    'skipify_http_requests_in_flight', 'Gerade laufende HTTP-Requests', ('endpoint',),
+    multiprocess_mode='livesum'
+)
+MONGO_LATENCY = Histogram(
+    'skipify_mongo_command_duration_seconds', 'Dauer der MongoDB-Kommandos', ('command', 'outcome'),
+    buckets=DEFAULT_BUCKETS
+)
+SQL_LATENCY = Histogram(
+    'skipify_sql_query_duration_seconds', 'Dauer der SQL-Statements', ('statement',),
+    buckets=DEFAULT_BUCKETS
+)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(event.command_name, 'success').observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_LATENCY.labels(event.command_name, 'failure').observe(event.duration_micros / 1e6)
+
+
+mongo_listener = MongoCommandMetrics()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+    SQL_LATENCY.labels(verb).observe(time.perf_counter() - starts.pop())
+
+
+def _endpoint():
+    # Regel statt konkreter URL, damit IDs keine neuen Label-Werte erzeugen
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def render():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def _authorized():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        header = request.headers.get('Authorization', '')
+        if hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return True
+    allowed = {ip.strip() for ip in current_app.config.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()}
+    return request.remote_addr in allowed
+
+
+def init_app(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    if mongo_listener not in mongo.event_listeners:
+        mongo.event_listeners.append(mongo_listener)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_endpoint = _endpoint()
+        REQUESTS_IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+    @app.after_request
+    def count_status(response):
+        endpoint = g.get('metrics_endpoint')
+        if endpoint is not None:
+            REQUEST_COUNT.labels(request.method, endpoint, str(response.status_code)).inc()
+        return response
+
+    # teardown läuft auch nach Exceptions, daher wird hier gemessen
+    @app.teardown_request
+    def stop_timer(exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        endpoint = g.pop('metrics_endpoint')
+        REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+        REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - start)
+
+    @app.route('/metrics')
+    def metrics():
+        if not _authorized():
+            abort(403)
+        return Response(render(), content_type=CONTENT_TYPE_LATEST)
@@ -1,37 +1,188 @@
 # app/models/mongo_models.py
-from pymongo import MongoClient
-from flask import current_app
+import os
+import threading
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReadPreference, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from flask import current_app, g, has_request_context
 from bson import ObjectId
 
+DUPLICATE_KEY = 11000
+
+# Erlaubte Operationen für inkrementelle Playlist-Änderungen
+PLAYLIST_OPS = {'add', 'remove', 'move'}
+# n für $slice [array, position, n]: "bis zum Ende" (n muss > 0 sein)
+SLICE_ALL = 2 ** 31 - 1
+
+READ_PREFERENCES = {
+    'primary': ReadPreference.PRIMARY,
+    'primaryPreferred': ReadPreference.PRIMARY_PREFERRED,
+    'secondary': ReadPreference.SECONDARY,
+    'secondaryPreferred': ReadPreference.SECONDARY_PREFERRED,
+    'nearest': ReadPreference.NEAREST
+}
+
+@lru_cache(maxsize=8)
+def parse_read_preferences(value):
+    # "Song.get_by_user=primary,Stats.get_daily=nearest" -> {Methode: Modus}
+    overrides = {}
+    for part in (value or '').split(','):
+        if '=' in part:
+            method, mode = part.split('=', 1)
+            if mode.strip() not in READ_PREFERENCES:
+                raise ValueError(f'Unbekannte Read Preference: {mode.strip()}')
+            overrides[method.strip()] = mode.strip()
+    return overrides
+
 class MongoDB:
     def __init__(self):
         self.client = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.client_factory = MongoClient
+        self.event_listeners = []
         self.db = None
         self.playlists = None
         self.songs = None
         self.favorites = None
+        self.events = None
+        self.stats_daily = None
+        self.stats_monthly = None
+        self.stats_songs = None
+        self.stats_artists = None
+        self.maintenance = None
+        self.tombstones = None
+        self._readers = {}
+
+    def init_app(self, app):
+        # Read Preferences beim Start prüfen: ein Tippfehler soll nicht erst
+        # jede Listen-Abfrage mit 500 scheitern lassen
+        mode = app.config.get('MONGO_LIST_READ_PREFERENCE', 'primary')
+        if mode not in READ_PREFERENCES:
+            raise ValueError(f'Unbekannte Read Preference: {mode}')
+        parse_read_preferences(app.config.get('MONGO_READ_PREFERENCES'))
 
     def connect(self):
-        if self.client is None:
-            self.client = MongoClient(current_app.config['MONGO_URI'])
-            self.db = self.client['skipify_music']
-            self.playlists = self.db['playlists']
-            self.songs = self.db['songs']
-            self.favorites = self.db['favorites']
+        # Lazy pro Prozess: ein vor fork() erzeugter MongoClient darf im
+        # Worker nicht weiterverwendet werden, daher wird er bei neuer PID
+        # verworfen (nicht geschlossen, die Sockets gehören dem Elternprozess)
+        if self.client is None or self.pid != os.getpid():
+            with self.lock:
+                if self.client is None or self.pid != os.getpid():
+                    self._open(current_app.config['MONGO_URI'])
         return self
 
+    def _open(self, uri):
+        client = self.client_factory(uri, event_listeners=self.event_listeners)
+        self.db = client['skipify_music']
+        self.playlists = self.db['playlists']
+        self.songs = self.db['songs']
+        self.favorites = self.db['favorites']
+        self.events = self.db['events']
+        self.stats_daily = self.db['stats_daily']
+        self.stats_monthly = self.db['stats_monthly']
+        self.stats_songs = self.db['stats_songs']
+        self.stats_artists = self.db['stats_artists']
+        self.maintenance = self.db['maintenance']
+        self.tombstones = self.db['tombstones']
+        self._readers = {}
+        self.pid = os.getpid()
+        self.client = client
+
+    def reset(self):
+        self.client = None
+        self.pid = None
+
+    def reader(self, name, method):
+        # Listen- und Poll-Reads dürfen auf Secondaries gehen (Standard:
+        # MONGO_LIST_READ_PREFERENCE, pro Methode über MONGO_READ_PREFERENCES
+        # überschreibbar). Besitz-Checks und Writes lesen weiter vom Primary,
+        # ebenso Requests mit ungültigem Causal-Token (app/causal.py).
+        config = current_app.config
+        overrides = parse_read_preferences(config.get('MONGO_READ_PREFERENCES'))
+        mode = overrides.get(method, config.get('MONGO_LIST_READ_PREFERENCE', 'primary'))
+        if has_request_context() and g.get('read_primary'):
+            mode = 'primary'
+        key = (name, mode)
+        collection = self._readers.get(key)
+        if collection is None:
+            collection = self.db[name].with_options(read_preference=READ_PREFERENCES[mode])
+            self._readers[key] = collection
+        return collection
+
+    def session(self):
+        # Eine kausal konsistente Session pro Request: Reads nach einem Write
+        # (auch auf einem Secondary) sehen diesen Write. Außerhalb von
+        # Requests (CLI, Hintergrund-Threads) implizite Sessions von pymongo
+        if not has_request_context() or not current_app.config.get('MONGO_CAUSAL_SESSIONS', True):
+            return None
+        if 'mongo_session' not in g:
+            try:
+                g.mongo_session = self.connect().client.start_session(causal_consistency=True)
+            except NotImplementedError:
+                # z. B. mongomock im Benchmark
+                g.mongo_session = None
+        return g.mongo_session
+
+    def ensure_indexes(self):
+        # Eindeutiger Index, damit Favoriten per Upsert gesetzt werden können
+        favorite_key = [('user_id', ASCENDING), ('song_id', ASCENDING)]
+        try:
+            self.favorites.create_index(favorite_key, unique=True)
+        except DuplicateKeyError:
+            self._remove_duplicate_favorites()
+            self.favorites.create_index(favorite_key, unique=True)
+        self.events.create_index([('user_id', ASCENDING), ('ts', ASCENDING)])
+        # Referenzprüfung der Datei-GC
+        self.songs.create_index([('file_path', ASCENDING)])
+        self.songs.create_index([('art_id', ASCENDING)], sparse=True)
+        # Rollups: ein Dokument pro Schlüssel, per $inc-Upsert fortgeschrieben
+        for name in STATS_COLLECTIONS:
+            Stats.create_indexes(self.db[name], name)
+        # Delta-Sync: Änderungen pro User seit einem Zeitpunkt; Tombstones
+        # verfallen per TTL (ältere since-Tokens bekommen einen Voll-Sync)
+        for collection in (self.songs, self.playlists, self.favorites):
+            collection.create_index([('user_id', ASCENDING), ('updated_at', ASCENDING)])
+        self.tombstones.create_index([('user_id', ASCENDING), ('deleted_at', ASCENDING)])
+        self.tombstones.create_index(
+            [('deleted_at', ASCENDING)],
+            expireAfterSeconds=current_app.config.get('SYNC_TOMBSTONE_TTL', 30 * 24 * 3600)
+        )
+
+    def _remove_duplicate_favorites(self):
+        # Altbestand aus der Zeit vor dem eindeutigen Index bereinigen
+        duplicates = self.favorites.aggregate([
+            {'$group': {
+                '_id': {'user_id': '$user_id', 'song_id': '$song_id'},
+                'ids': {'$push': '$_id'},
+                'count': {'$sum': 1}
+            }},
+            {'$match': {'count': {'$gt': 1}}}
+        ])
+        for group in duplicates:
+            self.favorites.delete_many({'_id': {'$in': group['ids'][1:]}})
+
 # Globale Instanz
 mongo = MongoDB()
 
+def _now():
+    # Zeitstempel für updated_at/deleted_at (Grundlage von GET /sync)
+    return datetime.now(timezone.utc)
+
 # ================= SONG =================
 class Song:
-    def __init__(self, title, artist, album, genre, file_path, user_id):
+    # file_path ist der Schlüssel im Storage-Backend (app.storage); ältere
+    # Songs enthalten dort noch den absoluten Pfad im Upload-Ordner
+    def __init__(self, title, artist, album, genre, file_path, user_id, art_id=None, duration_ms=None):
         self.title = title
         self.artist = artist
         self.album = album
         self.genre = genre
         self.file_path = file_path
         self.user_id = user_id
+        self.art_id = art_id  # Hash des Covers (app.services.artwork)
+        self.duration_ms = duration_ms  # None, wenn mutagen keine Dauer liefert
         self.id = None  # Wird nach Insert gesetzt
 
     def to_dict(self):
@@ -42,64 +193,171 @@ class Song:
             'album': self.album,
             'genre': self.genre,
             'file_path': self.file_path,
-            'user_id': self.user_id
+            'user_id': self.user_id,
+            'art_id': self.art_id,
+            'duration_ms': self.duration_ms
         }
 
     @staticmethod
     def create(song_data):
-        result = mongo.connect().songs.insert_one(song_data)
+        song_data['updated_at'] = _now()
+        result = mongo.connect().songs.insert_one(song_data, session=mongo.session())
         song = Song(
             song_data['title'],
             song_data['artist'],
             song_data['album'],
             song_data['genre'],
             song_data['file_path'],
-            song_data['user_id']
+            song_data['user_id'],
+            art_id=song_data.get('art_id'),
+            duration_ms=song_data.get('duration_ms')
         )
         song.id = result.inserted_id
         return song
 
+    @staticmethod
+    def _from_doc(doc):
+        song = Song(
+            doc['title'],
+            doc['artist'],
+            doc['album'],
+            doc['genre'],
+            doc['file_path'],
+            doc['user_id'],
+            art_id=doc.get('art_id'),
+            duration_ms=doc.get('duration_ms')
+        )
+        song.id = doc['_id']
+        return song
+
     @staticmethod
     def get_by_id(song_id):
         if not ObjectId.is_valid(song_id):
             return None
-        data = mongo.connect().songs.find_one({'_id': ObjectId(song_id)})
+        data = mongo.connect().songs.find_one({'_id': ObjectId(song_id)}, session=mongo.session())
         if data:
-            song = Song(
-                data['title'],
-                data['artist'],
-                data['album'],
-                data['genre'],
-                data['file_path'],
-                data['user_id']
-            )
-            song.id = data['_id']
-            return song
+            return Song._from_doc(data)
         return None
 
     @staticmethod
     def get_by_user(user_id):
-        cursor = mongo.connect().songs.find({'user_id': user_id})
-        songs = []
-        for doc in cursor:
-            song = Song(
-                doc['title'],
-                doc['artist'],
-                doc['album'],
-                doc['genre'],
-                doc['file_path'],
-                doc['user_id']
-            )
-            song.id = doc['_id']
-            songs.append(song)
-        return songs
+        cursor = mongo.connect().reader('songs', 'Song.get_by_user').find(
+            {'user_id': user_id},
+            session=mongo.session()
+        )
+        return [Song._from_doc(doc) for doc in cursor]
+
+    @staticmethod
+    def get_by_ids(user_id, song_ids):
+        # Reihenfolge von song_ids bleibt erhalten, fremde Songs fallen weg
+        if not song_ids:
+            return []
+        cursor = mongo.connect().reader('songs', 'Song.get_by_ids').find(
+            {'_id': {'$in': list(song_ids)}, 'user_id': user_id},
+            session=mongo.session()
+        )
+        by_id = {doc['_id']: Song._from_doc(doc) for doc in cursor}
+        return [by_id[sid] for sid in song_ids if sid in by_id]
+
+    @staticmethod
+    def get_artists(song_ids):
+        cursor = mongo.connect().songs.find(
+            {'_id': {'$in': list(song_ids)}},
+            projection={'artist': 1}
+        )
+        return {doc['_id']: doc.get('artist') for doc in cursor}
+
+    @staticmethod
+    def get_artists_by_user(user_id):
+        cursor = mongo.connect().reader('songs', 'Song.get_artists_by_user').find(
+            {'user_id': user_id},
+            projection={'artist': 1},
+            session=mongo.session()
+        )
+        return {doc['_id']: doc.get('artist') for doc in cursor}
+
+    @staticmethod
+    def get_durations(song_ids):
+        # Dauer in ms je Song (fehlende Songs/Dauern zählen als 0)
+        if not song_ids:
+            return {}
+        cursor = mongo.connect().songs.find(
+            {'_id': {'$in': list(song_ids)}},
+            projection={'duration_ms': 1},
+            session=mongo.session()
+        )
+        return {doc['_id']: doc.get('duration_ms') or 0 for doc in cursor}
+
+    @staticmethod
+    def filter_owned(user_id, song_ids):
+        # Ein einziger $in-Query statt einem Lookup pro Song
+        ids = [ObjectId(s) for s in song_ids if ObjectId.is_valid(s)]
+        if not ids:
+            return set()
+        cursor = mongo.connect().songs.find(
+            {'_id': {'$in': ids}, 'user_id': user_id},
+            projection={'_id': 1},
+            session=mongo.session()
+        )
+        return {doc['_id'] for doc in cursor}
+
+    @staticmethod
+    def delete_many(user_id, song_ids):
+        # Gibt die gelöschten Songs zurück (für Datei- und Cover-Aufräumen)
+        ids = [ObjectId(s) for s in song_ids if ObjectId.is_valid(s)]
+        if not ids:
+            return []
+        songs = mongo.connect().songs
+        session = mongo.session()
+        cursor = songs.find({'_id': {'$in': ids}, 'user_id': user_id}, session=session)
+        deleted = [Song._from_doc(doc) for doc in cursor]
+        if deleted:
+            songs.delete_many({'_id': {'$in': [song.id for song in deleted]}}, session=session)
+            Tombstone.record(user_id, 'songs', [song.id for song in deleted])
+        return deleted
+
+    @staticmethod
+    def get_changed(user_id, since):
+        cursor = mongo.connect().songs.find(
+            {'user_id': user_id, 'updated_at': {'$gte': since}},
+            session=mongo.session()
+        )
+        return [Song._from_doc(doc) for doc in cursor]
+
+    @staticmethod
+    def referenced_files(file_paths):
+        # Welche der Schlüssel noch von einem Song benutzt werden
+        if not file_paths:
+            return set()
+        cursor = mongo.connect().songs.find(
+            {'file_path': {'$in': list(file_paths)}},
+            projection={'_id': 0, 'file_path': 1}
+        )
+        return {doc['file_path'] for doc in cursor}
+
+    @staticmethod
+    def referenced_art(art_ids):
+        if not art_ids:
+            return set()
+        cursor = mongo.connect().songs.find(
+            {'art_id': {'$in': list(art_ids)}},
+            projection={'_id': 0, 'art_id': 1}
+        )
+        return {doc['art_id'] for doc in cursor}
 
 # ================= PLAYLIST =================
 class Playlist:
-    def __init__(self, name, user_id, songs=None):
+    # song_count und total_duration_ms sind denormalisiert, damit Listen
+    # "42 Songs · 2 h 13 min" ohne Auflösen der Songs anzeigen können. Jede
+    # Änderung an songs passt sie im selben Update an; Abweichungen (z. B.
+    # Playlists von vor der Einführung) behebt recompute_aggregates()
+    def __init__(self, name, user_id, songs=None, version=0, song_count=None, total_duration_ms=0):
         self.name = name
         self.user_id = user_id
         self.songs = songs or []
+        self.version = version
+        self.song_count = len(self.songs) if song_count is None else song_count
+        self.total_duration_ms = total_duration_ms
         self.id = None
 
     def to_dict(self):
@@ -107,69 +365,533 @@ class Playlist:
             'id': str(self.id) if self.id else None,
             'name': self.name,
             'user_id': self.user_id,
-            'songs': [str(s) for s in self.songs]
+            'songs': [str(s) for s in self.songs],
+            'version': self.version,
+            'song_count': self.song_count,
+            'total_duration_ms': self.total_duration_ms
+        }
+
+    @staticmethod
+    def _from_doc(doc):
+        playlist = Playlist(
+            doc['name'],
+            doc['user_id'],
+            doc.get('songs', []),
+            doc.get('version', 0),
+            doc.get('song_count'),
+            doc.get('total_duration_ms', 0)
+        )
+        playlist.id = doc['_id']
+        return playlist
+
+    @staticmethod
+    def _aggregates(song_ids):
+        durations = Song.get_durations(song_ids)
+        return {
+            'song_count': len(song_ids),
+            'total_duration_ms': sum(durations.get(s, 0) for s in song_ids)
         }
 
     @staticmethod
     def create(playlist_data):
-        result = mongo.connect().playlists.insert_one(playlist_data)
+        playlist_data.setdefault('version', 0)
+        playlist_data.update(Playlist._aggregates(playlist_data.get('songs', [])))
+        playlist_data['updated_at'] = _now()
+        result = mongo.connect().playlists.insert_one(playlist_data, session=mongo.session())
         playlist = Playlist(
             playlist_data['name'],
             playlist_data['user_id'],
-            playlist_data.get('songs', [])
+            playlist_data.get('songs', []),
+            playlist_data['version'],
+            playlist_data['song_count'],
+            playlist_data['total_duration_ms']
         )
         playlist.id = result.inserted_id
         return playlist
 
+    @staticmethod
+    def validate_songs(user_id, song_ids):
+        # Eine Abfrage für die ganze Liste: nur existierende Songs des Users,
+        # Duplikate entfernt (erstes Vorkommen zählt). Gibt (ObjectIds,
+        # abgelehnte IDs) zurück, damit keine toten Verweise gespeichert werden
+        unique = list(dict.fromkeys(str(s) for s in song_ids))
+        owned = Song.filter_owned(user_id, unique)
+        accepted = [ObjectId(s) for s in unique if ObjectId.is_valid(s) and ObjectId(s) in owned]
+        rejected = [s for s in unique if not ObjectId.is_valid(s) or ObjectId(s) not in owned]
+        return accepted, rejected
+
     @staticmethod
     def get_by_id(playlist_id):
         if not ObjectId.is_valid(playlist_id):
             return None
-        data = mongo.connect().playlists.find_one({'_id': ObjectId(playlist_id)})
+        data = mongo.connect().playlists.find_one({'_id': ObjectId(playlist_id)}, session=mongo.session())
         if data:
-            playlist = Playlist(data['name'], data['user_id'], data.get('songs', []))
-            playlist.id = data['_id']
-            return playlist
+            return Playlist._from_doc(data)
         return None
 
     @staticmethod
-    def update(playlist_id, updates):
-        mongo.connect().playlists.update_one(
-            {'_id': ObjectId(playlist_id)},
-            {'$set': updates}
+    def _version_query(playlist_id, version):
+        # Alte Dokumente ohne Versionsfeld gelten als Version 0
+        if version == 0:
+            return {'_id': ObjectId(playlist_id), 'version': {'$in': [0, None]}}
+        return {'_id': ObjectId(playlist_id), 'version': version}
+
+    @staticmethod
+    def update(playlist_id, updates, expected_version=None):
+        # Mit expected_version wird nur geschrieben, wenn die Playlist
+        # zwischenzeitlich nicht geändert wurde (False bei Konflikt)
+        if expected_version is None:
+            query = {'_id': ObjectId(playlist_id)}
+        else:
+            query = Playlist._version_query(playlist_id, expected_version)
+        updates = dict(updates, updated_at=_now())
+        if 'songs' in updates:
+            updates.update(Playlist._aggregates(updates['songs']))
+        result = mongo.connect().playlists.update_one(
+            query,
+            {'$set': updates, '$inc': {'version': 1}},
+            session=mongo.session()
+        )
+        return result.matched_count == 1
+
+    @staticmethod
+    def _op_stage(op, duration_ms=0):
+        # Eine Pipeline-Stufe je Operation; $pull und $push dürften im selben
+        # Update nicht auf dasselbe Feld zugreifen, daher $filter/$slice.
+        # Anzahl und Dauer wie mit $inc fortschreiben (in Pipelines als
+        # $add); alle Ausdrücke einer Stufe sehen den Stand davor
+        song_id = ObjectId(op['song_id'])
+        position = op.get('position')
+        rest = {'$filter': {'input': {'$ifNull': ['$songs', []]}, 'cond': {'$ne': ['$$this', song_id]}}}
+        if op['op'] == 'remove':
+            # Ältere Playlists können Duplikate enthalten: alle Vorkommen
+            occurrences = {'$size': {'$filter': {
+                'input': {'$ifNull': ['$songs', []]}, 'cond': {'$eq': ['$$this', song_id]}
+            }}}
+            return {'$set': {
+                'songs': rest,
+                'song_count': {'$subtract': ['$song_count', occurrences]},
+                'total_duration_ms': {'$subtract': ['$total_duration_ms', {'$multiply': [occurrences, duration_ms]}]}
+            }}
+        base = {'$ifNull': ['$songs', []]} if op['op'] == 'add' else rest
+        if position is None:
+            inserted = {'$concatArrays': ['$$base', [song_id]]}
+        else:
+            inserted = {'$concatArrays': [
+                {'$slice': ['$$base', position]},
+                [song_id],
+                {'$slice': ['$$base', position, SLICE_ALL]}
+            ]}
+        stage = {'songs': {'$let': {'vars': {'base': base}, 'in': inserted}}}
+        if op['op'] == 'add':
+            stage['song_count'] = {'$add': ['$song_count', 1]}
+            stage['total_duration_ms'] = {'$add': ['$total_duration_ms', duration_ms]}
+        return {'$set': stage}
+
+    @staticmethod
+    def apply_operations(playlist_id, ops, expected_version):
+        # Alle Ops als ein Pipeline-Update, gebunden an expected_version: der
+        # Server wendet sie der Reihe nach an, bei einem Konflikt ändert sich
+        # nichts. Dauern nur der hinzugefügten/entfernten Songs nachschlagen.
+        # Gibt die neue Version zurück, bei Konflikt None.
+        durations = Song.get_durations({ObjectId(op['song_id']) for op in ops if op['op'] != 'move'})
+        pipeline = [Playlist._op_stage(op, durations.get(ObjectId(op['song_id']), 0)) for op in ops]
+        pipeline.append({'$set': {
+            'version': {'$add': [{'$ifNull': ['$version', 0]}, 1]},
+            'updated_at': _now()
+        }})
+        result = mongo.connect().playlists.update_one(
+            Playlist._version_query(playlist_id, expected_version),
+            pipeline,
+            session=mongo.session()
         )
+        if result.matched_count == 0:
+            return None
+        return expected_version + 1
 
     @staticmethod
-    def delete(playlist_id):
-        mongo.connect().playlists.delete_one({'_id': ObjectId(playlist_id)})
+    def delete(playlist_id, user_id):
+        result = mongo.connect().playlists.delete_one({'_id': ObjectId(playlist_id)}, session=mongo.session())
+        if result.deleted_count:
+            Tombstone.record(user_id, 'playlists', [ObjectId(playlist_id)])
 
     @staticmethod
     def get_by_user(user_id):
-        cursor = mongo.connect().playlists.find({'user_id': user_id})
-        playlists = []
+        cursor = mongo.connect().reader('playlists', 'Playlist.get_by_user').find(
+            {'user_id': user_id},
+            session=mongo.session()
+        )
+        return [Playlist._from_doc(doc) for doc in cursor]
+
+    @staticmethod
+    def get_changed(user_id, since):
+        cursor = mongo.connect().playlists.find(
+            {'user_id': user_id, 'updated_at': {'$gte': since}},
+            session=mongo.session()
+        )
+        return [Playlist._from_doc(doc) for doc in cursor]
+
+    @staticmethod
+    def remove_songs(user_id, songs):
+        # Gelöschte Songs aus allen Playlists des Users ziehen (ein
+        # update_many statt einem Update pro Playlist); liefert die IDs der
+        # betroffenen Playlists. Wie oft ein Song in einer Playlist steht,
+        # unterscheidet sich je Playlist, daher als Pipeline-Update: Dauer
+        # und Anzahl ergeben sich aus dem alten bzw. neuen Array
+        ids = [song.id for song in songs]
+        if not ids:
+            return []
+        playlists = mongo.connect().playlists
+        session = mongo.session()
+        query = {'user_id': user_id, 'songs': {'$in': ids}}
+        affected = [doc['_id'] for doc in playlists.find(query, projection={'_id': 1}, session=session)]
+        if affected:
+            removed_ms = [
+                {'$multiply': [song.duration_ms or 0, {'$size': {'$filter': {
+                    'input': '$songs', 'cond': {'$eq': ['$$this', song.id]}
+                }}}]}
+                for song in songs
+            ]
+            playlists.update_many(
+                {'_id': {'$in': affected}},
+                [
+                    {'$set': {
+                        'total_duration_ms': {'$subtract': [
+                            {'$ifNull': ['$total_duration_ms', 0]},
+                            {'$add': removed_ms}
+                        ]},
+                        'songs': {'$filter': {'input': '$songs', 'cond': {'$not': {'$in': ['$$this', ids]}}}},
+                        'version': {'$add': [{'$ifNull': ['$version', 0]}, 1]},
+                        'updated_at': _now()
+                    }},
+                    {'$set': {'song_count': {'$size': '$songs'}}}
+                ],
+                session=session
+            )
+        return affected
+
+    @staticmethod
+    def recompute_aggregates(batch_size=500, missing_only=False):
+        # Reparatur: song_count und total_duration_ms aller Playlists per
+        # Aggregation aus songs neu berechnen und gebündelt zurückschreiben
+        # ($unwind vor $lookup, damit Duplikate mehrfach zählen). Geschrieben
+        # wird nur, wenn die Playlist seitdem unverändert ist. missing_only:
+        # nur Altbestand ohne die Felder nachtragen (init-db)
+        database = mongo.connect()
+        pipeline = [
+            {'$project': {'songs': 1, 'version': 1, 'song_count': 1, 'total_duration_ms': 1}},
+            {'$unwind': {'path': '$songs', 'preserveNullAndEmptyArrays': True}},
+            {'$lookup': {'from': 'songs', 'localField': 'songs', 'foreignField': '_id', 'as': 'song'}},
+            {'$group': {
+                '_id': '$_id',
+                'version': {'$first': '$version'},
+                'song_count': {'$first': '$song_count'},
+                'total_duration_ms': {'$first': '$total_duration_ms'},
+                'actual_count': {'$sum': {'$cond': [{'$ifNull': ['$songs', False]}, 1, 0]}},
+                'actual_duration': {'$sum': {'$sum': '$song.duration_ms'}}
+            }}
+        ]
+        if missing_only:
+            # None trifft fehlende Felder und null
+            pipeline.insert(0, {'$match': {'$or': [{'song_count': None}, {'total_duration_ms': None}]}})
+        cursor = database.playlists.aggregate(pipeline, allowDiskUse=True)
+        scanned = fixed = 0
+        batch = []
         for doc in cursor:
-            playlist = Playlist(doc['name'], doc['user_id'], doc.get('songs', []))
-            playlist.id = doc['_id']
-            playlists.append(playlist)
-        return playlists
+            scanned += 1
+            if doc.get('song_count') == doc['actual_count'] and doc.get('total_duration_ms') == doc['actual_duration']:
+                continue
+            batch.append(UpdateOne({'_id': doc['_id'], 'version': doc.get('version')}, {'$set': {
+                'song_count': doc['actual_count'],
+                'total_duration_ms': doc['actual_duration'],
+                'updated_at': _now()
+            }}))
+            if len(batch) >= batch_size:
+                fixed += database.playlists.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            fixed += database.playlists.bulk_write(batch, ordered=False).modified_count
+        return scanned, fixed
 
 # ================= FAVORITE =================
 class Favorite:
     @staticmethod
     def create(user_id, song_id):
-        mongo.connect().favorites.insert_one({
-            'user_id': user_id,
-            'song_id': ObjectId(song_id)
-        })
+        # Upsert gegen den (user_id, song_id)-Index: True, wenn neu angelegt
+        key = {'user_id': user_id, 'song_id': ObjectId(song_id)}
+        result = mongo.connect().favorites.update_one(
+            key,
+            {'$setOnInsert': dict(key, updated_at=_now())},
+            upsert=True,
+            session=mongo.session()
+        )
+        return result.upserted_id is not None
 
     @staticmethod
     def delete(user_id, song_id):
-        mongo.connect().favorites.delete_one({
+        result = mongo.connect().favorites.delete_one({
             'user_id': user_id,
             'song_id': ObjectId(song_id)
-        })
+        }, session=mongo.session())
+        if result.deleted_count:
+            Tombstone.record(user_id, 'favorites', [ObjectId(song_id)])
+        return result.deleted_count == 1
+
+    @staticmethod
+    def create_many(user_id, song_ids):
+        if not song_ids:
+            return 0
+        requests = []
+        now = _now()
+        for song_id in song_ids:
+            key = {'user_id': user_id, 'song_id': ObjectId(song_id)}
+            requests.append(UpdateOne(key, {'$setOnInsert': dict(key, updated_at=now)}, upsert=True))
+        result = mongo.connect().favorites.bulk_write(requests, ordered=False, session=mongo.session())
+        return result.upserted_count
+
+    @staticmethod
+    def delete_many(user_id, song_ids):
+        if not song_ids:
+            return 0
+        ids = [ObjectId(s) for s in song_ids]
+        result = mongo.connect().favorites.delete_many({
+            'user_id': user_id,
+            'song_id': {'$in': ids}
+        }, session=mongo.session())
+        if result.deleted_count:
+            # Welche der IDs tatsächlich Favoriten waren, ist nicht bekannt;
+            # überzählige Tombstones sind für Clients ein No-op
+            Tombstone.record(user_id, 'favorites', ids)
+        return result.deleted_count
 
     @staticmethod
     def get_by_user(user_id):
-        cursor = mongo.connect().favorites.find({'user_id': user_id})
-        return [doc['song_id'] for doc in cursor]
\ No newline at end of file
+        cursor = mongo.connect().reader('favorites', 'Favorite.get_by_user').find(
+            {'user_id': user_id},
+            session=mongo.session()
+        )
+        return [doc['song_id'] for doc in cursor]
+
+    @staticmethod
+    def get_song_ids(user_id):
+        # Nur die song_ids laden (vom (user_id, song_id)-Index abgedeckt)
+        cursor = mongo.connect().reader('favorites', 'Favorite.get_song_ids').find(
+            {'user_id': user_id},
+            projection={'_id': 0, 'song_id': 1},
+            session=mongo.session()
+        )
+        return {doc['song_id'] for doc in cursor}
+
+    @staticmethod
+    def get_changed(user_id, since):
+        # {song_id: updated_at}; die Zeit braucht GET /sync, um Tombstones
+        # eines danach erneut gesetzten Favoriten zu verwerfen
+        cursor = mongo.connect().favorites.find(
+            {'user_id': user_id, 'updated_at': {'$gte': since}},
+            projection={'_id': 0, 'song_id': 1, 'updated_at': 1},
+            session=mongo.session()
+        )
+        return {doc['song_id']: doc['updated_at'] for doc in cursor}
+
+# ================= TOMBSTONE =================
+SYNC_KINDS = ('songs', 'playlists', 'favorites')
+
+class Tombstone:
+    # Löschungen für den Delta-Sync; item_id ist die Song-, Playlist- bzw.
+    # (bei Favoriten) die Song-ID
+    @staticmethod
+    def record(user_id, kind, item_ids):
+        now = _now()
+        docs = [{'user_id': user_id, 'kind': kind, 'item_id': item_id, 'deleted_at': now} for item_id in item_ids]
+        if docs:
+            mongo.connect().tombstones.insert_many(docs, ordered=False, session=mongo.session())
+
+    @staticmethod
+    def get_since(user_id, since):
+        # {kind: {item_id: deleted_at}} mit der jeweils letzten Löschung
+        cursor = mongo.connect().tombstones.find(
+            {'user_id': user_id, 'deleted_at': {'$gte': since}},
+            projection={'_id': 0, 'kind': 1, 'item_id': 1, 'deleted_at': 1},
+            session=mongo.session()
+        )
+        deleted = {kind: {} for kind in SYNC_KINDS}
+        for doc in cursor:
+            items = deleted.setdefault(doc['kind'], {})
+            items[doc['item_id']] = max(doc['deleted_at'], items.get(doc['item_id'], doc['deleted_at']))
+        return deleted
+
+# ================= LIBRARY =================
+class Library:
+    @staticmethod
+    def version(user_id, kinds):
+        # Billiger Stand der Bibliothek für den Antwort-Cache: Anzahl und
+        # letztes updated_at je Collection (vom (user_id, updated_at)-Index
+        # abgedeckt) plus die letzte Löschung. Jeder Write der Models setzt
+        # updated_at oder legt einen Tombstone an, ändert also den Stand
+        database = mongo.connect()
+        session = mongo.session()
+        version = []
+        for kind in kinds:
+            collection = database.reader(kind, 'Library.version')
+            newest = collection.find_one(
+                {'user_id': user_id},
+                projection={'_id': 0, 'updated_at': 1},
+                sort=[('updated_at', DESCENDING)],
+                session=session
+            )
+            version.append(collection.count_documents({'user_id': user_id}, session=session))
+            version.append(newest.get('updated_at') if newest else None)
+        deleted = database.reader('tombstones', 'Library.version').find_one(
+            {'user_id': user_id, 'kind': {'$in': list(kinds)}},
+            projection={'_id': 0, 'deleted_at': 1},
+            sort=[('deleted_at', DESCENDING)],
+            session=session
+        )
+        version.append(deleted['deleted_at'] if deleted else None)
+        return tuple(version)
+
+# ================= EVENT =================
+EVENT_TYPES = {'play', 'skip', 'seek'}
+
+class Event:
+    @staticmethod
+    def insert_many(events):
+        # ordered=False: ein fehlerhaftes Dokument stoppt nicht den Rest.
+        # Events tragen ihren _id schon beim Puffern, ein erneuter Versuch
+        # scheitert für bereits geschriebene also am Duplicate Key. Gibt
+        # (geschrieben, erneut zu versuchen) zurück
+        if not events:
+            return [], []
+        try:
+            mongo.connect().events.insert_many(events, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            failed = {error['index'] for error in errors}
+            retry = [events[error['index']] for error in errors if error.get('code') != DUPLICATE_KEY]
+            return [event for i, event in enumerate(events) if i not in failed], retry
+        return events, []
+
+# ================= STATS =================
+STATS_COLLECTIONS = ('stats_daily', 'stats_monthly', 'stats_songs', 'stats_artists')
+STATS_KEYS = {
+    'stats_daily': ('user_id', 'day'),
+    'stats_monthly': ('user_id', 'month'),
+    'stats_songs': ('user_id', 'song_id'),
+    'stats_artists': ('user_id', 'month', 'artist')
+}
+# Neuaufbau landet zuerst in <name>_rebuild und ersetzt dann per Rename
+REBUILD_SUFFIX = '_rebuild'
+
+class Stats:
+    @staticmethod
+    def create_indexes(collection, name):
+        collection.create_index([(field, ASCENDING) for field in STATS_KEYS[name]], unique=True)
+        if name == 'stats_artists':
+            collection.create_index([('user_id', ASCENDING), ('month', ASCENDING), ('plays', DESCENDING)])
+
+    @staticmethod
+    def increment(rollups, suffix=''):
+        # rollups: {collection: [(schluessel, {'feld': delta}), ...]}
+        db = mongo.connect().db
+        for name, updates in rollups.items():
+            requests = [
+                UpdateOne(key, {'$inc': inc}, upsert=True)
+                for key, inc in updates
+            ]
+            if requests:
+                db[name + suffix].bulk_write(requests, ordered=False)
+
+    @staticmethod
+    def prepare_rebuild():
+        # Leere Zielcollections mit denselben eindeutigen Indizes (die
+        # parallelen $inc-Upserts brauchen sie)
+        Stats.drop_rebuild()
+        db = mongo.connect().db
+        for name in STATS_COLLECTIONS:
+            Stats.create_indexes(db[name + REBUILD_SUFFIX], name)
+
+    @staticmethod
+    def drop_rebuild():
+        db = mongo.connect().db
+        for name in STATS_COLLECTIONS:
+            db.drop_collection(name + REBUILD_SUFFIX)
+
+    @staticmethod
+    def swap_rebuild():
+        db = mongo.connect().db
+        for name in STATS_COLLECTIONS:
+            db[name + REBUILD_SUFFIX].rename(name, dropTarget=True)
+
+    @staticmethod
+    def get_monthly(user_id, month):
+        return mongo.connect().reader('stats_monthly', 'Stats.get_monthly').find_one(
+            {'user_id': user_id, 'month': month},
+            projection={'_id': 0}
+        )
+
+    @staticmethod
+    def get_daily(user_id, first_day, last_day):
+        cursor = mongo.connect().reader('stats_daily', 'Stats.get_daily').find(
+            {'user_id': user_id, 'day': {'$gte': first_day, '$lte': last_day}},
+            projection={'_id': 0}
+        ).sort('day', ASCENDING)
+        return list(cursor)
+
+    @staticmethod
+    def get_top_artists(user_id, month, limit):
+        cursor = mongo.connect().reader('stats_artists', 'Stats.get_top_artists').find(
+            {'user_id': user_id, 'month': month},
+            projection={'_id': 0, 'artist': 1, 'plays': 1, 'skips': 1, 'listened_ms': 1}
+        ).sort('plays', DESCENDING).limit(limit)
+        return list(cursor)
+
+    @staticmethod
+    def get_songs_by_user(user_id):
+        cursor = mongo.connect().reader('stats_songs', 'Stats.get_songs_by_user').find(
+            {'user_id': user_id},
+            projection={'_id': 0, 'song_id': 1, 'plays': 1, 'skips': 1}
+        )
+        return list(cursor)
+
+    @staticmethod
+    def get_song(user_id, song_id):
+        return mongo.connect().reader('stats_songs', 'Stats.get_song').find_one(
+            {'user_id': user_id, 'song_id': ObjectId(song_id)},
+            projection={'_id': 0}
+        )
+
+# ================= MAINTENANCE =================
+class Maintenance:
+    # Zustand von Hintergrundjobs (Checkpoints, Leases) als ein Dokument pro Job
+    @staticmethod
+    def get(name):
+        return mongo.connect().maintenance.find_one({'_id': name}) or {}
+
+    @staticmethod
+    def save(name, fields):
+        mongo.connect().maintenance.update_one({'_id': name}, {'$set': fields}, upsert=True)
+
+    @staticmethod
+    def acquire_lease(name, seconds, owner=None):
+        # Nur ein Prozess bekommt den Job, bis die Lease abläuft; mit owner
+        # kann der Halter seine eigene Lease vorher verlängern
+        now = datetime.now(timezone.utc)
+        free = [{'lease_until': {'$lt': now}}, {'lease_until': None}]
+        if owner is not None:
+            free.append({'lease_owner': owner})
+        try:
+            mongo.connect().maintenance.find_one_and_update(
+                {'_id': name, '$or': free},
+                {'$set': {'lease_until': now + timedelta(seconds=seconds), 'lease_owner': owner}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    @staticmethod
+    def release_lease(name, owner):
+        mongo.connect().maintenance.update_one(
+            {'_id': name, 'lease_owner': owner},
+            {'$set': {'lease_until': None, 'lease_owner': None}}
+        )
@@ -1,10 +1,24 @@
 # app/models/mysql_user.py
+import os
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, event, exc
+from sqlalchemy.pool import Pool
 
 db = SQLAlchemy()
 
+# Verbindungen aus dem Pool nie über fork() hinweg teilen: eine im
+# Elternprozess geöffnete Verbindung wird im Kind verworfen und neu aufgebaut
+@event.listens_for(Pool, 'connect')
+def _remember_pid(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+@event.listens_for(Pool, 'checkout')
+def _check_pid(dbapi_connection, connection_record, connection_proxy):
+    if connection_record.info.get('pid', os.getpid()) != os.getpid():
+        connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+        raise exc.DisconnectionError('Verbindung stammt aus einem anderen Prozess')
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -0,0 +1,80 @@
+# Opt-in Profiling einzelner Requests mit cProfile. Ist PROFILING_ENABLED
+# aus, werden keine Hooks registriert (kein Overhead). Sonst wird ein
+# Request profiliert, wenn er zufällig gezogen wird (PROFILING_SAMPLE_RATE)
+# oder ein Admin (PROFILING_ADMIN_IDS) den Header X-Profile: 1 schickt.
+# Jedes Profil landet als pstats-Datei mit Route und Dauer im Namen in
+# PROFILING_DIR (z. B. mit `python -m pstats` oder snakeviz auswerten).
+# Der Dateiname steht im Log; als Header X-Profile-File geht er nur im
+# Debug-Modus an den Client, damit keine Serverpfade nach außen gelangen.
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+
+from flask import g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+PROFILE_HEADER = 'X-Profile'
+logger = logging.getLogger(__name__)
+
+
+def _requested_by_admin(admin_ids):
+    if request.headers.get(PROFILE_HEADER) != '1' or not admin_ids:
+        return False
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return False
+    return get_jwt_identity() in admin_ids
+
+
+def _profile_path(directory, duration_ms):
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    route = re.sub(r'[^A-Za-z0-9]+', '_', rule).strip('_') or 'root'
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    return os.path.join(directory, f'{stamp}_{request.method}_{route}_{duration_ms}ms.prof')
+
+
+def init_app(app):
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+
+    sample_rate = float(app.config.get('PROFILING_SAMPLE_RATE', 0.0))
+    admin_ids = set(app.config.get('PROFILING_ADMIN_IDS') or ())
+    directory = app.config['PROFILING_DIR']
+    os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def start_profiler():
+        if random.random() < sample_rate or _requested_by_admin(admin_ids):
+            g.profiler_start = time.perf_counter()
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def stop_profiler(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        duration_ms = int((time.perf_counter() - g.pop('profiler_start')) * 1000)
+        path = _profile_path(directory, duration_ms)
+        try:
+            profiler.dump_stats(path)
+        except OSError:
+            logger.exception('Profil konnte nicht geschrieben werden')
+            return response
+        logger.info('Profil geschrieben', extra={'profile_file': path, 'duration_ms': duration_ms})
+        if app.debug:
+            response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    # Bei Exceptions läuft after_request evtl. nicht: Profiler trotzdem stoppen
+    @app.teardown_request
+    def discard_profiler(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
@@ -3,5 +3,8 @@ from .auth_routes import auth_bp
 from .song_routes import song_bp
 from .playlist_routes import playlist_bp
 from .favorite_routes import favorite_bp
+from .event_routes import event_bp
+from .stats_routes import stats_bp
+from .sync_routes import sync_bp
 
-__all__ = ['auth_bp', 'song_bp', 'playlist_bp', 'favorite_bp']
\ No newline at end of file
+__all__ = ['auth_bp', 'song_bp', 'playlist_bp', 'favorite_bp', 'event_bp', 'stats_bp', 'sync_bp']
\ No newline at end of file
@@ -0,0 +1,102 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.mongo_models import EVENT_TYPES
+from app.services import change_feed
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+
+event_bp = Blueprint('events', __name__)
+MAX_EVENTS_PER_REQUEST = 1000
+# Uhren der Clients gehen ungenau; weiter in der Zukunft ist ein Fehler
+MAX_CLOCK_SKEW = timedelta(days=1)
+
+def _non_negative_int(value):
+    return value is None or (isinstance(value, int) and not isinstance(value, bool) and value >= 0)
+
+def parse_event(raw, user_id, received_at):
+    if not isinstance(raw, dict) or raw.get('type') not in EVENT_TYPES:
+        return None, 'Ungültiger Event-Typ (play, skip, seek)'
+    song_id = raw.get('song_id')
+    if not isinstance(song_id, str) or not ObjectId.is_valid(song_id):
+        return None, 'Ungültige song_id'
+    for field in ('ts', 'position_ms', 'listened_ms'):
+        if not _non_negative_int(raw.get(field)):
+            return None, f'{field} muss eine Zahl ≥ 0 sein'
+    
+    ts = received_at
+    if raw.get('ts') is not None:
+        try:
+            ts = datetime.fromtimestamp(raw['ts'] / 1000, tz=timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            return None, 'ts außerhalb des gültigen Bereichs'
+        if ts > received_at + MAX_CLOCK_SKEW:
+            return None, 'ts liegt in der Zukunft'
+    event = {
+        # Fester _id schon beim Puffern: ein erneuter Schreibversuch legt
+        # das Event nicht doppelt an
+        '_id': ObjectId(),
+        'type': raw['type'],
+        'user_id': user_id,
+        'song_id': ObjectId(song_id),
+        'ts': ts,
+        'received_at': received_at
+    }
+    for field in ('position_ms', 'listened_ms'):
+        if raw.get(field) is not None:
+            event[field] = raw[field]
+    return event, None
+
+@event_bp.route('', methods=['POST'])
+@jwt_required()
+def ingest_events():
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'events erforderlich'}), 400
+    raw_events = data.get('events')
+    if not isinstance(raw_events, list) or not raw_events:
+        return jsonify({'error': 'events erforderlich'}), 400
+    if len(raw_events) > MAX_EVENTS_PER_REQUEST:
+        return jsonify({'error': f'Maximal {MAX_EVENTS_PER_REQUEST} Events pro Anfrage'}), 400
+    
+    received_at = datetime.now(timezone.utc)
+    events = []
+    for raw in raw_events:
+        event, error = parse_event(raw, user_id, received_at)
+        if error:
+            return jsonify({'error': error}), 400
+        events.append(event)
+    
+    # Backpressure: Client soll später erneut senden
+    if not current_app.extensions['event_buffer'].add(events):
+        response = jsonify({'error': 'Eventpuffer voll, bitte später erneut senden'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    return jsonify({'message': 'Events angenommen', 'accepted': len(events)}), 202
+
+@event_bp.route('/stream', methods=['GET'])
+@jwt_required()
+def stream_changes():
+    feed = current_app.extensions.get('change_feed')
+    if feed is None or not feed.available:
+        return jsonify({'error': 'Änderungs-Stream nicht verfügbar, bitte GET /sync abfragen'}), 503
+    
+    user_id = get_jwt_identity()
+    subscription, missed = feed.subscribe(user_id, request.headers.get('Last-Event-ID'))
+    if subscription is None:
+        response = jsonify({'error': 'Zu viele offene Änderungs-Streams, bitte GET /sync abfragen'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    # Ohne stream_with_context: der Request-Kontext (und die Mongo-Session)
+    # endet sofort, der Generator braucht nur die Subscription
+    response = current_app.response_class(
+        change_feed.stream(feed, subscription, missed, current_app.config.get('SSE_HEARTBEAT', 15)),
+        mimetype='text/event-stream'
+    )
+    # Gibt den Platz auch frei, wenn der Body nie gelesen wird (dann läuft
+    # das finally im Generator nicht)
+    response.call_on_close(lambda: feed.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx soll nicht puffern
+    return response
@@ -1,16 +1,31 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.mongo_models import Favorite, Song, mongo
+from app.models.mongo_models import Favorite, Library, Song, mongo
+from app.services import recommender, shuffle
+from app import compression
 from bson import ObjectId
+import logging
 
 favorite_bp = Blueprint('favorites', __name__)
+logger = logging.getLogger(__name__)
+MAX_BATCH_SIZE = 500
+
+def parse_song_ids(data):
+    song_ids = (data or {}).get('song_ids')
+    if not isinstance(song_ids, list) or not song_ids:
+        return None, 'song_ids erforderlich'
+    if len(song_ids) > MAX_BATCH_SIZE:
+        return None, f'Maximal {MAX_BATCH_SIZE} Songs pro Anfrage'
+    if not all(isinstance(s, str) and ObjectId.is_valid(s) for s in song_ids):
+        return None, 'Ungültige song_id'
+    return list(dict.fromkeys(song_ids)), None
 
 @favorite_bp.route('/mark', methods=['POST'])
 @jwt_required()
 def mark_favorite():
     user_id = get_jwt_identity()
     data = request.get_json()
-    print(f"[favorite_routes] mark_favorite called user={user_id} data={data}")
+    logger.debug('mark_favorite', extra={'user_id': user_id})
     song_id = data.get('song_id')
     
     if not song_id:
@@ -20,37 +35,68 @@ def mark_favorite():
     if not song or song.user_id != user_id:
         return jsonify({'error': 'Song nicht gefunden oder Zugriff verweigert'}), 404
     
-    # Check if already favorite
-    favorites = Favorite.get_by_user(user_id)
-    if ObjectId(song_id) in favorites:
+    if not Favorite.create(user_id, song_id):
         return jsonify({'error': 'Song ist bereits Favorit'}), 400
-    
-    Favorite.create(user_id, song_id)
+    recommender.favorites_added(user_id, [song_id])
+    shuffle.invalidate(user_id)
     return jsonify({'message': 'Favorit markiert'}), 200
 
+@favorite_bp.route('/mark-batch', methods=['POST'])
+@jwt_required()
+def mark_favorites_batch():
+    user_id = get_jwt_identity()
+    song_ids, error = parse_song_ids(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
+    
+    owned = Song.filter_owned(user_id, song_ids)
+    accepted = [s for s in song_ids if ObjectId(s) in owned]
+    rejected = [s for s in song_ids if ObjectId(s) not in owned]
+    marked = Favorite.create_many(user_id, accepted)
+    recommender.favorites_added(user_id, accepted)
+    shuffle.invalidate(user_id)
+    return jsonify({'message': 'Favoriten markiert', 'marked': marked, 'rejected': rejected}), 200
+
 @favorite_bp.route('/unmark', methods=['DELETE'])
 @jwt_required()
 def unmark_favorite():
     user_id = get_jwt_identity()
     data = request.get_json()
-    print(f"[favorite_routes] unmark_favorite called user={user_id} data={data}")
+    logger.debug('unmark_favorite', extra={'user_id': user_id})
     song_id = data.get('song_id')
     
     if not song_id:
         return jsonify({'error': 'song_id erforderlich'}), 400
+    if not ObjectId.is_valid(song_id):
+        return jsonify({'error': 'Ungültige song_id'}), 400
+    
+    removed = Favorite.delete(user_id, song_id)
+    if removed:
+        recommender.favorites_removed(user_id, [song_id])
+        shuffle.invalidate(user_id)
+    return jsonify({'message': 'Favorit entfernt', 'removed': removed}), 200
+
+@favorite_bp.route('/unmark-batch', methods=['DELETE'])
+@jwt_required()
+def unmark_favorites_batch():
+    user_id = get_jwt_identity()
+    song_ids, error = parse_song_ids(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
     
-    Favorite.delete(user_id, song_id)
-    return jsonify({'message': 'Favorit entfernt'}), 200
+    removed = Favorite.delete_many(user_id, song_ids)
+    recommender.favorites_removed(user_id, song_ids)
+    shuffle.invalidate(user_id)
+    return jsonify({'message': 'Favoriten entfernt', 'removed': removed}), 200
 
 @favorite_bp.route('/list', methods=['GET'])
 @jwt_required()
 def list_favorites():
     user_id = get_jwt_identity()
+    cached = compression.lookup(('favorites', user_id), lambda: Library.version(user_id, ('favorites', 'songs')))
+    if cached is not None:
+        return cached
     song_ids = Favorite.get_by_user(user_id)
-    songs = []
-    for sid in song_ids:
-        song = Song.get_by_id(str(sid))
-        if song and song.user_id == user_id:
-            songs.append(song.to_dict())
-    print(f"[favorite_routes] list_favorites user={user_id} favorites_count={len(songs)}")
+    songs = [song.to_dict() for song in Song.get_by_ids(user_id, song_ids)]
+    logger.debug('list_favorites', extra={'user_id': user_id, 'count': len(songs)})
     return jsonify(songs), 200
\ No newline at end of file
@@ -1,9 +1,48 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.mongo_models import Playlist, mongo
+from app.models.mongo_models import Library, Playlist, PLAYLIST_OPS, mongo
+from app.services import recommender, shuffle
+from app import compression
 from bson import ObjectId
+import logging
 
 playlist_bp = Blueprint('playlists', __name__)
+logger = logging.getLogger(__name__)
+MAX_OPS_PER_REQUEST = 500
+
+def parse_operations(raw_ops, current_songs):
+    # Prüft die Operationen gegen den bekannten Stand der Playlist und gibt
+    # (ops, neue Songliste, fehler) zurück. So schlägt ein Batch nicht erst
+    # nach der Hälfte fehl.
+    if not isinstance(raw_ops, list) or not raw_ops:
+        return None, None, 'ops muss eine nicht-leere Liste sein'
+    if len(raw_ops) > MAX_OPS_PER_REQUEST:
+        return None, None, f'Maximal {MAX_OPS_PER_REQUEST} Operationen pro Anfrage'
+    songs = [str(s) for s in current_songs]
+    ops = []
+    for raw in raw_ops:
+        if not isinstance(raw, dict) or raw.get('op') not in PLAYLIST_OPS:
+            return None, None, 'Ungültige Operation (add, remove, move)'
+        song_id = raw.get('song_id')
+        if not isinstance(song_id, str) or not ObjectId.is_valid(song_id):
+            return None, None, 'Ungültige song_id'
+        position = raw.get('position')
+        if position is not None and (isinstance(position, bool) or not isinstance(position, int) or position < 0):
+            return None, None, 'position muss eine Zahl ≥ 0 sein'
+        op = {'op': raw['op'], 'song_id': song_id, 'position': position}
+        if raw['op'] == 'add':
+            if song_id in songs:
+                return None, None, f'Song {song_id} ist bereits in der Playlist'
+            songs.insert(len(songs) if position is None else position, song_id)
+        elif song_id not in songs:
+            return None, None, f'Song {song_id} ist nicht in der Playlist'
+        else:
+            # Alle Vorkommen (ältere Playlists können Duplikate enthalten)
+            songs = [s for s in songs if s != song_id]
+            if raw['op'] == 'move':
+                songs.insert(len(songs) if position is None else position, song_id)
+        ops.append(op)
+    return ops, songs, None
 
 @playlist_bp.route('/create', methods=['POST'])
 @jwt_required()
@@ -15,14 +54,18 @@ def create_playlist():
     
     if not name:
         return jsonify({'error': 'Ungültiger Playlist-Name'}), 400
+    if not isinstance(songs, list):
+        return jsonify({'error': 'songs muss eine Liste sein'}), 400
     
+    accepted, rejected = Playlist.validate_songs(user_id, songs)
     playlist_data = {
         'name': name,
         'user_id': user_id,
-        'songs': [ObjectId(s) for s in songs if ObjectId.is_valid(s)]
+        'songs': accepted
     }
     playlist = Playlist.create(playlist_data)
-    return jsonify({'message': 'Playlist erstellt', 'playlist': playlist.to_dict()}), 201
+    recommender.playlist_changed(playlist.id, playlist_data['songs'])
+    return jsonify({'message': 'Playlist erstellt', 'playlist': playlist.to_dict(), 'rejected': rejected}), 201
 
 @playlist_bp.route('/<playlist_id>', methods=['PUT'])
 @jwt_required()
@@ -33,16 +76,59 @@ def update_playlist(playlist_id):
         return jsonify({'error': 'Playlist nicht gefunden oder Zugriff verweigert'}), 404
     
     data = request.get_json()
+    version = data.get('version')
+    if version is not None and (isinstance(version, bool) or not isinstance(version, int)):
+        return jsonify({'error': 'version muss eine Zahl sein'}), 400
     updates = {}
+    rejected = []
     if 'name' in data:
         updates['name'] = data['name']
     if 'songs' in data:
-        updates['songs'] = [ObjectId(s) for s in data['songs'] if ObjectId.is_valid(s)]
+        if not isinstance(data['songs'], list):
+            return jsonify({'error': 'songs muss eine Liste sein'}), 400
+        updates['songs'], rejected = Playlist.validate_songs(user_id, data['songs'])
+    
+    if updates and not Playlist.update(playlist_id, updates, version):
+        return jsonify({'error': 'Playlist wurde zwischenzeitlich geändert'}), 409
+    if 'songs' in updates:
+        recommender.playlist_changed(playlist_id, updates['songs'])
+    
+    return jsonify({'message': 'Playlist aktualisiert', 'rejected': rejected}), 200
+
+@playlist_bp.route('/<playlist_id>/songs', methods=['PATCH'])
+@jwt_required()
+def edit_playlist_songs(playlist_id):
+    user_id = get_jwt_identity()
+    playlist = Playlist.get_by_id(playlist_id)
+    if not playlist or playlist.user_id != user_id:
+        return jsonify({'error': 'Playlist nicht gefunden oder Zugriff verweigert'}), 404
     
-    if updates:
-        Playlist.update(playlist_id, updates)
+    data = request.get_json() or {}
+    version = data.get('version')
+    if isinstance(version, bool) or not isinstance(version, int):
+        return jsonify({'error': 'version erforderlich'}), 400
+    if version != playlist.version:
+        return jsonify({'error': 'Playlist wurde zwischenzeitlich geändert', 'version': playlist.version}), 409
     
-    return jsonify({'message': 'Playlist aktualisiert'}), 200
+    ops, songs, error = parse_operations(data.get('ops'), playlist.songs)
+    if error:
+        return jsonify({'error': error}), 400
+    added = [op['song_id'] for op in ops if op['op'] == 'add']
+    if added:
+        _, rejected = Playlist.validate_songs(user_id, added)
+        if rejected:
+            return jsonify({'error': 'Songs nicht gefunden oder Zugriff verweigert', 'rejected': rejected}), 400
+    
+    new_version = Playlist.apply_operations(playlist_id, ops, version)
+    if new_version is None:
+        current = Playlist.get_by_id(playlist_id)
+        return jsonify({
+            'error': 'Playlist wurde zwischenzeitlich geändert',
+            'version': current.version if current else None
+        }), 409
+    
+    recommender.playlist_changed(playlist_id, songs)
+    return jsonify({'message': 'Playlist aktualisiert', 'version': new_version}), 200
 
 @playlist_bp.route('/<playlist_id>', methods=['DELETE'])
 @jwt_required()
@@ -52,14 +138,29 @@ def delete_playlist(playlist_id):
     if not playlist or playlist.user_id != user_id:
         return jsonify({'error': 'Playlist nicht gefunden oder Zugriff verweigert'}), 404
     
-    Playlist.delete(playlist_id)
+    Playlist.delete(playlist_id, user_id)
+    recommender.playlist_deleted(playlist_id)
     return jsonify({'message': 'Playlist gelöscht'}), 200
 
+@playlist_bp.route('/<playlist_id>/queue', methods=['GET'])
+@jwt_required()
+def playlist_queue(playlist_id):
+    user_id = get_jwt_identity()
+    playlist = Playlist.get_by_id(playlist_id)
+    if not playlist or playlist.user_id != user_id:
+        return jsonify({'error': 'Playlist nicht gefunden oder Zugriff verweigert'}), 404
+    
+    weights = shuffle.get_weights(user_id, current_app.config.get('SHUFFLE_WEIGHTS_TTL', 300))
+    queue = shuffle.generate_queue(playlist.songs, weights, request.args.get('seed', type=int))
+    return jsonify({'playlist_id': playlist_id, 'songs': queue}), 200
+
 @playlist_bp.route('/list', methods=['GET'])
 @jwt_required()
 def list_playlists():
     user_id = get_jwt_identity()
+    cached = compression.lookup(('playlists', user_id), lambda: Library.version(user_id, ('playlists',)))
+    if cached is not None:
+        return cached
     playlists = Playlist.get_by_user(user_id)
-    # small debug log to help frontend troubleshooting
-    print(f"[playlist_routes] list_playlists user={user_id} count={len(playlists)}")
+    logger.debug('list_playlists', extra={'user_id': user_id, 'count': len(playlists)})
     return jsonify([p.to_dict() for p in playlists]), 200
\ No newline at end of file
@@ -1,7 +1,14 @@
-from flask import Blueprint, request, jsonify, send_from_directory, Response, current_app
+from flask import Blueprint, request, jsonify, send_file, redirect, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
 from werkzeug.utils import secure_filename
-from app.models.mongo_models import Song, mongo
+from urllib.parse import quote as url_quote
+from app.models.mongo_models import Song, Favorite, Library, Playlist, mongo
+from app.services import artwork, file_gc, media, recommender, shuffle
+from app.routes.favorite_routes import parse_song_ids
+from app.storage import get_storage
+from app import bandwidth, compression
 import os
 from app.config import Config
 from bson import ObjectId
@@ -9,9 +16,120 @@ from bson import ObjectId
 song_bp = Blueprint('songs', __name__)
 ALLOWED_EXTENSIONS = {'mp3', 'flac'}
 
+# Songs und Cover werden nie verändert, nur ersetzt (neues ETag)
+STORED_MAX_AGE = 365 * 24 * 3600
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def send_stored_file(key, mimetype=None, as_attachment=False):
+    storage = get_storage()
+    download_name = os.path.basename(key)
+    
+    # Signierte URL: die Bytes fließen direkt vom Storage zum Client
+    if current_app.config.get('STORAGE_REDIRECT'):
+        expires = current_app.config.get('PRESIGN_EXPIRES', 3600)
+        url = storage.presign(key, expires, download_name if as_attachment else None)
+        if url:
+            response = redirect(url, 302)
+            response.cache_control.private = True
+            response.cache_control.max_age = expires // 2
+            return response
+    
+    offload = current_app.config.get('AUDIO_OFFLOAD')
+    if offload:
+        response = offload_response(offload, storage, key, mimetype, as_attachment, download_name)
+        if response is not None:
+            return response
+    
+    try:
+        info = storage.stat(key)
+    except (OSError, ValueError):
+        return jsonify({'error': 'Datei nicht gefunden'}), 404
+    
+    # Werkzeug wertet Range vor If-None-Match aus; ein Replay mit
+    # Range-Header soll aber trotzdem nur ein 304 kosten (RFC 9110, 13.2.2)
+    if not is_resource_modified(request.environ, etag=info.etag, last_modified=info.last_modified, ignore_if_range=True):
+        response = current_app.response_class(status=304)
+        response.set_etag(info.etag)
+        response.last_modified = info.last_modified
+    elif storage.local_path(key):
+        # Range, If-Range und sendfile übernimmt send_file (conditional=True)
+        response = send_file(
+            storage.local_path(key),
+            mimetype=mimetype,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            etag=info.etag,
+            last_modified=info.last_modified
+        )
+    else:
+        response = send_remote(storage, key, info, mimetype, as_attachment, download_name)
+    return set_stored_cache_headers(response)
+
+def set_stored_cache_headers(response):
+    # private: Antworten hängen am JWT und gehören nicht in geteilte Caches
+    response.cache_control.no_cache = None
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = STORED_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def offload_response(mode, storage, key, mimetype, as_attachment, download_name):
+    # Nach der Rechteprüfung übernimmt der Proxy Range, 304, sendfile und
+    # Keep-Alive; der Worker ist sofort wieder frei. Nur für lokale Dateien
+    try:
+        path = storage.local_path(key)
+    except ValueError:
+        return jsonify({'error': 'Datei nicht gefunden'}), 404
+    if path is None:
+        return None
+    
+    response = current_app.response_class(mimetype=mimetype or 'application/octet-stream')
+    if mode == 'x-accel':
+        relative = os.path.relpath(path, storage.root).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = current_app.config['AUDIO_OFFLOAD_PREFIX'] + url_quote(relative)
+    elif mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = path
+    else:
+        raise ValueError(f'Unbekannter AUDIO_OFFLOAD-Modus: {mode}')
+    if as_attachment:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return set_stored_cache_headers(response)
+
+def send_remote(storage, key, info, mimetype, as_attachment, download_name):
+    # Nur den angefragten Bereich vom Storage holen und durchreichen
+    start, stop, status = 0, info.size, 200
+    use_range = request.range is not None and (
+        'If-Range' not in request.headers
+        or not is_resource_modified(request.environ, etag=info.etag, last_modified=info.last_modified)
+    )
+    if use_range:
+        byte_range = request.range.range_for_length(info.size)
+        if byte_range is None:
+            response = current_app.response_class(status=416)
+            response.content_range = ContentRange(None, None, None, info.size)
+            return response
+        (start, stop), status = byte_range, 206
+    
+    response = current_app.response_class(
+        storage.open_range(key, start, stop),
+        status,
+        mimetype=mimetype or 'application/octet-stream',
+        direct_passthrough=True
+    )
+    response.content_length = stop - start
+    response.accept_ranges = 'bytes'
+    if status == 206:
+        response.content_range = ContentRange('bytes', start, stop, info.size)
+    response.set_etag(info.etag)
+    response.last_modified = info.last_modified
+    if as_attachment:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
+
 @song_bp.route('/upload', methods=['POST'])
 @jwt_required()
 def upload_song():
@@ -31,14 +149,12 @@ def upload_song():
         return jsonify({'error': f'Größe überschritten (≤{max_len} bytes)'}), 400
     
     filename = secure_filename(file.filename)
-    # Ensure upload folder exists
-    upload_dir = current_app.config.get('UPLOAD_FOLDER')
-    if not os.path.isabs(upload_dir):
-        upload_dir = os.path.abspath(upload_dir)
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, f"{user_id}_{filename}")  # User-specific
+    key = f"{user_id}_{filename}"  # User-specific
+    storage = get_storage()
+    audio = media.probe(file.stream)
+    art_id = artwork.process_upload(storage, audio)
     try:
-        file.save(file_path)
+        storage.put(key, file.stream, content_type=file.mimetype)
     except Exception as e:
         return jsonify({'error': 'Datei konnte nicht gespeichert werden', 'detail': str(e)}), 500
     
@@ -48,8 +164,10 @@ def upload_song():
         'artist': data.get('artist', 'Unbekannt'),
         'album': data.get('album', ''),
         'genre': data.get('genre', ''),
-        'file_path': file_path,
-        'user_id': user_id
+        'file_path': key,
+        'user_id': user_id,
+        'art_id': art_id,
+        'duration_ms': media.duration_ms(audio)
     }
     song = Song.create(song_data)
     
@@ -63,34 +181,8 @@ def stream_song(song_id):
     if not song or song.user_id != user_id:
         return jsonify({'error': 'Song nicht gefunden'}), 404
     
-    range_header = request.headers.get('Range', None)
-    file_path = song.file_path
-    file_size = os.path.getsize(file_path)
-    mimetype = 'audio/flac' if file_path.lower().endswith('.flac') else 'audio/mpeg'
-    
-    if not range_header:
-        return send_from_directory(os.path.dirname(file_path), os.path.basename(file_path), mimetype=mimetype)
-    
-    byte1, byte2 = 0, file_size - 1
-    if range_header:
-        b1, b2 = range_header.replace('bytes=', '').split('-')
-        byte1 = int(b1)
-        byte2 = int(b2) if b2 else file_size - 1
-    
-    length = byte2 - byte1 + 1
-    with open(file_path, 'rb') as f:
-        f.seek(byte1)
-        data = f.read(length)
-    
-    rv = Response(
-        data,
-        206,
-        mimetype=mimetype,
-        direct_passthrough=True
-    )
-    rv.headers['Content-Range'] = f'bytes {byte1}-{byte2}/{file_size}'
-    rv.headers['Accept-Ranges'] = 'bytes'
-    return rv
+    mimetype = 'audio/flac' if song.file_path.lower().endswith('.flac') else 'audio/mpeg'
+    return bandwidth.shape(send_stored_file(song.file_path, mimetype=mimetype), user_id, 'stream')
 
 @song_bp.route('/<song_id>/download', methods=['GET'])
 @jwt_required()
@@ -100,15 +192,82 @@ def download_song(song_id):
     if not song or song.user_id != user_id:
         return jsonify({'error': 'Song nicht verfügbar'}), 404
     
-    return send_from_directory(
-        os.path.dirname(song.file_path),
-        os.path.basename(song.file_path),
-        as_attachment=True
-    )
+    return bandwidth.shape(send_stored_file(song.file_path, as_attachment=True), user_id, 'download')
+
+@song_bp.route('/<song_id>/art', methods=['GET'])
+@jwt_required()
+def song_art(song_id):
+    user_id = get_jwt_identity()
+    song = Song.get_by_id(song_id)
+    if not song or song.user_id != user_id or not song.art_id:
+        return jsonify({'error': 'Kein Cover vorhanden'}), 404
+    
+    size = artwork.pick_size(request.args.get('size', artwork.DEFAULT_SIZE, type=int))
+    return send_stored_file(artwork.art_key(song.art_id, size), mimetype='image/jpeg')
+
+def delete_songs(user_id, song_ids):
+    # Kaskade mit je einem Bulk-Statement pro Collection statt pro Song
+    deleted = Song.delete_many(user_id, song_ids)
+    if not deleted:
+        return deleted
+    deleted_ids = [str(song.id) for song in deleted]
+    playlist_ids = Playlist.remove_songs(user_id, deleted)
+    Favorite.delete_many(user_id, deleted_ids)
+    file_gc.delete_song_files(get_storage(), deleted)
+    recommender.songs_deleted(user_id, deleted_ids, playlist_ids)
+    shuffle.invalidate(user_id)
+    return deleted
+
+@song_bp.route('/<song_id>', methods=['DELETE'])
+@jwt_required()
+def delete_song(song_id):
+    user_id = get_jwt_identity()
+    if not delete_songs(user_id, [song_id]):
+        return jsonify({'error': 'Song nicht gefunden'}), 404
+    return jsonify({'message': 'Song gelöscht'}), 200
+
+@song_bp.route('/delete-batch', methods=['DELETE'])
+@jwt_required()
+def delete_songs_batch():
+    user_id = get_jwt_identity()
+    song_ids, error = parse_song_ids(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    deleted = {str(song.id) for song in delete_songs(user_id, song_ids)}
+    rejected = [s for s in song_ids if s not in deleted]
+    return jsonify({'message': 'Songs gelöscht', 'deleted': len(deleted), 'rejected': rejected}), 200
 
 @song_bp.route('/list', methods=['GET'])
 @jwt_required()
 def list_songs():
     user_id = get_jwt_identity()
+    with_favorites = request.args.get('with_favorites', '').lower() in ('1', 'true')
+    kinds = ('songs', 'favorites') if with_favorites else ('songs',)
+    cached = compression.lookup(('songs', user_id, with_favorites), lambda: Library.version(user_id, kinds))
+    if cached is not None:
+        return cached
+    
     songs = Song.get_by_user(user_id)
-    return jsonify([s.to_dict() for s in songs]), 200
\ No newline at end of file
+    if not with_favorites:
+        return jsonify([s.to_dict() for s in songs]), 200
+    
+    # Favoriten einmal als Set laden statt pro Song nachzufragen
+    favorite_ids = Favorite.get_song_ids(user_id)
+    result = []
+    for song in songs:
+        song_dict = song.to_dict()
+        song_dict['is_favorite'] = song.id in favorite_ids
+        result.append(song_dict)
+    return jsonify(result), 200
+
+@song_bp.route('/<song_id>/similar', methods=['GET'])
+@jwt_required()
+def similar_songs(song_id):
+    user_id = get_jwt_identity()
+    song = Song.get_by_id(song_id)
+    if not song or song.user_id != user_id:
+        return jsonify({'error': 'Song nicht gefunden'}), 404
+    
+    k = min(max(request.args.get('k', 10, type=int), 1), recommender.TOP_K)
+    return jsonify(recommender.get_index().similar(song_id, k)), 200
\ No newline at end of file
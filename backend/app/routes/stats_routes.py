@@ -0,0 +1,86 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.mongo_models import Stats
+from bson import ObjectId
+from datetime import datetime, timezone, timedelta
+
+stats_bp = Blueprint('stats', __name__)
+MAX_TOP_ARTISTS = 50
+MAX_DAILY_RANGE = 366
+EMPTY_COUNTERS = {'plays': 0, 'skips': 0, 'seeks': 0, 'listened_ms': 0}
+
+def _parse_month(value):
+    if value is None:
+        return datetime.now(timezone.utc).strftime('%Y-%m')
+    try:
+        return datetime.strptime(value, '%Y-%m').strftime('%Y-%m')
+    except ValueError:
+        return None
+
+def _parse_day(value, default):
+    if value is None:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def _with_defaults(doc):
+    return {**EMPTY_COUNTERS, **(doc or {})}
+
+@stats_bp.route('/overview', methods=['GET'])
+@jwt_required()
+def overview():
+    user_id = get_jwt_identity()
+    month = _parse_month(request.args.get('month'))
+    if not month:
+        return jsonify({'error': 'month im Format YYYY-MM erwartet'}), 400
+    
+    stats = _with_defaults(Stats.get_monthly(user_id, month))
+    stats.pop('user_id', None)
+    stats['month'] = month
+    return jsonify(stats), 200
+
+@stats_bp.route('/top-artists', methods=['GET'])
+@jwt_required()
+def top_artists():
+    user_id = get_jwt_identity()
+    month = _parse_month(request.args.get('month'))
+    if not month:
+        return jsonify({'error': 'month im Format YYYY-MM erwartet'}), 400
+    
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_TOP_ARTISTS)
+    artists = [_with_defaults(a) for a in Stats.get_top_artists(user_id, month, limit)]
+    return jsonify({'month': month, 'artists': artists}), 200
+
+@stats_bp.route('/daily', methods=['GET'])
+@jwt_required()
+def daily():
+    user_id = get_jwt_identity()
+    today = datetime.now(timezone.utc).date()
+    last_day = _parse_day(request.args.get('to'), today)
+    first_day = _parse_day(request.args.get('from'), (last_day or today) - timedelta(days=29))
+    if not first_day or not last_day or first_day > last_day:
+        return jsonify({'error': 'from/to im Format YYYY-MM-DD erwartet'}), 400
+    if (last_day - first_day).days >= MAX_DAILY_RANGE:
+        return jsonify({'error': f'Maximal {MAX_DAILY_RANGE} Tage'}), 400
+    
+    days = Stats.get_daily(user_id, first_day.isoformat(), last_day.isoformat())
+    for day in days:
+        day.pop('user_id', None)
+    return jsonify([_with_defaults(d) for d in days]), 200
+
+@stats_bp.route('/songs/<song_id>', methods=['GET'])
+@jwt_required()
+def song_stats(song_id):
+    user_id = get_jwt_identity()
+    if not ObjectId.is_valid(song_id):
+        return jsonify({'error': 'Ungültige song_id'}), 400
+    
+    stats = _with_defaults(Stats.get_song(user_id, song_id))
+    stats.pop('user_id', None)
+    stats['song_id'] = song_id
+    # plays und skips sind getrennte Events: Anteil der Skips an beiden
+    started = stats['plays'] + stats['skips']
+    stats['skip_rate'] = stats['skips'] / started if started else 0.0
+    return jsonify(stats), 200
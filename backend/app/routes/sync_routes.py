@@ -0,0 +1,65 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.mongo_models import Song, Playlist, Favorite, Tombstone, SYNC_KINDS
+from datetime import datetime, timezone, timedelta
+
+# Delta-Sync: ohne since alles, mit since nur, was sich seit der vorherigen
+# Antwort geändert hat oder gelöscht wurde. Das Token ist die Serverzeit
+# dieser Antwort (ms seit Epoch, für Clients opak). Abgefragt wird ab
+# token - SYNC_LOOKBACK, damit Writes mit etwas älterem Zeitstempel
+# (Uhrabweichung zwischen Workern, noch laufende Writes) nicht verloren
+# gehen; doppelt gelieferte Einträge überschreiben beim Client nur sich selbst.
+sync_bp = Blueprint('sync', __name__)
+
+def encode_token(moment):
+    return str(int(moment.timestamp() * 1000))
+
+def decode_token(token):
+    try:
+        return datetime.fromtimestamp(int(token) / 1000, timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise ValueError('Ungültiges since-Token')
+
+@sync_bp.route('', methods=['GET'])
+@jwt_required()
+def sync():
+    user_id = get_jwt_identity()
+    now = datetime.now(timezone.utc)
+    since = None
+    if request.args.get('since'):
+        try:
+            since = decode_token(request.args['since'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        since -= timedelta(seconds=current_app.config.get('SYNC_LOOKBACK', 10))
+    
+    # Tombstones älter als die TTL sind weg: dann hilft nur ein Voll-Sync
+    ttl = current_app.config.get('SYNC_TOMBSTONE_TTL', 30 * 24 * 3600)
+    full = since is None or since < now - timedelta(seconds=ttl)
+    deleted = {kind: [] for kind in SYNC_KINDS}
+    if full:
+        songs = Song.get_by_user(user_id)
+        playlists = Playlist.get_by_user(user_id)
+        favorites = Favorite.get_song_ids(user_id)
+    else:
+        songs = Song.get_changed(user_id, since)
+        playlists = Playlist.get_changed(user_id, since)
+        changed_favorites = Favorite.get_changed(user_id, since)
+        favorites = changed_favorites.keys()
+        tombstones = Tombstone.get_since(user_id, since)
+        deleted['songs'] = [str(i) for i in tombstones['songs']]
+        deleted['playlists'] = [str(i) for i in tombstones['playlists']]
+        # Danach erneut gesetzte Favoriten gelten nicht als gelöscht
+        deleted['favorites'] = [
+            str(song_id) for song_id, deleted_at in tombstones['favorites'].items()
+            if song_id not in changed_favorites or changed_favorites[song_id] < deleted_at
+        ]
+    
+    return jsonify({
+        'token': encode_token(now),
+        'full': full,
+        'songs': [s.to_dict() for s in songs],
+        'playlists': [p.to_dict() for p in playlists],
+        'favorites': [str(s) for s in favorites],
+        'deleted': deleted
+    }), 200
@@ -0,0 +1,83 @@
+# Cover-Art aus ID3 (APIC) bzw. FLAC (PICTURE) einmalig beim Upload
+# extrahieren und in festen Thumbnail-Größen im Storage ablegen. Die Bilder
+# sind nach dem SHA-256 der Originaldaten benannt: alle Songs eines Albums
+# mit identischem Cover teilen sich dieselben Dateien, die zudem nie
+# verändert werden (immutable cachebar).
+import hashlib
+import logging
+from io import BytesIO
+
+from mutagen.id3 import ID3
+from PIL import Image
+
+ART_SIZES = (96, 300, 600)
+DEFAULT_SIZE = 300
+JPEG_QUALITY = 85
+FRONT_COVER = 3  # Bildtyp "Cover (front)" in ID3 und FLAC
+
+logger = logging.getLogger(__name__)
+
+
+def art_key(art_id, size):
+    return f'art/{art_id}/{size}.jpg'
+
+
+def pick_size(requested):
+    # Kleinste vorberechnete Größe, die die angefragte abdeckt
+    for size in ART_SIZES:
+        if requested <= size:
+            return size
+    return ART_SIZES[-1]
+
+
+def _choose(pictures):
+    # Frontcover bevorzugen, sonst das erste Bild
+    pictures = list(pictures)
+    for picture in pictures:
+        if picture.type == FRONT_COVER:
+            return picture.data
+    return pictures[0].data if pictures else None
+
+
+def extract(audio):
+    """Bilddaten des eingebetteten Covers einer mutagen-Datei oder None."""
+    if audio is None:
+        return None
+    if getattr(audio, 'pictures', None):
+        return _choose(audio.pictures)
+    if isinstance(audio.tags, ID3):
+        return _choose(audio.tags.getall('APIC'))
+    return None
+
+
+def store(storage, data):
+    """Thumbnails ablegen (falls noch nicht vorhanden) und art_id liefern."""
+    art_id = hashlib.sha256(data).hexdigest()[:32]
+    try:
+        storage.stat(art_key(art_id, ART_SIZES[-1]))
+        return art_id
+    except FileNotFoundError:
+        pass
+
+    image = Image.open(BytesIO(data))
+    image = image.convert('RGB')
+    # Größte zuletzt schreiben: sie dient oben als "schon vorhanden"-Marker
+    for size in ART_SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        thumbnail.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        buffer.seek(0)
+        storage.put(art_key(art_id, size), buffer, content_type='image/jpeg')
+    return art_id
+
+
+def process_upload(storage, audio):
+    # audio stammt aus media.probe(). Ein kaputtes oder fehlendes Cover darf
+    # den Upload nie scheitern lassen
+    try:
+        data = extract(audio)
+        return store(storage, data) if data else None
+    except Exception:
+        logger.warning('Cover konnte nicht extrahiert werden', exc_info=True)
+        return None
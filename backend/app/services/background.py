@@ -0,0 +1,33 @@
+# Hintergrund-Thread für Dienste, die pro Worker-Prozess laufen. Der Thread
+# startet lazy beim ersten ensure_started() im jeweiligen Prozess: ein vor
+# fork() gestarteter Thread existiert im Kindprozess nicht mehr, und unter
+# gunicorn mit preload_app würde er sonst nur im Master laufen.
+import os
+import threading
+
+
+class ProcessThread:
+    def __init__(self, target, name):
+        self.target = target
+        self.name = name
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def is_running(self):
+        """True, wenn der Thread in diesem Prozess läuft."""
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def ensure_started(self):
+        if self.is_running():
+            return
+        with self._lock:
+            if not self.is_running():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self.target, name=self.name, daemon=True)
+                self._thread.start()
+
+    def join(self, timeout=None):
+        # Nur einen im eigenen Prozess gestarteten Thread abwarten
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=timeout)
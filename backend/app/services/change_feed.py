@@ -0,0 +1,227 @@
+# Server-Push von Bibliotheksänderungen (GET /events/stream, SSE). Pro
+# Prozess beobachtet genau ein Change Stream songs, playlists, favorites und
+# tombstones; ein Thread verteilt jede Änderung an die Queues der
+# verbundenen Clients des betroffenen Users. Tausende wartende Clients
+# kosten so einen einzigen Cursor statt ständiger Polls. Löschungen kommen
+# über die Tombstones (die gelöschten Dokumente tragen keine user_id mehr).
+#
+# Jede Nachricht trägt das Resume-Token des Change Streams als SSE-id. Ein
+# Client, der sich mit Last-Event-ID neu verbindet, bekommt verpasste
+# Änderungen aus einem Ringpuffer nachgeliefert; ist das Token dort nicht
+# mehr enthalten (oder läuft seine Queue über), kommt ein resync-Event und
+# der Client gleicht über GET /sync ab. Change Streams brauchen ein Replica
+# Set; ohne antwortet der Endpoint mit 503.
+#
+# Mehrere Worker: Jeder Worker hat seinen eigenen Change Stream und seinen
+# eigenen Ringpuffer, die Tokens sind aber dieselben. Ein Replay klappt nur,
+# wenn die neue Verbindung beim selben Worker landet und das Token dort noch
+# im Puffer liegt; sonst bekommt der Client resync (nie stillen Verlust).
+#
+# Jeder SSE-Client belegt bei gthread-Workern dauerhaft einen Thread. Damit
+# normale Requests nicht leer ausgehen, nimmt ein Worker höchstens
+# SSE_MAX_CONNECTIONS Clients an, darüber gibt es 503 und der Client fragt
+# GET /sync ab. Mit gevent-Workern kann die Grenze hoch gesetzt werden.
+import collections
+import json
+import logging
+import queue
+import threading
+import time
+
+from pymongo.errors import OperationFailure
+
+from app.models.mongo_models import mongo
+from app.services.background import ProcessThread
+
+WATCHED = ('songs', 'playlists', 'favorites', 'tombstones')
+HISTORY_LOST = 286  # ChangeStreamHistoryLost: Resume-Token zu alt
+NOT_REPLICA_SET = 40573
+RETRY_MS = 5000
+MAX_BACKOFF = 60
+
+# Nur die Felder, die für das Routing gebraucht werden
+PIPELINE = [
+    {'$match': {
+        'ns.coll': {'$in': list(WATCHED)},
+        'operationType': {'$in': ['insert', 'update', 'replace']}
+    }},
+    {'$project': {
+        'ns.coll': 1,
+        'documentKey': 1,
+        'fullDocument.user_id': 1,
+        'fullDocument.song_id': 1,
+        'fullDocument.kind': 1,
+        'fullDocument.item_id': 1
+    }}
+]
+
+logger = logging.getLogger(__name__)
+
+
+def to_notification(change):
+    """(user_id, Nachricht) für ein Change-Event oder None."""
+    doc = change.get('fullDocument') or {}
+    user_id = doc.get('user_id')
+    if user_id is None:
+        # z. B. Update auf ein inzwischen gelöschtes Dokument
+        return None
+    collection = change['ns']['coll']
+    if collection == 'tombstones':
+        return user_id, {'kind': doc['kind'], 'id': str(doc['item_id']), 'op': 'delete'}
+    item_id = doc['song_id'] if collection == 'favorites' else change['documentKey']['_id']
+    return user_id, {'kind': collection, 'id': str(item_id), 'op': 'upsert'}
+
+
+def format_event(token, notification):
+    return f'id: {token}\nevent: change\ndata: {json.dumps(notification)}\n\n'
+
+
+def format_resync():
+    return 'event: resync\ndata: {}\n\n'
+
+
+class Subscription:
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = queue.Queue(queue_size)
+        self.lost = False  # Änderungen verpasst: Client muss neu abgleichen
+        self.closed = False
+
+
+class ChangeFeed:
+    def __init__(self, app, queue_size=100, replay_size=1000, max_connections=None):
+        self.app = app
+        self.queue_size = queue_size
+        self.max_connections = max_connections  # pro Worker, None = unbegrenzt
+        self.available = True
+        self._subscribers = collections.defaultdict(set)
+        self._connections = 0
+        self._recent = collections.deque(maxlen=replay_size)  # (token, user_id, Nachricht)
+        self._lock = threading.Lock()
+        self._thread = ProcessThread(self._run, 'change-feed')
+
+    def subscribe(self, user_id, last_event_id=None):
+        # Gibt (Subscription, verpasste Nachrichten) zurück; None statt einer
+        # Liste, wenn last_event_id nicht mehr im Ringpuffer liegt. Replay und
+        # Anmeldung unter demselben Lock, damit dazwischen nichts verloren geht.
+        # Ist der Worker voll, (None, None)
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            if self.max_connections is not None and self._connections >= self.max_connections:
+                return None, None
+            self._thread.ensure_started()
+            missed = self._replay(user_id, last_event_id) if last_event_id else []
+            self._subscribers[user_id].add(subscription)
+            self._connections += 1
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        # Zählt die Verbindung frei, auch wenn die Subscription schon wegen
+        # Überlauf oder resync abgehängt wurde
+        with self._lock:
+            if subscription.closed:
+                return
+            subscription.closed = True
+            self._connections -= 1
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def _replay(self, user_id, last_event_id):
+        tokens = [token for token, _, _ in self._recent]
+        if last_event_id not in tokens:
+            return None
+        start = tokens.index(last_event_id) + 1
+        return [(token, n) for token, uid, n in list(self._recent)[start:] if uid == user_id]
+
+    def dispatch(self, token, user_id, notification):
+        with self._lock:
+            self._recent.append((token, user_id, notification))
+            for subscription in list(self._subscribers.get(user_id, ())):
+                try:
+                    subscription.queue.put_nowait((token, notification))
+                except queue.Full:
+                    # Langsamer Client: abhängen statt den Feed aufzuhalten
+                    subscription.lost = True
+                    self._subscribers[user_id].discard(subscription)
+
+    def resync_all(self):
+        # Die Kontinuität ist unterbrochen: alte Tokens taugen nicht mehr zum Replay
+        with self._lock:
+            self._recent.clear()
+            for subscribers in self._subscribers.values():
+                for subscription in subscribers:
+                    subscription.lost = True
+            self._subscribers.clear()
+
+    def _run(self):
+        token = None
+        backoff = 1
+        while True:
+            try:
+                with self.app.app_context():
+                    database = mongo.connect().db
+                    with database.watch(PIPELINE, full_document='updateLookup', resume_after=token) as stream:
+                        self.available = True
+                        backoff = 1
+                        for change in stream:
+                            token = change['_id']
+                            routed = to_notification(change)
+                            if routed is not None:
+                                self.dispatch(token['_data'], *routed)
+            except OperationFailure as e:
+                if e.code == NOT_REPLICA_SET:
+                    logger.error('Change Streams brauchen ein Replica Set, /events/stream ist deaktiviert')
+                    self.available = False
+                    self.resync_all()
+                    return
+                if e.code == HISTORY_LOST:
+                    logger.warning('Resume-Token verfallen, Change Stream startet neu')
+                    token = None
+                    self.resync_all()
+                else:
+                    logger.exception('Change Stream abgebrochen')
+            except Exception:
+                logger.exception('Change Stream abgebrochen')
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+def stream(feed, subscription, missed, heartbeat):
+    """SSE-Body: Replay, dann Änderungen und Heartbeats bis zum Verbindungsende."""
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        if missed is None:
+            yield format_resync()
+        else:
+            for token, notification in missed:
+                yield format_event(token, notification)
+        while True:
+            if subscription.lost and subscription.queue.empty():
+                yield format_resync()
+                return
+            try:
+                token, notification = subscription.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                # Kommentarzeile: hält Proxies und NAT-Verbindungen offen und
+                # lässt einen getrennten Client beim Schreiben auffallen
+                yield ': ping\n\n'
+                continue
+            yield format_event(token, notification)
+    finally:
+        feed.unsubscribe(subscription)
+
+
+def init_app(app):
+    if not app.config.get('CHANGE_FEED_ENABLED', True):
+        return None
+    feed = ChangeFeed(
+        app,
+        queue_size=app.config.get('SSE_QUEUE_SIZE', 100),
+        replay_size=app.config.get('SSE_REPLAY_SIZE', 1000),
+        max_connections=app.config.get('SSE_MAX_CONNECTIONS')
+    )
+    app.extensions['change_feed'] = feed
+    return feed
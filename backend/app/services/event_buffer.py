@@ -0,0 +1,109 @@
+# Puffert Player-Events im Prozess und schreibt sie gesammelt per
+# insert_many, sobald FLUSH_SIZE erreicht oder FLUSH_INTERVAL abgelaufen
+# ist. Ist der Puffer voll, lehnt add() neue Events ab (Backpressure),
+# statt den Speicher unbegrenzt wachsen zu lassen. Der writer gibt die
+# Events zurück, die erneut versucht werden sollen (z. B. nach einem
+# teilweise fehlgeschlagenen insert_many); wirft er, kommt der ganze Batch
+# zurück in den Puffer. Wiederholen muss daher idempotent sein (fester _id).
+import atexit
+import logging
+import threading
+
+from app.services import rollups
+from app.services.background import ProcessThread
+
+logger = logging.getLogger(__name__)
+
+
+class EventBuffer:
+    def __init__(self, writer, flush_size=500, flush_interval=2.0, max_size=20000):
+        self.writer = writer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._events = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = ProcessThread(self._run, 'event-buffer')
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._events)
+
+    def add(self, events):
+        with self._cond:
+            if self._closed or len(self._events) + len(events) > self.max_size:
+                return False
+            self._events.extend(events)
+            self._thread.ensure_started()
+            if len(self._events) >= self.flush_size:
+                self._cond.notify()
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._events) < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                batch, self._events = self._events, []
+            if not batch:
+                return 0
+            try:
+                retry = self.writer(batch) or []
+            except Exception:
+                logger.exception('Events konnten nicht geschrieben werden (%d)', len(batch))
+                self._requeue(batch)
+                return 0
+            if retry:
+                logger.warning('%d Events werden erneut versucht', len(retry))
+                self._requeue(retry)
+            return len(batch) - len(retry)
+
+    def _requeue(self, batch):
+        with self._cond:
+            room = self.max_size - len(self._events)
+            if room < len(batch):
+                logger.error('Eventpuffer voll, %d Events verworfen', len(batch) - max(room, 0))
+            self._events[:0] = batch[:max(room, 0)]
+
+    def close(self):
+        # Beim Herunterfahren: Thread stoppen und den Rest noch schreiben
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=self.flush_interval + 5)
+        with self._flush_lock:
+            with self._cond:
+                batch, self._events = self._events, []
+            if batch:
+                try:
+                    retry = self.writer(batch) or []
+                except Exception:
+                    logger.exception('Events beim Herunterfahren verloren (%d)', len(batch))
+                    return
+                if retry:
+                    logger.error('Events beim Herunterfahren verloren (%d)', len(retry))
+
+
+def init_app(app):
+    def write(batch):
+        with app.app_context():
+            return rollups.record(batch)
+
+    buffer = EventBuffer(
+        write,
+        flush_size=app.config['EVENT_FLUSH_SIZE'],
+        flush_interval=app.config['EVENT_FLUSH_INTERVAL'],
+        max_size=app.config['EVENT_BUFFER_MAX']
+    )
+    app.extensions['event_buffer'] = buffer
+    atexit.register(buffer.close)
+    return buffer
@@ -0,0 +1,156 @@
+# Inkrementelle Garbage Collection verwaister Dateien im Storage. Pro
+# Durchgang wird nur ein Batch von Schlüsseln gelistet und mit zwei
+# $in-Queries gegen songs.file_path bzw. songs.art_id geprüft; der letzte
+# Schlüssel landet als Checkpoint in der maintenance-Collection, sodass der
+# nächste Durchgang (auch nach einem Neustart) dort weitermacht. Dateien
+# jünger als FILE_GC_MIN_AGE bleiben liegen: ein laufender Upload hat seine
+# Datei schon geschrieben, den Song aber evtl. noch nicht angelegt.
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+
+from app.models.mongo_models import Maintenance, Song
+from app.services.artwork import art_key, ART_SIZES
+from app.services.background import ProcessThread
+from app.storage import get_storage
+
+JOB_NAME = 'file_gc'
+LEASE_SECONDS = 300  # pro Batch der CLI, wird danach freigegeben
+ART_PREFIX = 'art/'
+
+logger = logging.getLogger(__name__)
+
+
+def _art_id(key):
+    # art/<art_id>/<size>.jpg
+    parts = key.split('/')
+    return parts[1] if len(parts) == 3 else None
+
+
+def collect_batch(storage, batch_size, min_age, now=None):
+    """Einen Batch prüfen; gibt (geprüft, gelöscht, Durchlauf fertig) zurück."""
+    now = now or datetime.now(timezone.utc)
+    state = Maintenance.get(JOB_NAME)
+    entries = storage.list_keys(state.get('last_key'), batch_size)
+
+    audio_keys = [key for key, _ in entries if not key.startswith(ART_PREFIX)]
+    art_ids = {_art_id(key) for key, _ in entries if key.startswith(ART_PREFIX)} - {None}
+    referenced = Song.referenced_files([alias for key in audio_keys for alias in storage.key_aliases(key)])
+    referenced_art = Song.referenced_art(art_ids)
+
+    cutoff = now - timedelta(seconds=min_age)
+    deleted = 0
+    for key, last_modified in entries:
+        if last_modified > cutoff:
+            continue
+        if key.startswith(ART_PREFIX):
+            if _art_id(key) in referenced_art:
+                continue
+        elif any(alias in referenced for alias in storage.key_aliases(key)):
+            continue
+        storage.delete(key)
+        deleted += 1
+
+    done = len(entries) < batch_size
+    Maintenance.save(JOB_NAME, {
+        'last_key': None if done else entries[-1][0],
+        'updated_at': now
+    })
+    if deleted:
+        logger.info('Verwaiste Dateien gelöscht', extra={'deleted': deleted, 'scanned': len(entries)})
+    return len(entries), deleted, done
+
+
+def run(storage, batch_size, min_age, max_batches=None, owner=None):
+    # Bis zum Ende eines Durchlaufs (oder max_batches) weiterarbeiten. Mit
+    # owner wird vor jedem Batch die Lease geholt bzw. verlängert, damit
+    # nicht gleichzeitig der Hintergrund-Thread denselben Checkpoint bearbeitet
+    scanned = deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        if owner is not None and not Maintenance.acquire_lease(JOB_NAME, LEASE_SECONDS, owner):
+            raise RuntimeError('Datei-GC läuft bereits in einem anderen Prozess')
+        batch_scanned, batch_deleted, done = collect_batch(storage, batch_size, min_age)
+        scanned += batch_scanned
+        deleted += batch_deleted
+        batches += 1
+        if done:
+            break
+    return scanned, deleted
+
+
+def delete_song_files(storage, songs):
+    # Dateien gelöschter Songs sofort freigeben, sofern kein anderer Song
+    # denselben Schlüssel bzw. dasselbe Cover nutzt (auch in anderer
+    # Schreibweise, s. key_aliases); Fehler holt die GC nach
+    keys = {song.file_path for song in songs}
+    art_ids = {song.art_id for song in songs if song.art_id}
+    try:
+        aliases = {key: storage.key_aliases(key) for key in keys}
+        still_used = Song.referenced_files([alias for key in keys for alias in aliases[key]])
+        art_in_use = Song.referenced_art(art_ids)
+        for key in keys:
+            if not any(alias in still_used for alias in aliases[key]):
+                storage.delete(key)
+        for art_id in art_ids - art_in_use:
+            for size in ART_SIZES:
+                storage.delete(art_key(art_id, size))
+    except Exception:
+        logger.warning('Dateien gelöschter Songs bleiben für die GC liegen', exc_info=True)
+
+
+class GcWorker:
+    # Optionaler Hintergrund-Thread: ein Batch pro Intervall. Die Lease in
+    # maintenance sorgt dafür, dass bei mehreren Workern nur einer arbeitet
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._thread = ProcessThread(self._run, 'file-gc')
+
+    def ensure_started(self):
+        self._thread.ensure_started()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    if Maintenance.acquire_lease(JOB_NAME, self.interval):
+                        collect_batch(
+                            get_storage(),
+                            self.app.config['FILE_GC_BATCH_SIZE'],
+                            self.app.config['FILE_GC_MIN_AGE']
+                        )
+            except Exception:
+                logger.exception('Datei-GC fehlgeschlagen')
+
+
+def init_app(app):
+    @app.cli.command('gc-files')
+    @click.option('--batches', type=int, default=None, help='Höchstens so viele Batches (Standard: ganzer Durchlauf)')
+    def gc_files(batches):
+        """Löscht Dateien im Storage, auf die kein Song mehr verweist."""
+        owner = f'cli-{socket.gethostname()}-{os.getpid()}'
+        try:
+            scanned, deleted = run(
+                get_storage(),
+                current_app.config['FILE_GC_BATCH_SIZE'],
+                current_app.config['FILE_GC_MIN_AGE'],
+                max_batches=batches,
+                owner=owner
+            )
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        finally:
+            Maintenance.release_lease(JOB_NAME, owner)
+        click.echo(f'{scanned} Dateien geprüft, {deleted} gelöscht')
+
+    interval = app.config.get('FILE_GC_INTERVAL', 0)
+    if interval > 0:
+        worker = GcWorker(app, interval)
+        app.extensions['file_gc'] = worker
+        app.before_request(worker.ensure_started)
@@ -0,0 +1,25 @@
+# Hochgeladene Audiodateien genau einmal mit mutagen parsen; Dauer und
+# Cover-Art (app.services.artwork) werden aus demselben Objekt gelesen.
+import logging
+
+import mutagen
+
+logger = logging.getLogger(__name__)
+
+
+def probe(stream):
+    """Geparste mutagen-Datei oder None; der Stream steht danach wieder am Anfang."""
+    try:
+        return mutagen.File(stream)
+    except Exception:
+        logger.warning('Audiodatei konnte nicht gelesen werden', exc_info=True)
+        return None
+    finally:
+        stream.seek(0)
+
+
+def duration_ms(audio):
+    length = getattr(getattr(audio, 'info', None), 'length', None)
+    if not length or length < 0:
+        return None
+    return int(round(length * 1000))
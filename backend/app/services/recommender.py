@@ -0,0 +1,377 @@
+# Ähnliche Songs aus gemeinsamen Vorkommen in Playlists und Favoriten.
+#
+# Jede Playlist und die Favoriten eines Users bilden einen "Korb". Die
+# Co-Occurrence-Matrix C = B^T B (B = Körbe x Songs) und die Top-K-Listen
+# aller Songs werden offline gebaut (`flask build-similarity-index`); jeder
+# Worker lädt sie beim Start nur noch (post_worker_init in gunicorn.conf.py)
+# und hält sie im Speicher. Änderungen an Playlists/Favoriten landen als
+# kleines Delta neben C und werden nur für die betroffenen Zeilen neu
+# gerankt; Anfragen lesen ausschließlich die vorberechneten Top-K-Listen.
+#
+# Die Deltas gelten nur im eigenen Worker: andere Worker sehen eine Änderung
+# erst nach dem nächsten Batch-Lauf (regelmäßig per Cron ausführen). Ersetzt
+# ein Batch-Lauf die Datei, lädt der Worker sie neu und spielt die lokal
+# geänderten Körbe danach wieder ein.
+import os
+import threading
+
+import click
+import numpy as np
+from scipy import sparse
+from flask import current_app
+
+from app.models.mongo_models import mongo
+
+TOP_K = 50
+MERGE_THRESHOLD = 100000
+
+
+class SimilarityIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.song_ids = []
+        self.song_index = {}
+        self.baskets = {}
+        self.cooc = sparse.csr_matrix((0, 0), dtype=np.int32)
+        self.delta = {}
+        self.delta_size = 0
+        self.neighbours = {}
+        self.dirty = set()
+        # Seit dem Laden lokal geänderte Körbe: {schluessel: [song_id, ...]}
+        self.local_changes = {}
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    # ---------- Aufbau ----------
+
+    def _index_of(self, song_id):
+        song_id = str(song_id)
+        idx = self.song_index.get(song_id)
+        if idx is None:
+            idx = len(self.song_ids)
+            self.song_index[song_id] = idx
+            self.song_ids.append(song_id)
+        return idx
+
+    def build(self, baskets):
+        # baskets: {schluessel: [song_id, ...]}
+        with self._lock:
+            self._reset()
+            for key, song_ids in baskets.items():
+                members = frozenset(self._index_of(s) for s in song_ids)
+                if members:
+                    self.baskets[key] = members
+            self.cooc = self._cooc_from_baskets()
+            self._rank_rows(range(len(self.song_ids)))
+
+    def _basket_matrix(self):
+        rows, cols = [], []
+        keys = list(self.baskets)
+        for row, key in enumerate(keys):
+            members = self.baskets[key]
+            rows.extend([row] * len(members))
+            cols.extend(members)
+        data = np.ones(len(rows), dtype=np.int32)
+        matrix = sparse.csr_matrix(
+            (data, (rows, cols)),
+            shape=(len(keys), len(self.song_ids)),
+            dtype=np.int32
+        )
+        return keys, matrix
+
+    def _cooc_from_baskets(self):
+        _, matrix = self._basket_matrix()
+        cooc = (matrix.T @ matrix).tocsr()
+        cooc.setdiag(0)
+        cooc.eliminate_zeros()
+        return cooc
+
+    # ---------- Inkrementelle Updates ----------
+
+    def replace_basket(self, key, song_ids):
+        with self._lock:
+            old = self.baskets.get(key, frozenset())
+            new = frozenset(self._index_of(s) for s in song_ids)
+            self.local_changes[key] = [self.song_ids[i] for i in new]
+            if old == new:
+                return
+            if new:
+                self.baskets[key] = new
+            else:
+                self.baskets.pop(key, None)
+            self._apply_delta(old, new)
+
+    def add_to_basket(self, key, song_ids):
+        with self._lock:
+            old = self.baskets.get(key, frozenset())
+            self.replace_basket(key, [self.song_ids[i] for i in old] + list(song_ids))
+
+    def remove_from_basket(self, key, song_ids):
+        with self._lock:
+            old = self.baskets.get(key, frozenset())
+            removed = {self.song_index.get(str(s)) for s in song_ids}
+            self.replace_basket(key, [self.song_ids[i] for i in old - removed])
+
+    def drop_basket(self, key):
+        self.replace_basket(key, [])
+
+    def _apply_delta(self, old, new):
+        # outer(new) - outer(old): nur Paare mit einem hinzugefügten oder
+        # entfernten Song ändern sich
+        added, removed, kept = new - old, old - new, old & new
+        for sign, changed, members in ((1, added, new), (-1, removed, old)):
+            for i in changed:
+                for j in members:
+                    if i == j:
+                        continue
+                    self._bump(i, j, sign)
+                    if j in kept:
+                        self._bump(j, i, sign)
+        if self.delta_size > MERGE_THRESHOLD:
+            self._merge_delta()
+        # Neu gerankt wird erst bei der nächsten Anfrage für die Zeile, damit
+        # eine Änderung an einer großen Playlist billig bleibt
+        self.dirty.update(added | removed | kept)
+
+    def _bump(self, i, j, sign):
+        row = self.delta.setdefault(i, {})
+        value = row.get(j, 0) + sign
+        if value:
+            row[j] = value
+            self.delta_size += 1
+        else:
+            row.pop(j, None)
+
+    def _merge_delta(self):
+        rows, cols, data = [], [], []
+        for i, row in self.delta.items():
+            for j, value in row.items():
+                rows.append(i)
+                cols.append(j)
+                data.append(value)
+        n = len(self.song_ids)
+        cooc = self.cooc.copy()
+        cooc.resize((n, n))
+        cooc = cooc + sparse.csr_matrix((data, (rows, cols)), shape=(n, n), dtype=np.int32)
+        cooc.eliminate_zeros()
+        self.cooc = cooc.tocsr()
+        self.delta = {}
+        self.delta_size = 0
+
+    # ---------- Ranking ----------
+
+    def _row(self, i):
+        if i < self.cooc.shape[0]:
+            start, end = self.cooc.indptr[i], self.cooc.indptr[i + 1]
+            cols = self.cooc.indices[start:end]
+            scores = self.cooc.data[start:end]
+        else:
+            cols = np.empty(0, dtype=np.int32)
+            scores = np.empty(0, dtype=np.int32)
+        extra = self.delta.get(i)
+        if extra:
+            merged = dict(zip(cols.tolist(), scores.tolist()))
+            for j, value in extra.items():
+                merged[j] = merged.get(j, 0) + value
+            cols = np.fromiter(merged.keys(), dtype=np.int32, count=len(merged))
+            scores = np.fromiter(merged.values(), dtype=np.int32, count=len(merged))
+        return cols, scores
+
+    def _rank_rows(self, rows):
+        # Rohe Co-Occurrence-Zähler: dadurch ändern sich bei einem Update nur
+        # die Zeilen der Songs im geänderten Korb.
+        for i in rows:
+            self.dirty.discard(i)
+            cols, scores = self._row(i)
+            positive = scores > 0
+            cols, scores = cols[positive], scores[positive]
+            if len(cols) == 0:
+                self.neighbours.pop(i, None)
+                continue
+            if len(cols) > TOP_K:
+                top = np.argpartition(-scores, TOP_K)[:TOP_K]
+                cols, scores = cols[top], scores[top]
+            order = np.lexsort((cols, -scores))
+            self.neighbours[i] = (cols[order], scores[order])
+
+    def similar(self, song_id, k=10):
+        with self._lock:
+            idx = self.song_index.get(str(song_id))
+            if idx in self.dirty:
+                self._rank_rows([idx])
+            if idx is None or idx not in self.neighbours:
+                return []
+            cols, scores = self.neighbours[idx]
+            return [
+                {'song_id': self.song_ids[j], 'score': int(score)}
+                for j, score in zip(cols[:k].tolist(), scores[:k].tolist())
+            ]
+
+    # ---------- Persistenz ----------
+
+    def save(self, path):
+        # Körbe, C und die fertigen Top-K-Listen: Laden braucht dann kein
+        # B^T B und kein Ranking mehr
+        with self._lock:
+            self._merge_delta()
+            self._rank_rows(list(self.dirty))
+            keys, matrix = self._basket_matrix()
+            n = len(self.song_ids)
+            cooc = self.cooc.copy()
+            cooc.resize((n, n))
+            rows = sorted(self.neighbours)
+            lengths = [len(self.neighbours[i][0]) for i in rows]
+            empty = np.empty(0, dtype=np.int32)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f'{path}.tmp.npz'
+            np.savez_compressed(
+                tmp_path,
+                song_ids=np.array(self.song_ids, dtype=str),
+                keys=np.array(keys, dtype=str),
+                data=matrix.data,
+                indices=matrix.indices,
+                indptr=matrix.indptr,
+                shape=np.array(matrix.shape),
+                cooc_data=cooc.data,
+                cooc_indices=cooc.indices,
+                cooc_indptr=cooc.indptr,
+                top_rows=np.array(rows, dtype=np.int32),
+                top_indptr=np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))),
+                top_cols=np.concatenate([self.neighbours[i][0] for i in rows] or [empty]),
+                top_scores=np.concatenate([self.neighbours[i][1] for i in rows] or [empty])
+            )
+            os.replace(tmp_path, path)
+
+    def load(self, path):
+        with np.load(path) as stored:
+            song_ids = stored['song_ids'].tolist()
+            keys = stored['keys'].tolist()
+            matrix = sparse.csr_matrix(
+                (stored['data'], stored['indices'], stored['indptr']),
+                shape=tuple(stored['shape'])
+            )
+            if 'top_rows' in stored.files:
+                n = len(song_ids)
+                cooc = sparse.csr_matrix(
+                    (stored['cooc_data'], stored['cooc_indices'], stored['cooc_indptr']),
+                    shape=(n, n)
+                )
+                top = {
+                    name: stored[name]
+                    for name in ('top_rows', 'top_indptr', 'top_cols', 'top_scores')
+                }
+            else:
+                cooc = top = None
+        with self._lock:
+            pending = self.local_changes
+            if top is None:
+                # Datei aus einer älteren Version: C und Ranking hier berechnen
+                self.build({
+                    key: [song_ids[j] for j in matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]]
+                    for row, key in enumerate(keys)
+                })
+            else:
+                self._reset()
+                self.song_ids = song_ids
+                self.song_index = {s: i for i, s in enumerate(song_ids)}
+                self.baskets = {
+                    key: frozenset(matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]].tolist())
+                    for row, key in enumerate(keys)
+                }
+                self.cooc = cooc
+                bounds = top['top_indptr']
+                for pos, i in enumerate(top['top_rows'].tolist()):
+                    start, end = bounds[pos], bounds[pos + 1]
+                    self.neighbours[i] = (top['top_cols'][start:end], top['top_scores'][start:end])
+            # Lokale Änderungen, die der Batch-Lauf noch nicht kennt; schon
+            # enthaltene fallen aus local_changes heraus
+            for key, members in pending.items():
+                if {self.song_ids[i] for i in self.baskets.get(key, ())} != set(members):
+                    self.replace_basket(key, members)
+
+def playlist_key(playlist_id):
+    return f'playlist:{playlist_id}'
+
+
+def favorites_key(user_id):
+    return f'favorites:{user_id}'
+
+
+def load_baskets():
+    # Einmaliger Batch-Lauf über playlists und favorites
+    db = mongo.connect()
+    baskets = {}
+    for doc in db.playlists.find({}, projection={'songs': 1}):
+        baskets[playlist_key(doc['_id'])] = doc.get('songs', [])
+    grouped = db.favorites.aggregate([
+        {'$group': {'_id': '$user_id', 'songs': {'$push': '$song_id'}}}
+    ])
+    for doc in grouped:
+        baskets[favorites_key(doc['_id'])] = doc['songs']
+    return baskets
+
+
+similarity_index = SimilarityIndex()
+_loaded = {'path': None, 'mtime': None}
+
+
+def get_index():
+    # Lädt den offline gebauten Index bei Bedarf (beim Worker-Start über
+    # preload, erneut, wenn ein neuerer Batch-Lauf die Datei ersetzt hat)
+    path = current_app.config.get('SIMILARITY_INDEX_PATH')
+    if path and os.path.exists(path):
+        mtime = os.path.getmtime(path)
+        if (_loaded['path'], _loaded['mtime']) != (path, mtime):
+            with similarity_index._lock:
+                if (_loaded['path'], _loaded['mtime']) != (path, mtime):
+                    similarity_index.load(path)
+                    _loaded.update(path=path, mtime=mtime)
+    return similarity_index
+
+
+def preload(app):
+    with app.app_context():
+        get_index()
+
+
+def playlist_changed(playlist_id, songs):
+    get_index().replace_basket(playlist_key(playlist_id), songs)
+
+
+def playlist_deleted(playlist_id):
+    get_index().drop_basket(playlist_key(playlist_id))
+
+
+def favorites_added(user_id, song_ids):
+    get_index().add_to_basket(favorites_key(user_id), song_ids)
+
+
+def favorites_removed(user_id, song_ids):
+    get_index().remove_from_basket(favorites_key(user_id), song_ids)
+
+
+def songs_deleted(user_id, song_ids, playlist_ids):
+    index = get_index()
+    index.remove_from_basket(favorites_key(user_id), song_ids)
+    for playlist_id in playlist_ids:
+        index.remove_from_basket(playlist_key(playlist_id), song_ids)
+
+
+def init_app(app):
+    app.extensions.setdefault('warm_up', []).append(lambda: preload(app))
+
+    @app.cli.command('build-similarity-index')
+    @click.option('--path', default=None, help='Zieldatei (Standard: SIMILARITY_INDEX_PATH)')
+    def build_similarity_index(path):
+        """Baut den Index für ähnliche Songs aus Playlists und Favoriten."""
+        path = path or current_app.config['SIMILARITY_INDEX_PATH']
+        index = SimilarityIndex()
+        index.build(load_baskets())
+        index.save(path)
+        click.echo(f'{len(index)} Songs indexiert -> {path}')
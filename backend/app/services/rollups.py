@@ -0,0 +1,130 @@
+# Vorab aggregierte Hörstatistiken. Beim Schreiben eines Event-Batches
+# werden die Zähler pro User/Tag, User/Monat, Song und Künstler/Monat per
+# $inc-Upsert fortgeschrieben, sodass /stats nie die Event-Historie
+# durchsuchen muss. `flask rebuild-stats` baut die Rollups aus den
+# gespeicherten Events neu auf (z. B. nach einem Fehler beim Fortschreiben).
+#
+# Der Neuaufbau schreibt in eigene Collections (<name>_rebuild) und tauscht
+# sie am Ende per Rename aus, während die Aufnahme weiterläuft. Ab dem Start
+# (maintenance.stats_rebuild.since) schreibt record() neue Events zusätzlich
+# dorthin; der Neuaufbau selbst liest nur Events, die vorher angenommen
+# wurden (received_at < since). So zählt jedes Event genau einmal.
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import click
+from flask import current_app
+
+from app.models.mongo_models import Event, Maintenance, Song, Stats, REBUILD_SUFFIX, mongo
+
+logger = logging.getLogger(__name__)
+REBUILD_BATCH_SIZE = 5000
+REBUILD_JOB = 'stats_rebuild'
+UNKNOWN_ARTIST = 'Unbekannt'
+
+
+def _counters(event):
+    counters = {'plays': 0, 'skips': 0, 'seeks': 0, 'listened_ms': event.get('listened_ms', 0)}
+    counters[{'play': 'plays', 'skip': 'skips', 'seek': 'seeks'}[event['type']]] = 1
+    return counters
+
+
+def _add(target, key, counters):
+    totals = target[key]
+    for field, value in counters.items():
+        if value:
+            totals[field] = totals.get(field, 0) + value
+
+
+def aggregate(events, artists):
+    # Fasst einen Batch zu einem $inc pro Rollup-Dokument zusammen
+    daily = defaultdict(dict)
+    monthly = defaultdict(dict)
+    songs = defaultdict(dict)
+    by_artist = defaultdict(dict)
+    for event in events:
+        counters = _counters(event)
+        day = event['ts'].strftime('%Y-%m-%d')
+        month = day[:7]
+        user_id = event['user_id']
+        _add(daily, (user_id, day), counters)
+        _add(monthly, (user_id, month), counters)
+        _add(songs, (user_id, event['song_id']), counters)
+        artist = artists.get(event['song_id']) or UNKNOWN_ARTIST
+        _add(by_artist, (user_id, month, artist), counters)
+    return {
+        'stats_daily': [({'user_id': u, 'day': d}, inc) for (u, d), inc in daily.items() if inc],
+        'stats_monthly': [({'user_id': u, 'month': m}, inc) for (u, m), inc in monthly.items() if inc],
+        'stats_songs': [({'user_id': u, 'song_id': s}, inc) for (u, s), inc in songs.items() if inc],
+        'stats_artists': [
+            ({'user_id': u, 'month': m, 'artist': a}, inc)
+            for (u, m, a), inc in by_artist.items() if inc
+        ]
+    }
+
+
+def apply(events, suffix=''):
+    if not events:
+        return
+    artists = Song.get_artists({event['song_id'] for event in events})
+    Stats.increment(aggregate(events, artists), suffix)
+
+
+def record(events):
+    # Events speichern und Rollups nur für tatsächlich geschriebene Events
+    # fortschreiben; gibt die Events zurück, die erneut versucht werden
+    # sollen. Bereits gespeicherte (Duplicate Key beim erneuten Versuch)
+    # zählen nicht doppelt. Schlägt nur das Fortschreiben fehl, bleiben die
+    # Events erhalten (kein Requeue) und rebuild-stats repariert.
+    written, retry = Event.insert_many(events)
+    try:
+        since = Maintenance.get(REBUILD_JOB).get('since')
+        if since is not None:
+            # Läuft ein Neuaufbau, bekommt er die neuen Events von hier
+            since = _aware(since)
+            apply([event for event in written if _aware(event['received_at']) >= since], REBUILD_SUFFIX)
+        apply(written)
+    except Exception:
+        logger.exception('Rollups konnten nicht fortgeschrieben werden (%d Events)', len(written))
+    return retry
+
+
+def _aware(moment):
+    # Aus Mongo gelesene Zeiten sind naiv (UTC)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def rebuild(grace=None):
+    # grace: Wartezeit, bis alle vor dem Start angenommenen Events aus den
+    # Puffern der Worker geschrieben sind
+    if grace is None:
+        grace = current_app.config.get('EVENT_FLUSH_INTERVAL', 2.0) + 5
+    Stats.prepare_rebuild()
+    since = datetime.now(timezone.utc)
+    Maintenance.save(REBUILD_JOB, {'since': since})
+    try:
+        time.sleep(grace)
+        batch = []
+        total = 0
+        for event in mongo.connect().events.find({'received_at': {'$lt': since}}).sort('_id', 1):
+            batch.append(event)
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                apply(batch, REBUILD_SUFFIX)
+                total += len(batch)
+                batch = []
+        apply(batch, REBUILD_SUFFIX)
+        Stats.swap_rebuild()
+    finally:
+        Maintenance.save(REBUILD_JOB, {'since': None})
+        # Reste von Writes, die den Neuaufbau noch gesehen haben
+        Stats.drop_rebuild()
+    return total + len(batch)
+
+
+def init_app(app):
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats():
+        """Baut die Statistik-Rollups aus der Event-Historie neu auf."""
+        click.echo(f'{rebuild()} Events verarbeitet')
@@ -0,0 +1,116 @@
+# Skip-bewusster Shuffle für Playlists. Pro User werden Gewichte (aus
+# Play/Skip-Rollups und Favoriten) und Künstler-Codes einmal in kompakte
+# NumPy-Arrays geladen und eine Weile im Prozess gehalten; eine Queue für
+# eine Playlist braucht dann keine weiteren Datenbankabfragen.
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.models.mongo_models import Favorite, Song, Stats
+
+FAVORITE_BOOST = 2.0
+MIN_WEIGHT = 0.05
+UNKNOWN_WEIGHT = 0.5
+SPREAD_WINDOW = 8
+CACHE_SIZE = 1000
+
+
+class UserWeights:
+    def __init__(self, song_ids, weights, artists):
+        self.index = {str(s): i for i, s in enumerate(song_ids)}
+        self.weights = weights
+        self.artists = artists
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def load(cls, user_id):
+        artists_by_song = Song.get_artists_by_user(user_id)
+        song_ids = list(artists_by_song)
+        plays = np.zeros(len(song_ids), dtype=np.float32)
+        skips = np.zeros(len(song_ids), dtype=np.float32)
+        position = {s: i for i, s in enumerate(song_ids)}
+        for row in Stats.get_songs_by_user(user_id):
+            i = position.get(row['song_id'])
+            if i is not None:
+                plays[i] = row.get('plays', 0)
+                skips[i] = row.get('skips', 0)
+        # Geglättete Durchhör-Rate: plays und skips sind getrennte Events,
+        # ungespielte Songs starten bei 0.5, jeder Skip drückt das Gewicht
+        weights = (plays + 1) / (plays + skips + 2)
+        favorites = Favorite.get_song_ids(user_id)
+        if favorites:
+            is_favorite = np.fromiter((s in favorites for s in song_ids), dtype=bool, count=len(song_ids))
+            weights[is_favorite] *= FAVORITE_BOOST
+        np.maximum(weights, MIN_WEIGHT, out=weights)
+
+        # Künstler als Integer-Codes; ohne Künstler (-1) wird nicht gestreut
+        names = [(artists_by_song[s] or '').strip().lower() for s in song_ids]
+        codes = {}
+        artists = np.fromiter(
+            (codes.setdefault(n, len(codes)) if n and n != 'unbekannt' else -1 for n in names),
+            dtype=np.int32,
+            count=len(names)
+        )
+        return cls(song_ids, weights.astype(np.float32), artists)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_weights(user_id, ttl):
+    with _cache_lock:
+        cached = _cache.get(user_id)
+        if cached and time.monotonic() - cached.built_at < ttl:
+            _cache.move_to_end(user_id)
+            return cached
+    weights = UserWeights.load(user_id)
+    with _cache_lock:
+        _cache[user_id] = weights
+        _cache.move_to_end(user_id)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return weights
+
+
+def invalidate(user_id):
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+
+def _spread_artists(order, artists):
+    # Folgt ein Song auf denselben Künstler, wird er mit dem nächsten Song
+    # eines anderen Künstlers im Fenster getauscht (O(n * SPREAD_WINDOW))
+    n = len(order)
+    for pos in range(1, n):
+        previous = artists[order[pos - 1]]
+        if previous < 0 or artists[order[pos]] != previous:
+            continue
+        for look in range(pos + 1, min(pos + 1 + SPREAD_WINDOW, n)):
+            if artists[order[look]] != previous:
+                order[pos], order[look] = order[look], order[pos]
+                break
+    return order
+
+
+def generate_queue(song_ids, user_weights, seed=None):
+    rng = np.random.default_rng(seed)
+    n = len(song_ids)
+    if n == 0:
+        return []
+    lookup = [user_weights.index.get(str(s), -1) for s in song_ids]
+    idx = np.fromiter(lookup, dtype=np.int64, count=n)
+    known = idx >= 0
+    weights = np.full(n, UNKNOWN_WEIGHT, dtype=np.float32)
+    weights[known] = user_weights.weights[idx[known]]
+    artists = np.full(n, -1, dtype=np.int32)
+    artists[known] = user_weights.artists[idx[known]]
+
+    # Gewichtete Zufallspermutation (Efraimidis-Spirakis): Schlüssel
+    # log(u) / w absteigend sortieren
+    keys = np.log(1.0 - rng.random(n)) / weights
+    order = np.argsort(-keys, kind='stable').tolist()
+    order = _spread_artists(order, artists.tolist())
+    return [str(song_ids[i]) for i in order]
@@ -0,0 +1,44 @@
+# Storage-Backend für Audio-Dateien, gewählt über STORAGE_BACKEND
+# ('local' = UPLOAD_FOLDER, 's3' = S3-kompatibler Bucket)
+from flask import current_app
+
+from app.storage.base import Storage, StoredFile
+from app.storage.local import LocalStorage
+
+# Auslieferung lokaler Dateien über den Proxy ('' = Flask liefert selbst aus)
+AUDIO_OFFLOAD_MODES = ('', 'x-accel', 'x-sendfile')
+
+
+def create_storage(config):
+    backend = config.get('STORAGE_BACKEND', 'local')
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    if backend == 's3':
+        from app.storage.s3 import S3Storage
+        return S3Storage(
+            config['S3_BUCKET'],
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            region=config.get('S3_REGION'),
+            access_key=config.get('S3_ACCESS_KEY'),
+            secret_key=config.get('S3_SECRET_KEY')
+        )
+    raise ValueError(f'Unbekanntes STORAGE_BACKEND: {backend}')
+
+
+def init_app(app):
+    # Ein Tippfehler soll beim Start auffallen, nicht als 500 bei jedem Stream
+    offload = app.config.get('AUDIO_OFFLOAD') or ''
+    if offload not in AUDIO_OFFLOAD_MODES:
+        raise ValueError(f'Unbekannter AUDIO_OFFLOAD-Modus: {offload}')
+    app.extensions['storage'] = create_storage(app.config)
+
+
+def get_storage():
+    # Apps ohne init_app (z. B. Tests mit nur einem Blueprint) nutzen lokal
+    storage = current_app.extensions.get('storage')
+    if storage is None:
+        storage = current_app.extensions['storage'] = create_storage(current_app.config)
+    return storage
+
+
+__all__ = ['Storage', 'StoredFile', 'LocalStorage', 'AUDIO_OFFLOAD_MODES', 'create_storage', 'init_app', 'get_storage']
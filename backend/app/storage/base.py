@@ -0,0 +1,50 @@
+# Gemeinsame Schnittstelle aller Storage-Backends für Audio-Dateien.
+# Ein Song speichert nur seinen Schlüssel (file_path); wo die Bytes liegen,
+# entscheidet das konfigurierte Backend.
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class StoredFile:
+    size: int
+    last_modified: datetime
+    etag: str
+
+
+class Storage(ABC):
+    # Ein unvollständiges Backend scheitert schon beim Instanziieren
+    @abstractmethod
+    def put(self, key, stream, content_type=None):
+        pass
+
+    @abstractmethod
+    def stat(self, key):
+        """StoredFile zum Schlüssel, FileNotFoundError wenn er fehlt."""
+
+    @abstractmethod
+    def open_range(self, key, start, stop):
+        """Iterator über die Bytes [start, stop) in Blöcken von CHUNK_SIZE."""
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    @abstractmethod
+    def list_keys(self, start_after=None, limit=1000):
+        """Bis zu limit (key, last_modified) in Schlüsselreihenfolge nach start_after."""
+
+    def key_aliases(self, key):
+        # Schreibweisen, unter denen ein Song denselben Schlüssel speichern kann
+        return [key]
+
+    def presign(self, key, expires, download_name=None):
+        # Backends ohne eigene URLs liefern None -> Flask liefert selbst aus
+        return None
+
+    def local_path(self, key):
+        # Nur lokale Backends: Pfad für send_file/sendfile, sonst None
+        return None
@@ -0,0 +1,94 @@
+import itertools
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from app.storage.base import CHUNK_SIZE, Storage, StoredFile
+
+
+class LocalStorage(Storage):
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def local_path(self, key):
+        # Altbestand speichert absolute Pfade, neue Songs nur den Dateinamen.
+        # Beides muss unterhalb von root liegen
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f'Pfad außerhalb des Upload-Ordners: {key}')
+        return path
+
+    def put(self, key, stream, content_type=None):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Erst vollständig schreiben, dann ersetzen: laufende Streams lesen
+        # weiter die alte Datei, neue bekommen ein neues ETag (Inode)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(stream, f, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return key
+
+    def stat(self, key):
+        st = os.stat(self.local_path(key))
+        return StoredFile(
+            size=st.st_size,
+            last_modified=datetime.fromtimestamp(st.st_mtime, timezone.utc),
+            # Inode + Größe + mtime: ändert sich mit jeder neuen Datei, ohne sie zu lesen
+            etag=f'{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}'
+        )
+
+    def open_range(self, key, start, stop):
+        with open(self.local_path(key), 'rb') as f:
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def key_aliases(self, key):
+        # Relativer Schlüssel und absoluter Pfad (Altbestand), egal in welcher
+        # Schreibweise key vorliegt
+        path = self.local_path(key)
+        return [os.path.relpath(path, self.root).replace(os.sep, '/'), path]
+
+    def list_keys(self, start_after=None, limit=1000):
+        return list(itertools.islice(self._scan(self.root, '', start_after), limit))
+
+    def _scan(self, directory, prefix, start_after):
+        # Lazy und in Schlüsselreihenfolge: Verzeichnisse sortieren als
+        # "name/", damit z. B. "a-b" vor "a/b" kommt. Ganze Unterbäume vor
+        # start_after werden übersprungen statt gelistet
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(
+                    ((prefix + e.name + ('/' if e.is_dir(follow_symlinks=False) else ''), e) for e in it),
+                    key=lambda item: item[0]
+                )
+        except FileNotFoundError:
+            return
+        for key, entry in entries:
+            if key.endswith('/'):
+                if start_after is None or start_after < key or start_after.startswith(key):
+                    yield from self._scan(entry.path, key, start_after)
+            elif start_after is None or key > start_after:
+                try:
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                yield key, datetime.fromtimestamp(mtime, timezone.utc)
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,77 @@
+# S3-kompatibler Storage (AWS S3, MinIO, ...). boto3 ist optional und wird
+# nur für STORAGE_BACKEND=s3 gebraucht. Lokal gegen MinIO testen:
+#   docker run -p 9000:9000 minio/minio server /data
+#   STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://localhost:9000 S3_BUCKET=skipify \
+#   S3_ACCESS_KEY=minioadmin S3_SECRET_KEY=minioadmin
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+    ClientError = Exception
+
+from app.storage.base import CHUNK_SIZE, Storage, StoredFile
+
+
+class S3Storage(Storage):
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None, secret_key=None, client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError('STORAGE_BACKEND=s3 benötigt das Paket boto3')
+            client = boto3.client(
+                's3',
+                endpoint_url=endpoint_url,
+                region_name=region,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key
+            )
+        self.client = client
+        self.bucket = bucket
+
+    def put(self, key, stream, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        self.client.upload_fileobj(stream, self.bucket, key, ExtraArgs=extra)
+        return key
+
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+        return StoredFile(
+            size=head['ContentLength'],
+            last_modified=head['LastModified'],
+            etag=head['ETag'].strip('"')
+        )
+
+    def open_range(self, key, start, stop):
+        obj = self.client.get_object(Bucket=self.bucket, Key=key, Range=f'bytes={start}-{stop - 1}')
+        body = obj['Body']
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def delete(self, key):
+        # delete_object ist bei fehlenden Schlüsseln bereits idempotent
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list_keys(self, start_after=None, limit=1000):
+        params = {'Bucket': self.bucket, 'MaxKeys': limit}
+        if start_after:
+            params['StartAfter'] = start_after
+        response = self.client.list_objects_v2(**params)
+        return [(obj['Key'], obj['LastModified']) for obj in response.get('Contents', [])]
+
+    def presign(self, key, expires, download_name=None):
+        params = {'Bucket': self.bucket, 'Key': key}
+        if download_name:
+            params['ResponseContentDisposition'] = f'attachment; filename="{download_name}"'
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires)
+
+
+def _is_not_found(error):
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in ('404', 'NoSuchKey', 'NotFound')
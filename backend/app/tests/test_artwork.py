@@ -0,0 +1,100 @@
+"""
+Unit Tests für artwork.py und media.py
+- Cover aus ID3 (APIC) extrahieren, Dauer aus demselben Parse
+- Thumbnails und Deduplizierung per Hash
+"""
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+from mutagen.id3 import ID3, APIC
+from PIL import Image
+from app.services import artwork, media
+from app.storage import LocalStorage
+
+# Minimaler MPEG-1-Layer-3-Frame (128 kbit/s, 44.1 kHz)
+MPEG_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+def make_image(color='red', size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def make_mp3(pictures):
+    stream = BytesIO(MPEG_FRAME * 10)
+    tags = ID3()
+    for picture_type, data in pictures:
+        tags.add(APIC(encoding=3, mime='image/png', type=picture_type, desc=str(picture_type), data=data))
+    tags.save(stream)
+    stream.seek(0)
+    return stream
+
+class ArtworkTestCase(unittest.TestCase):
+    """Test suite für Cover-Art"""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage = LocalStorage(self.root)
+    
+    def tearDown(self):
+        shutil.rmtree(self.root)
+    
+    def test_extract_prefers_front_cover(self):
+        """Test: Frontcover wird anderen Bildern vorgezogen"""
+        back, front = make_image('blue'), make_image('red')
+        stream = make_mp3([(4, back), (artwork.FRONT_COVER, front)])
+        
+        self.assertEqual(artwork.extract(media.probe(stream)), front)
+    
+    def test_extract_without_art(self):
+        """Test: Ohne eingebettetes Bild gibt es kein Cover"""
+        self.assertIsNone(artwork.extract(media.probe(BytesIO(MPEG_FRAME * 10))))
+    
+    def test_store_creates_thumbnails(self):
+        """Test: Alle Größen werden als JPEG abgelegt und passen in die Box"""
+        art_id = artwork.store(self.storage, make_image(size=(800, 600)))
+        
+        for size in artwork.ART_SIZES:
+            with Image.open(self.storage.local_path(artwork.art_key(art_id, size))) as image:
+                self.assertEqual(image.format, 'JPEG')
+                self.assertEqual(max(image.size), size)
+    
+    def test_same_cover_is_stored_once(self):
+        """Test: Gleiches Cover (z. B. gleiches Album) wird nur einmal verarbeitet"""
+        data = make_image()
+        first = artwork.store(self.storage, data)
+        
+        with patch('app.services.artwork.Image.open') as mock_open:
+            second = artwork.store(self.storage, data)
+        
+        self.assertEqual(first, second)
+        mock_open.assert_not_called()
+    
+    def test_probe_rewinds_and_ignores_errors(self):
+        """Test: Kaputte Dateien liefern weder Cover noch Dauer, der Stream steht wieder am Anfang"""
+        stream = BytesIO(b'kein audio')
+        stream.read()
+        audio = media.probe(stream)
+        
+        self.assertIsNone(artwork.process_upload(self.storage, audio))
+        self.assertIsNone(media.duration_ms(audio))
+        self.assertEqual(stream.tell(), 0)
+    
+    def test_probe_reads_duration(self):
+        """Test: Die Dauer kommt aus demselben Parse wie das Cover"""
+        stream = make_mp3([(artwork.FRONT_COVER, make_image())])
+        audio = media.probe(stream)
+        
+        self.assertGreater(media.duration_ms(audio), 0)
+        self.assertIsNotNone(artwork.process_upload(self.storage, audio))
+    
+    def test_pick_size(self):
+        """Test: Kleinste passende Größe, sonst die größte"""
+        self.assertEqual(artwork.pick_size(50), 96)
+        self.assertEqual(artwork.pick_size(200), 300)
+        self.assertEqual(artwork.pick_size(5000), 600)
+
+
+if __name__ == '__main__':
+    unittest.main()
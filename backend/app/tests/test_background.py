@@ -0,0 +1,52 @@
+"""
+Unit Tests für background.py
+- Der Thread startet lazy und nur einmal pro Prozess
+- Nach fork() startet er im Kindprozess neu
+"""
+import threading
+import unittest
+from unittest.mock import patch
+from app.services.background import ProcessThread
+
+class ProcessThreadTestCase(unittest.TestCase):
+    """Test suite für den prozessweiten Hintergrund-Thread"""
+    
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = []
+        self.addCleanup(self.release.set)
+        
+        def target():
+            self.calls.append(threading.current_thread().name)
+            self.release.wait(5)
+        
+        self.worker = ProcessThread(target, 'test-worker')
+    
+    def test_starts_lazily_once(self):
+        """Test: Erst ensure_started startet, weitere Aufrufe nicht erneut"""
+        self.assertFalse(self.worker.is_running())
+        
+        self.worker.ensure_started()
+        self.worker.ensure_started()
+        
+        self.assertTrue(self.worker.is_running())
+        self.release.set()
+        self.worker.join(timeout=5)
+        self.assertEqual(self.calls, ['test-worker'])
+        self.assertFalse(self.worker.is_running())
+    
+    def test_restarts_in_forked_process(self):
+        """Test: Nach fork() (andere PID) läuft der Thread neu an"""
+        self.worker.ensure_started()
+        
+        with patch('app.services.background.os.getpid', return_value=-1):
+            self.assertFalse(self.worker.is_running())
+            self.worker.ensure_started()
+            self.assertTrue(self.worker.is_running())
+            self.release.set()
+            self.worker.join(timeout=5)
+        
+        self.assertEqual(self.calls, ['test-worker', 'test-worker'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+"""
+Unit Tests für bandwidth.py
+- Token Bucket mit Schulden und Nachfüllen (geteilt über Dateien)
+- Vorrang von Streams vor Downloads am gemeinsamen Uplink
+- Obergrenze gleichzeitig gebremster Antworten
+- Gebremste Auslieferung über die Song-Routen
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from app import bandwidth
+from app.bandwidth import FileBuckets, RedisBuckets, Shaper
+from app.routes.song_routes import song_bp
+
+KB = 1024
+
+class BandwidthTestCase(unittest.TestCase):
+    """Test suite für die Bandbreitenbegrenzung"""
+    
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir)
+    
+    @patch('app.bandwidth.time.time')
+    def test_bucket_debt_and_refill(self, mock_time):
+        """Test: Der Bucket geht ins Minus (höchstens -burst) und füllt sich mit der Rate"""
+        buckets = FileBuckets(self.state_dir)
+        mock_time.return_value = 100.0
+        
+        self.assertEqual(buckets.reserve('k', 150, rate=100, burst=100), -50)
+        self.assertEqual(buckets.reserve('k', 500, rate=100, burst=100), -100)
+        
+        mock_time.return_value = 101.5
+        self.assertEqual(buckets.reserve('k', 0, rate=100, burst=100), 50)
+    
+    @patch('app.bandwidth.time.time')
+    def test_bucket_state_is_shared(self, mock_time):
+        """Test: Zwei Instanzen (z. B. zwei Worker) teilen denselben Bucket"""
+        mock_time.return_value = 100.0
+        FileBuckets(self.state_dir).reserve('bw:download:u1', 150, rate=100, burst=100)
+        
+        self.assertEqual(FileBuckets(self.state_dir).reserve('bw:download:u1', 0, rate=100, burst=100), -50)
+    
+    def test_buckets_are_per_user_and_route(self):
+        """Test: Downloads eines Users bremsen weder andere User noch seine Streams"""
+        shaper = Shaper(FileBuckets(self.state_dir), {'stream': 100, 'download': 100}, burst_seconds=1)
+        
+        self.assertGreater(shaper.pay('u1', 'download', 300), 0)
+        self.assertEqual(shaper.pay('u2', 'download', 50), 0)
+        self.assertEqual(shaper.pay('u1', 'stream', 50), 0)
+    
+    def test_streams_have_priority_on_uplink(self):
+        """Test: Streams belasten den Uplink ohne zu warten, Downloads warten"""
+        shaper = Shaper(FileBuckets(self.state_dir), {'stream': 0, 'download': 0}, uplink_rate=100, burst_seconds=1)
+        
+        self.assertEqual(shaper.pay('u1', 'stream', 150), 0)
+        self.assertGreater(shaper.pay('u2', 'download', 10), 0)
+        self.assertTrue(shaper.limited('stream'))
+        self.assertFalse(shaper.may_wait('stream'))
+    
+    def test_unreachable_bucket_fails_open(self):
+        """Test: Ist Redis weg, wird ungebremst ausgeliefert"""
+        buckets = MagicMock()
+        buckets.reserve.side_effect = ConnectionError('redis weg')
+        shaper = Shaper(buckets, {'download': 100})
+        
+        self.assertEqual(shaper.pay('u1', 'download', 10 ** 6), 0)
+    
+    @patch('app.bandwidth.redis')
+    def test_redis_timeouts_and_backoff(self, mock_redis):
+        """Test: Redis mit kurzen Timeouts; nach einem Fehler wird es eine Weile übersprungen"""
+        client = mock_redis.Redis.from_url.return_value
+        buckets = RedisBuckets('redis://x', timeout=0.2)
+        buckets.script = MagicMock(side_effect=TimeoutError('timeout'))
+        
+        with self.assertRaises(TimeoutError):
+            buckets.reserve('k', 1, 100, 100)
+        with self.assertRaises(ConnectionError):
+            buckets.reserve('k', 1, 100, 100)
+        
+        mock_redis.Redis.from_url.assert_called_once_with('redis://x', socket_timeout=0.2, socket_connect_timeout=0.2)
+        client.register_script.assert_called_once()
+        buckets.script.assert_called_once()
+    
+    def test_slots_per_worker_and_user(self):
+        """Test: Gebremste Antworten sind pro Worker und pro User begrenzt"""
+        shaper = Shaper(FileBuckets(self.state_dir), {'download': 100}, max_per_worker=2, max_per_user=1)
+        
+        self.assertTrue(shaper.acquire('u1'))
+        self.assertFalse(shaper.acquire('u1'))
+        self.assertTrue(shaper.acquire('u2'))
+        self.assertFalse(shaper.acquire('u3'))
+        shaper.release('u1')
+        self.assertTrue(shaper.acquire('u3'))
+    
+    def test_init_app_disabled_without_rates(self):
+        """Test: Ohne Raten wird nichts registriert (kein Overhead)"""
+        app = Flask(__name__)
+        app.config.update(BANDWIDTH_STREAM_RATE=0, BANDWIDTH_DOWNLOAD_RATE=0, BANDWIDTH_UPLINK_RATE=0)
+        
+        self.assertIsNone(bandwidth.init_app(app))
+        self.assertNotIn('bandwidth', app.extensions)
+
+class ShapedRoutesTestCase(unittest.TestCase):
+    """Test suite für gebremste Streams und Downloads"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+        self.temp_dir = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.temp_dir
+        self.app.config.update(
+            BANDWIDTH_STREAM_RATE=0,
+            BANDWIDTH_DOWNLOAD_RATE=64 * KB,
+            BANDWIDTH_UPLINK_RATE=0,
+            BANDWIDTH_BURST_SECONDS=1,
+            BANDWIDTH_STATE_DIR=os.path.join(self.temp_dir, 'bandwidth')
+        )
+        
+        JWTManager(self.app)
+        self.app.register_blueprint(song_bp, url_prefix='/songs')
+        bandwidth.init_app(self.app)
+        
+        self.client = self.app.test_client()
+        self.user_id = '12345'
+        with self.app.app_context():
+            self.headers = {'Authorization': f'Bearer {create_access_token(identity=self.user_id)}'}
+        
+        self.path = os.path.join(self.temp_dir, f'{self.user_id}_song.mp3')
+        with open(self.path, 'wb') as f:
+            f.write(os.urandom(256 * KB))
+        song = MagicMock()
+        song.user_id = self.user_id
+        song.file_path = self.path
+        patcher = patch('app.routes.song_routes.Song')
+        self.addCleanup(patcher.stop)
+        patcher.start().get_by_id.return_value = song
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    @patch('app.bandwidth.time.sleep')
+    def test_download_is_shaped(self, mock_sleep):
+        """Test: Download über der Burst-Größe wartet, der Inhalt bleibt vollständig"""
+        response = self.client.get('/songs/507f1f77bcf86cd799439011/download', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(response.data, f.read())
+        self.assertAlmostEqual(sum(c.args[0] for c in mock_sleep.call_args_list), 3.0, places=2)
+    
+    def test_parallel_download_rejected(self):
+        """Test: Ein zweiter gleichzeitiger Download desselben Users bekommt 429"""
+        first = self.client.get('/songs/507f1f77bcf86cd799439011/download', headers=self.headers, buffered=False)
+        second = self.client.get('/songs/507f1f77bcf86cd799439011/download', headers=self.headers)
+        
+        self.assertEqual(second.status_code, 429)
+        self.assertIn('Retry-After', second.headers)
+        first.close()
+        
+        with patch('app.bandwidth.time.sleep'):
+            third = self.client.get('/songs/507f1f77bcf86cd799439011/download', headers=self.headers)
+        self.assertEqual(third.status_code, 200)
+    
+    @patch('app.bandwidth.time.sleep')
+    def test_stream_is_not_shaped(self, mock_sleep):
+        """Test: Abspielen bleibt ohne Stream-Rate ungebremst"""
+        response = self.client.get('/songs/507f1f77bcf86cd799439011/stream', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 256 * KB)
+        mock_sleep.assert_not_called()
+    
+    def test_x_accel_download_gets_limit_header(self):
+        """Test: Bei X-Accel-Redirect begrenzt nginx per X-Accel-Limit-Rate"""
+        self.app.config['AUDIO_OFFLOAD'] = 'x-accel'
+        self.app.config['AUDIO_OFFLOAD_PREFIX'] = '/protected-audio/'
+        
+        response = self.client.get('/songs/507f1f77bcf86cd799439011/download', headers=self.headers)
+        
+        self.assertIn('X-Accel-Redirect', response.headers)
+        self.assertEqual(response.headers['X-Accel-Limit-Rate'], str(64 * KB))
+
+if __name__ == '__main__':
+    unittest.main()
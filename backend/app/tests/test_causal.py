@@ -0,0 +1,168 @@
+"""
+Unit Tests für causal.py und die Read Preferences in mongo_models
+- Signierter Token-Roundtrip zwischen Session und Header
+- Listen-Reads auf Secondaries, überschreibbar pro Methode
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+from bson import Timestamp
+from flask import Flask, g, jsonify
+from itsdangerous import BadData
+from pymongo import ReadPreference
+from app import causal
+from app.models.mongo_models import MongoDB, parse_read_preferences
+
+def make_session(operation_time=None, cluster_time=None):
+    session = MagicMock()
+    session.operation_time = operation_time
+    session.cluster_time = cluster_time
+    return session
+
+class CausalTokenTestCase(unittest.TestCase):
+    """Test suite für den Causal-Token"""
+    
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['SECRET_KEY'] = 'test-secret-key'
+        causal.init_app(self.app)
+        self.session = make_session(Timestamp(1700000000, 3), {'clusterTime': Timestamp(1700000000, 5)})
+        
+        @self.app.route('/write')
+        def write():
+            g.mongo_session = self.session
+            return jsonify({'ok': True, 'read_primary': g.get('read_primary', False)})
+        
+        self.client = self.app.test_client()
+    
+    def test_token_roundtrip(self):
+        """Test: Token enthält operationTime und clusterTime"""
+        token = causal.encode_token(self.session, 'test-secret-key')
+        
+        operation_time, cluster_time = causal.decode_token(token, 'test-secret-key')
+        
+        self.assertEqual(operation_time, Timestamp(1700000000, 3))
+        self.assertEqual(cluster_time, {'clusterTime': Timestamp(1700000000, 5)})
+    
+    def test_no_token_without_operation_time(self):
+        """Test: Ohne Operation (z. B. Standalone) gibt es keinen Token"""
+        self.assertIsNone(causal.encode_token(make_session(), 'test-secret-key'))
+    
+    def test_token_signed_with_other_key_rejected(self):
+        """Test: Token mit fremdem Schlüssel wird nicht akzeptiert"""
+        token = causal.encode_token(self.session, 'anderer-schluessel')
+        
+        with self.assertRaises(BadData):
+            causal.decode_token(token, 'test-secret-key')
+    
+    def test_response_carries_token_and_session_is_ended(self):
+        """Test: Antwort trägt den Token, die Session wird beendet"""
+        response = self.client.get('/write')
+        
+        self.assertIn(causal.CAUSAL_HEADER, response.headers)
+        self.session.end_session.assert_called_once()
+    
+    @patch('app.causal.mongo')
+    def test_incoming_token_advances_session(self, mock_mongo):
+        """Test: Mitgeschickter Token spult die neue Session vor"""
+        token = causal.encode_token(self.session, 'test-secret-key')
+        new_session = make_session()
+        mock_mongo.session.return_value = new_session
+        
+        self.client.get('/write', headers={causal.CAUSAL_HEADER: token})
+        
+        new_session.advance_cluster_time.assert_called_once_with({'clusterTime': Timestamp(1700000000, 5)})
+        new_session.advance_operation_time.assert_called_once_with(Timestamp(1700000000, 3))
+    
+    @patch('app.causal.mongo')
+    def test_invalid_token_is_ignored(self, mock_mongo):
+        """Test: Kaputter Token führt nicht zu einem Fehler, gelesen wird vom Primary"""
+        response = self.client.get('/write', headers={causal.CAUSAL_HEADER: 'kaputt'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()['read_primary'])
+    
+    @patch('app.causal.mongo')
+    def test_forged_token_does_not_advance_session(self, mock_mongo):
+        """Test: Unsignierte Zeiten aus dem Client erreichen die Session nicht"""
+        forged = causal.encode_token(make_session(Timestamp(4000000000, 1), {'clusterTime': Timestamp(4000000000, 1)}), 'geraten')
+        new_session = make_session()
+        mock_mongo.session.return_value = new_session
+        
+        self.client.get('/write', headers={causal.CAUSAL_HEADER: forged})
+        
+        new_session.advance_cluster_time.assert_not_called()
+        new_session.advance_operation_time.assert_not_called()
+
+class ReadPreferenceTestCase(unittest.TestCase):
+    """Test suite für Read Preferences pro Methode"""
+    
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.mongo = MongoDB()
+        self.mongo.db = MagicMock()
+    
+    def test_list_reads_use_configured_default(self):
+        """Test: Listen-Reads nutzen MONGO_LIST_READ_PREFERENCE"""
+        self.app.config['MONGO_LIST_READ_PREFERENCE'] = 'secondaryPreferred'
+        
+        with self.app.app_context():
+            self.mongo.reader('songs', 'Song.get_by_user')
+        
+        self.mongo.db['songs'].with_options.assert_called_once_with(read_preference=ReadPreference.SECONDARY_PREFERRED)
+    
+    def test_method_override(self):
+        """Test: Einzelne Methoden lassen sich überschreiben"""
+        self.app.config['MONGO_LIST_READ_PREFERENCE'] = 'secondaryPreferred'
+        self.app.config['MONGO_READ_PREFERENCES'] = 'Song.get_by_user=primary'
+        
+        with self.app.app_context():
+            self.mongo.reader('songs', 'Song.get_by_user')
+        
+        self.mongo.db['songs'].with_options.assert_called_once_with(read_preference=ReadPreference.PRIMARY)
+    
+    def test_invalid_causal_token_forces_primary(self):
+        """Test: Nach einem abgelehnten Causal-Token liest der Request vom Primary"""
+        self.app.config['MONGO_LIST_READ_PREFERENCE'] = 'secondaryPreferred'
+        
+        with self.app.test_request_context():
+            g.read_primary = True
+            self.mongo.reader('songs', 'Song.get_by_user')
+        
+        self.mongo.db['songs'].with_options.assert_called_once_with(read_preference=ReadPreference.PRIMARY)
+    
+    def test_reader_is_cached(self):
+        """Test: Collection mit Read Preference wird nur einmal erzeugt"""
+        with self.app.app_context():
+            first = self.mongo.reader('songs', 'Song.get_by_user')
+            second = self.mongo.reader('songs', 'Song.get_by_ids')
+        
+        self.assertIs(first, second)
+    
+    def test_unknown_mode_rejected(self):
+        """Test: Tippfehler in der Konfiguration fallen sofort auf"""
+        with self.assertRaises(ValueError):
+            parse_read_preferences('Song.get_by_user=secondaryPrefered')
+    
+    def test_init_app_validates_read_preferences(self):
+        """Test: Ungültige Read Preferences verhindern schon den Start"""
+        self.app.config['MONGO_LIST_READ_PREFERENCE'] = 'secondaryPrefered'
+        with self.assertRaises(ValueError):
+            self.mongo.init_app(self.app)
+        
+        self.app.config['MONGO_LIST_READ_PREFERENCE'] = 'secondaryPreferred'
+        self.app.config['MONGO_READ_PREFERENCES'] = 'Song.get_by_user=nearst'
+        with self.assertRaises(ValueError):
+            self.mongo.init_app(self.app)
+        
+        self.app.config['MONGO_READ_PREFERENCES'] = 'Song.get_by_user=nearest'
+        self.mongo.init_app(self.app)
+    
+    def test_no_session_outside_request(self):
+        """Test: Ohne Request (CLI, Threads) keine explizite Session"""
+        with self.app.app_context():
+            self.assertIsNone(self.mongo.session())
+
+
+if __name__ == '__main__':
+    unittest.main()
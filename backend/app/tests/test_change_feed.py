@@ -0,0 +1,131 @@
+"""
+Unit Tests für change_feed.py
+- Routing der Change-Events an die Subscriptions eines Users
+- Replay per Last-Event-ID, Überlauf, Heartbeat
+- Obergrenze offener Streams pro Worker
+"""
+import unittest
+from unittest.mock import patch, MagicMock
+from flask import Flask
+from pymongo.errors import OperationFailure
+from app.services import change_feed
+from app.services.change_feed import ChangeFeed
+from bson import ObjectId
+
+def change(collection, doc, token='t1'):
+    return {
+        '_id': {'_data': token},
+        'ns': {'coll': collection},
+        'documentKey': {'_id': doc.get('_id', ObjectId())},
+        'fullDocument': doc
+    }
+
+class ChangeFeedTestCase(unittest.TestCase):
+    """Test suite für den geteilten Change Stream"""
+    
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.feed = ChangeFeed(self.app, queue_size=2, replay_size=3)
+        # Kein echter Change Stream im Test
+        self.feed._thread.ensure_started = lambda: None
+    
+    def test_to_notification(self):
+        """Test: Songs per _id, Favoriten per song_id, Tombstones als delete"""
+        song_id, favorite_song = ObjectId(), ObjectId()
+        
+        self.assertEqual(
+            change_feed.to_notification(change('songs', {'_id': song_id, 'user_id': 'u1'})),
+            ('u1', {'kind': 'songs', 'id': str(song_id), 'op': 'upsert'})
+        )
+        self.assertEqual(
+            change_feed.to_notification(change('favorites', {'user_id': 'u1', 'song_id': favorite_song})),
+            ('u1', {'kind': 'favorites', 'id': str(favorite_song), 'op': 'upsert'})
+        )
+        self.assertEqual(
+            change_feed.to_notification(change('tombstones', {'user_id': 'u1', 'kind': 'playlists', 'item_id': song_id})),
+            ('u1', {'kind': 'playlists', 'id': str(song_id), 'op': 'delete'})
+        )
+        self.assertIsNone(change_feed.to_notification({'ns': {'coll': 'songs'}, 'fullDocument': None}))
+    
+    def test_dispatch_only_reaches_own_user(self):
+        """Test: Änderungen landen nur bei Subscriptions desselben Users"""
+        own, _ = self.feed.subscribe('u1')
+        other, _ = self.feed.subscribe('u2')
+        
+        self.feed.dispatch('t1', 'u1', {'kind': 'songs'})
+        
+        self.assertEqual(own.queue.get_nowait(), ('t1', {'kind': 'songs'}))
+        self.assertTrue(other.queue.empty())
+    
+    def test_replay_after_last_event_id(self):
+        """Test: Verpasste Änderungen des Users kommen aus dem Ringpuffer"""
+        self.feed.dispatch('t1', 'u1', {'n': 1})
+        self.feed.dispatch('t2', 'u2', {'n': 2})
+        self.feed.dispatch('t3', 'u1', {'n': 3})
+        
+        _, missed = self.feed.subscribe('u1', 't1')
+        self.assertEqual(missed, [('t3', {'n': 3})])
+        
+        self.feed.dispatch('t4', 'u1', {'n': 4})
+        _, missed = self.feed.subscribe('u1', 't1')
+        self.assertIsNone(missed)
+    
+    def test_overflow_forces_resync(self):
+        """Test: Ein langsamer Client wird abgehängt und bekommt resync"""
+        subscription, missed = self.feed.subscribe('u1')
+        for i in range(3):
+            self.feed.dispatch(f't{i}', 'u1', {'n': i})
+        
+        self.assertTrue(subscription.lost)
+        body = list(change_feed.stream(self.feed, subscription, missed, heartbeat=0.01))
+        
+        self.assertEqual(body[0], f'retry: {change_feed.RETRY_MS}\n\n')
+        self.assertTrue(body[1].startswith('id: t0\nevent: change\n'))
+        self.assertEqual(body[-1], change_feed.format_resync())
+    
+    def test_stream_heartbeat_and_unsubscribe(self):
+        """Test: Ohne Änderungen kommen Heartbeats, beim Schließen wird abgemeldet"""
+        subscription, missed = self.feed.subscribe('u1')
+        body = change_feed.stream(self.feed, subscription, missed, heartbeat=0.01)
+        
+        next(body)
+        self.assertEqual(next(body), ': ping\n\n')
+        body.close()
+        
+        self.assertNotIn('u1', self.feed._subscribers)
+    
+    def test_connection_limit_per_worker(self):
+        """Test: Über max_connections wird abgelehnt, Abmelden gibt den Platz frei"""
+        self.feed.max_connections = 1
+        first, _ = self.feed.subscribe('u1')
+        
+        self.assertEqual(self.feed.subscribe('u2'), (None, None))
+        self.feed.unsubscribe(first)
+        self.feed.unsubscribe(first)
+        
+        second, _ = self.feed.subscribe('u2')
+        self.assertIsNotNone(second)
+        self.assertEqual(self.feed._connections, 1)
+    
+    @patch('app.services.change_feed.mongo')
+    def test_run_dispatches_and_stops_without_replica_set(self, mock_mongo):
+        """Test: Der Stream-Thread verteilt Events und gibt ohne Replica Set auf"""
+        song_id = ObjectId()
+        
+        def events():
+            yield change('songs', {'_id': song_id, 'user_id': 'u1'}, token='t9')
+            raise OperationFailure('kein Replica Set', code=change_feed.NOT_REPLICA_SET)
+        
+        stream = MagicMock()
+        stream.__enter__.return_value = events()
+        mock_mongo.connect.return_value.db.watch.return_value = stream
+        subscription, _ = self.feed.subscribe('u1')
+        
+        self.feed._run()
+        
+        self.assertFalse(self.feed.available)
+        self.assertTrue(subscription.lost)
+        self.assertEqual(subscription.queue.get_nowait(), ('t9', {'kind': 'songs', 'id': str(song_id), 'op': 'upsert'}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+"""
+Unit Tests für compression.py
+- gzip-Aushandlung ab Mindestgröße
+- ETag/304 und Cache der komprimierten Bytes
+- Cache-Abfrage vor der DB-Abfrage (lookup)
+- Audio-Antworten bleiben unverändert
+"""
+import gzip
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from flask import Flask, jsonify, send_file
+from app import compression
+
+class CompressionTestCase(unittest.TestCase):
+    """Test suite für Antwort-Kompression"""
+    
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['COMPRESSION_MIN_SIZE'] = 100
+        compression.init_app(self.app)
+        
+        self.audio = tempfile.NamedTemporaryFile(suffix='.mp3', delete=False)
+        self.audio.write(b'ID3' + b'\x00' * 4096)
+        self.audio.close()
+        
+        @self.app.route('/list')
+        def big_list():
+            return jsonify([{'title': f'Song {i}', 'artist': 'Artist'} for i in range(100)])
+        
+        self.queries = 0
+        self.version = 1
+        self.version_lookups = 0
+        self.size = 100
+        
+        def get_version():
+            self.version_lookups += 1
+            return self.version
+        
+        @self.app.route('/library')
+        def library():
+            cached = compression.lookup(('library', 'u1'), get_version)
+            if cached is not None:
+                return cached
+            self.queries += 1
+            return jsonify([{'title': f'Song {i}', 'v': self.version} for i in range(self.size)])
+        
+        @self.app.route('/small')
+        def small():
+            return jsonify({'ok': True})
+        
+        @self.app.route('/audio')
+        def audio():
+            return send_file(self.audio.name, mimetype='audio/mpeg')
+        
+        self.client = self.app.test_client()
+    
+    def tearDown(self):
+        os.unlink(self.audio.name)
+    
+    def test_gzip_large_json(self):
+        """Test: Große JSON-Antworten werden gzip-komprimiert"""
+        with patch.object(compression, 'brotli', None):
+            response = self.client.get('/list', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data).count(b'Song'), 100)
+    
+    def test_no_compression_without_accept_encoding(self):
+        """Test: Ohne Accept-Encoding bleibt der Body unkomprimiert"""
+        response = self.client.get('/list')
+        
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIsNotNone(response.headers.get('ETag'))
+        self.assertEqual(len(response.get_json()), 100)
+    
+    def test_small_response_untouched(self):
+        """Test: Antworten unter der Mindestgröße werden nicht komprimiert"""
+        response = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('ETag', response.headers)
+    
+    def test_audio_untouched(self):
+        """Test: Audio wird nie komprimiert"""
+        response = self.client.get('/audio', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertTrue(response.data.startswith(b'ID3'))
+        response.close()
+    
+    def test_if_none_match_returns_304(self):
+        """Test: Bekanntes ETag liefert 304 ohne Body"""
+        with patch.object(compression, 'brotli', None):
+            first = self.client.get('/list', headers={'Accept-Encoding': 'gzip'})
+            etag = first.headers['ETag']
+            second = self.client.get('/list', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertEqual(second.headers['ETag'], etag)
+    
+    def test_compressed_bytes_are_cached(self):
+        """Test: Gleicher Body wird nur einmal komprimiert"""
+        with patch.object(compression, 'brotli', None), \
+                patch('app.compression.compress', wraps=compression.compress) as mock_compress:
+            self.client.get('/list', headers={'Accept-Encoding': 'gzip'})
+            response = self.client.get('/list', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(mock_compress.call_count, 1)
+        self.assertEqual(gzip.decompress(response.data).count(b'Song'), 100)
+    
+    def test_lookup_skips_query_for_unchanged_library(self):
+        """Test: Bei unverändertem Stand kommen 304 bzw. Cache-Bytes ohne Abfrage"""
+        with patch.object(compression, 'brotli', None):
+            first = self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+            cached = self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+            not_modified = self.client.get(
+                '/library', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']}
+            )
+        
+        self.assertEqual(self.queries, 1)
+        self.assertEqual(cached.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(gzip.decompress(cached.data).count(b'Song'), 100)
+        self.assertEqual(not_modified.status_code, 304)
+    
+    def test_lookup_queries_after_change(self):
+        """Test: Neuer Stand der Bibliothek fragt neu ab, ebenso ohne Accept-Encoding"""
+        with patch.object(compression, 'brotli', None):
+            first = self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+            self.client.get('/library')
+            self.version = 2
+            changed = self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(self.queries, 3)
+        self.assertNotEqual(changed.headers['ETag'], first.headers['ETag'])
+    
+    def test_lookup_skips_version_when_cache_cannot_answer(self):
+        """Test: Ohne ETag und ohne Accept-Encoding wird der Stand nicht abgefragt"""
+        self.client.get('/library')
+        self.client.get('/library')
+        
+        self.assertEqual(self.version_lookups, 0)
+        self.assertEqual(self.queries, 2)
+    
+    def test_lookup_skips_version_for_small_responses(self):
+        """Test: Nach einer zu kleinen Antwort entfällt der Stand, bis sie wieder groß genug ist"""
+        self.size = 1
+        with patch.object(compression, 'brotli', None):
+            self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+            self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(self.version_lookups, 1)
+            
+            self.size = 100
+            self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+            self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+            cached = self.client.get('/library', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(self.version_lookups, 3)
+        self.assertEqual(self.queries, 4)
+        self.assertEqual(cached.headers['Content-Encoding'], 'gzip')
+    
+    def test_cache_evicts_oldest(self):
+        """Test: LRU-Cache verdrängt den ältesten Eintrag"""
+        cache = compression.CompressedCache(2)
+        cache.put('a', b'1')
+        cache.put('b', b'2')
+        cache.get('a')
+        cache.put('c', b'3')
+        
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'1')
+
+
+if __name__ == '__main__':
+    unittest.main()
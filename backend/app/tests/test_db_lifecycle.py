@@ -0,0 +1,89 @@
+"""
+Unit Tests für den Verbindungsaufbau
+- create_app verbindet nicht mehr beim Start
+- MongoClient lazy pro Prozess
+- flask init-db legt Tabellen und Indizes an und ergänzt alte Playlists
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+from app import create_app
+from app.config import Config
+from app.models.mongo_models import MongoDB, mongo
+
+class TestConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'test-secret-key'
+    JWT_SECRET_KEY = 'test-jwt-secret-key'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    MONGO_URI = 'mongodb://localhost:27017'
+    METRICS_ENABLED = False
+
+class DbLifecycleTestCase(unittest.TestCase):
+    """Test suite für Verbindungs-Lebenszyklus"""
+    
+    def setUp(self):
+        self.factory = MagicMock()
+        self.original_factory = mongo.client_factory
+        mongo.client_factory = self.factory
+        mongo.reset()
+    
+    def tearDown(self):
+        mongo.client_factory = self.original_factory
+        mongo.reset()
+    
+    def test_create_app_does_not_connect(self):
+        """Test: App-Start öffnet keine MongoDB-Verbindung"""
+        create_app(TestConfig)
+        
+        self.factory.assert_not_called()
+        self.assertIsNone(mongo.client)
+    
+    def test_connect_reuses_client_in_same_process(self):
+        """Test: Im selben Prozess bleibt es bei einem Client"""
+        database = MongoDB()
+        database.client_factory = self.factory
+        app = create_app(TestConfig)
+        
+        with app.app_context():
+            database.connect()
+            database.connect()
+        
+        self.assertEqual(self.factory.call_count, 1)
+    
+    @patch('app.models.mongo_models.os.getpid')
+    def test_connect_after_fork_creates_new_client(self, mock_getpid):
+        """Test: Nach fork() (neue PID) wird ein eigener Client erzeugt"""
+        database = MongoDB()
+        database.client_factory = self.factory
+        app = create_app(TestConfig)
+        
+        with app.app_context():
+            mock_getpid.return_value = 100
+            database.connect()
+            parent_client = database.client
+            mock_getpid.return_value = 101
+            database.connect()
+        
+        self.assertEqual(self.factory.call_count, 2)
+        parent_client.close.assert_not_called()
+        self.assertEqual(database.pid, 101)
+    
+    @patch('app.cli.Playlist')
+    @patch('app.cli.db')
+    @patch('app.cli.mongo')
+    def test_init_db_command(self, mock_mongo, mock_db, mock_playlist):
+        """Test: flask init-db legt Tabellen und Indizes an und ergänzt alte Playlists"""
+        mock_playlist.recompute_aggregates.return_value = (3, 3)
+        app = create_app(TestConfig)
+        
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        
+        self.assertEqual(result.exit_code, 0)
+        mock_db.create_all.assert_called_once()
+        mock_mongo.connect.return_value.ensure_indexes.assert_called_once()
+        mock_playlist.recompute_aggregates.assert_called_once_with(missing_only=True)
+        self.assertIn('3 Playlists ergänzt', result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+"""
+Unit Tests für event_routes.py und den Eventpuffer
+- Validierung von play/skip/seek-Events
+- Gesammeltes Schreiben und Backpressure
+"""
+import unittest
+from unittest.mock import MagicMock
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from app.routes.event_routes import event_bp
+from app.services.change_feed import ChangeFeed
+from app.services.event_buffer import EventBuffer
+from bson import ObjectId
+import json
+
+class EventRoutesTestCase(unittest.TestCase):
+    """Test suite für die Event-Annahme"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+        
+        JWTManager(self.app)
+        self.app.register_blueprint(event_bp, url_prefix='/events')
+        self.buffer = MagicMock()
+        self.buffer.add.return_value = True
+        self.app.extensions['event_buffer'] = self.buffer
+        
+        self.client = self.app.test_client()
+        self.user_id = 'user_12345'
+        self.song_id = str(ObjectId())
+        
+        with self.app.app_context():
+            self.access_token = create_access_token(identity=self.user_id)
+    
+    def _post(self, payload):
+        return self.client.post(
+            '/events',
+            data=json.dumps(payload),
+            headers={'Authorization': f'Bearer {self.access_token}'},
+            content_type='application/json'
+        )
+    
+    def test_ingest_batch(self):
+        """Test: Batch aus play/skip/seek wird angenommen"""
+        response = self._post({'events': [
+            {'type': 'play', 'song_id': self.song_id, 'ts': 1700000000000},
+            {'type': 'seek', 'song_id': self.song_id, 'position_ms': 30000},
+            {'type': 'skip', 'song_id': self.song_id, 'listened_ms': 12000}
+        ]})
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data)['accepted'], 3)
+        events = self.buffer.add.call_args[0][0]
+        self.assertEqual([e['type'] for e in events], ['play', 'seek', 'skip'])
+        self.assertTrue(all(e['user_id'] == self.user_id for e in events))
+        self.assertEqual(events[2]['listened_ms'], 12000)
+        self.assertEqual(len({e['_id'] for e in events}), 3)
+    
+    def test_ingest_invalid_type(self):
+        """Test: Unbekannter Event-Typ wird abgelehnt"""
+        response = self._post({'events': [{'type': 'pause', 'song_id': self.song_id}]})
+        
+        self.assertEqual(response.status_code, 400)
+        self.buffer.add.assert_not_called()
+    
+    def test_ingest_negative_position(self):
+        """Test: Negative Positionen werden abgelehnt"""
+        response = self._post({'events': [
+            {'type': 'seek', 'song_id': self.song_id, 'position_ms': -1}
+        ]})
+        
+        self.assertEqual(response.status_code, 400)
+    
+    def test_ingest_out_of_range_ts(self):
+        """Test: Zu große oder zu weit in der Zukunft liegende ts ergeben 400 statt 500"""
+        for ts in (10 ** 17, 10 ** 20, 4102444800000):
+            response = self._post({'events': [{'type': 'play', 'song_id': self.song_id, 'ts': ts}]})
+            
+            self.assertEqual(response.status_code, 400)
+        self.buffer.add.assert_not_called()
+    
+    def test_ingest_body_not_object(self):
+        """Test: Ein JSON-Array als Body wird abgelehnt"""
+        response = self._post([{'type': 'play', 'song_id': self.song_id}])
+        
+        self.assertEqual(response.status_code, 400)
+    
+    def test_ingest_buffer_full(self):
+        """Test: Voller Puffer liefert 503 mit Retry-After"""
+        self.buffer.add.return_value = False
+        
+        response = self._post({'events': [{'type': 'play', 'song_id': self.song_id}]})
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+    
+    def test_ingest_without_jwt(self):
+        """Test: Events ohne JWT Token werden abgelehnt"""
+        response = self.client.post('/events', json={'events': []})
+        
+        self.assertEqual(response.status_code, 401)
+
+
+class EventBufferTestCase(unittest.TestCase):
+    """Test suite für den Eventpuffer"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.written = []
+        self.buffer = EventBuffer(self.written.append, flush_size=100, flush_interval=60, max_size=5)
+    
+    def tearDown(self):
+        """Nach jedem Test ausführen"""
+        self.buffer.close()
+    
+    def test_flush_writes_one_batch(self):
+        """Test: Mehrere Events werden in einem Schreibvorgang geschrieben"""
+        self.buffer.add([{'n': 1}, {'n': 2}])
+        self.buffer.add([{'n': 3}])
+        
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.written, [[{'n': 1}, {'n': 2}, {'n': 3}]])
+    
+    def test_backpressure_when_full(self):
+        """Test: add() lehnt ab, wenn der Puffer voll ist"""
+        self.assertTrue(self.buffer.add([{}] * 5))
+        self.assertFalse(self.buffer.add([{}]))
+        self.assertEqual(len(self.buffer), 5)
+    
+    def test_failed_write_is_requeued(self):
+        """Test: Fehlgeschlagene Schreibvorgänge gehen nicht verloren"""
+        self.buffer.writer = MagicMock(side_effect=RuntimeError('mongo down'))
+        self.buffer.add([{'n': 1}])
+        
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 1)
+    
+    def test_partial_write_requeues_only_rest(self):
+        """Test: Nur die vom Writer zurückgegebenen Events werden wiederholt"""
+        self.buffer.writer = MagicMock(return_value=[{'n': 2}])
+        self.buffer.add([{'n': 1}, {'n': 2}])
+        
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer._events, [{'n': 2}])
+    
+    def test_close_drains_buffer(self):
+        """Test: Beim Herunterfahren wird der Rest geschrieben"""
+        self.buffer.add([{'n': 1}])
+        self.buffer.close()
+        
+        self.assertEqual(self.written, [[{'n': 1}]])
+        self.assertFalse(self.buffer.add([{'n': 2}]))
+
+
+class ChangeStreamRouteTestCase(unittest.TestCase):
+    """Test suite für GET /events/stream"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+        self.app.config['SSE_HEARTBEAT'] = 0.01
+        
+        JWTManager(self.app)
+        self.app.register_blueprint(event_bp, url_prefix='/events')
+        self.feed = ChangeFeed(self.app)
+        self.feed._thread.ensure_started = lambda: None
+        self.app.extensions['change_feed'] = self.feed
+        
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            self.headers = {'Authorization': f'Bearer {create_access_token(identity="user_12345")}'}
+    
+    def test_stream_replays_after_last_event_id(self):
+        """Test: SSE-Antwort mit Replay ab Last-Event-ID und Heartbeat"""
+        self.feed.dispatch('t1', 'user_12345', {'kind': 'songs', 'id': 'a', 'op': 'upsert'})
+        self.feed.dispatch('t2', 'user_12345', {'kind': 'songs', 'id': 'b', 'op': 'delete'})
+        
+        response = self.client.get('/events/stream', headers=dict(self.headers, **{'Last-Event-ID': 't1'}), buffered=False)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['X-Accel-Buffering'], 'no')
+        chunks = iter(response.response)
+        next(chunks)
+        self.assertIn(b'id: t2', next(chunks))
+        self.assertEqual(next(chunks), b': ping\n\n')
+        response.close()
+        self.assertEqual(dict(self.feed._subscribers), {})
+    
+    def test_stream_unavailable(self):
+        """Test: Ohne Change Stream (kein Replica Set) gibt es 503"""
+        self.feed.available = False
+        
+        response = self.client.get('/events/stream', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 503)
+    
+    def test_stream_full_worker(self):
+        """Test: Ist der Worker voll, gibt es 503 mit Retry-After"""
+        self.feed.max_connections = 1
+        first = self.client.get('/events/stream', headers=self.headers, buffered=False)
+        
+        response = self.client.get('/events/stream', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        first.close()
+        self.assertEqual(self.feed._connections, 0)
+
+if __name__ == '__main__':
+    unittest.main()
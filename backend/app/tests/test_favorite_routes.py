@@ -0,0 +1,164 @@
+"""
+Unit Tests für favorite_routes.py
+- Markieren / Entfernen
+- Batch-Operationen
+"""
+import unittest
+from unittest.mock import patch, MagicMock
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from app.routes.favorite_routes import favorite_bp
+from bson import ObjectId
+import json
+
+class FavoriteRoutesTestCase(unittest.TestCase):
+    """Test suite für Favoriten"""
+
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+
+        JWTManager(self.app)
+        self.app.register_blueprint(favorite_bp, url_prefix='/favorites')
+
+        self.client = self.app.test_client()
+        self.user_id = 'user_12345'
+        self.song_id = str(ObjectId())
+
+        with self.app.app_context():
+            self.access_token = create_access_token(identity=self.user_id)
+
+    def _send(self, method, url, payload):
+        return getattr(self.client, method)(
+            url,
+            data=json.dumps(payload),
+            headers={'Authorization': f'Bearer {self.access_token}'},
+            content_type='application/json'
+        )
+
+    # ============== MARK-TESTS ==============
+
+    @patch('app.routes.favorite_routes.Favorite')
+    @patch('app.routes.favorite_routes.Song')
+    def test_mark_favorite_uses_upsert(self, mock_song, mock_favorite):
+        """Test: Markieren ohne die Favoritenliste zu laden"""
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = self.user_id
+        mock_song.get_by_id.return_value = mock_song_instance
+        mock_favorite.create.return_value = True
+
+        response = self._send('post', '/favorites/mark', {'song_id': self.song_id})
+
+        self.assertEqual(response.status_code, 200)
+        mock_favorite.create.assert_called_once_with(self.user_id, self.song_id)
+        mock_favorite.get_by_user.assert_not_called()
+
+    @patch('app.routes.favorite_routes.Favorite')
+    @patch('app.routes.favorite_routes.Song')
+    def test_mark_favorite_already_marked(self, mock_song, mock_favorite):
+        """Test: Bereits markierter Song liefert 400"""
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = self.user_id
+        mock_song.get_by_id.return_value = mock_song_instance
+        mock_favorite.create.return_value = False
+
+        response = self._send('post', '/favorites/mark', {'song_id': self.song_id})
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch('app.routes.favorite_routes.Favorite')
+    @patch('app.routes.favorite_routes.Song')
+    def test_mark_favorite_foreign_song(self, mock_song, mock_favorite):
+        """Test: Fremder Song kann nicht markiert werden"""
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = 'different_user_id'
+        mock_song.get_by_id.return_value = mock_song_instance
+
+        response = self._send('post', '/favorites/mark', {'song_id': self.song_id})
+
+        self.assertEqual(response.status_code, 404)
+        mock_favorite.create.assert_not_called()
+
+    # ============== UNMARK-TESTS ==============
+
+    @patch('app.routes.favorite_routes.Favorite')
+    def test_unmark_favorite_reports_removed(self, mock_favorite):
+        """Test: Entfernen meldet, ob etwas gelöscht wurde"""
+        mock_favorite.delete.return_value = False
+
+        response = self._send('delete', '/favorites/unmark', {'song_id': self.song_id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(json.loads(response.data)['removed'])
+
+    # ============== LIST-TESTS ==============
+
+    @patch('app.routes.favorite_routes.Favorite')
+    @patch('app.routes.favorite_routes.Song')
+    def test_list_favorites_single_query(self, mock_song, mock_favorite):
+        """Test: Favoriten werden in einem Query aufgelöst"""
+        song_ids = [ObjectId(), ObjectId()]
+        mock_favorite.get_by_user.return_value = song_ids
+        mock_song_instance = MagicMock()
+        mock_song_instance.to_dict.return_value = {'id': str(song_ids[0])}
+        mock_song.get_by_ids.return_value = [mock_song_instance]
+
+        response = self.client.get(
+            '/favorites/list',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.data)), 1)
+        mock_song.get_by_ids.assert_called_once_with(self.user_id, song_ids)
+        mock_song.get_by_id.assert_not_called()
+
+    # ============== BATCH-TESTS ==============
+
+    @patch('app.routes.favorite_routes.Favorite')
+    @patch('app.routes.favorite_routes.Song')
+    def test_mark_batch_rejects_foreign_songs(self, mock_song, mock_favorite):
+        """Test: Batch markiert nur eigene Songs"""
+        foreign_id = str(ObjectId())
+        mock_song.filter_owned.return_value = {ObjectId(self.song_id)}
+        mock_favorite.create_many.return_value = 1
+
+        response = self._send('post', '/favorites/mark-batch', {
+            'song_ids': [self.song_id, foreign_id, self.song_id]
+        })
+
+        self.assertEqual(response.status_code, 200)
+        response_data = json.loads(response.data)
+        self.assertEqual(response_data['marked'], 1)
+        self.assertEqual(response_data['rejected'], [foreign_id])
+        mock_favorite.create_many.assert_called_once_with(self.user_id, [self.song_id])
+
+    @patch('app.routes.favorite_routes.Favorite')
+    def test_unmark_batch(self, mock_favorite):
+        """Test: Batch-Entfernen in einem Aufruf"""
+        other_id = str(ObjectId())
+        mock_favorite.delete_many.return_value = 2
+
+        response = self._send('delete', '/favorites/unmark-batch', {
+            'song_ids': [self.song_id, other_id]
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['removed'], 2)
+        mock_favorite.delete_many.assert_called_once_with(self.user_id, [self.song_id, other_id])
+
+    @patch('app.routes.favorite_routes.Favorite')
+    def test_batch_invalid_song_id(self, mock_favorite):
+        """Test: Ungültige song_id im Batch"""
+        response = self._send('delete', '/favorites/unmark-batch', {
+            'song_ids': ['not-a-valid-id']
+        })
+
+        self.assertEqual(response.status_code, 400)
+        mock_favorite.delete_many.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Unit Tests für file_gc.py
+- Verwaiste Dateien werden batchweise gelöscht
+- Checkpoint und Mindestalter
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.services import file_gc
+from app.storage import LocalStorage
+
+class FileGcTestCase(unittest.TestCase):
+    """Test suite für die Datei-GC"""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage = LocalStorage(self.root)
+        old = time.time() - 7200
+        for key in ('1_a.mp3', '1_b.mp3', '1_c.mp3', 'art/abc/96.jpg', 'art/def/96.jpg'):
+            self.storage.put(key, BytesIO(b'x'))
+            os.utime(self.storage.local_path(key), (old, old))
+        
+        self.state = {}
+        patcher = patch('app.services.file_gc.Maintenance')
+        self.mock_maintenance = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_maintenance.get.side_effect = lambda name: dict(self.state)
+        self.mock_maintenance.save.side_effect = lambda name, fields: self.state.update(fields)
+        
+        patcher = patch('app.services.file_gc.Song')
+        self.mock_song = patcher.start()
+        self.addCleanup(patcher.stop)
+        # 1_a.mp3 als Altbestand mit absolutem Pfad, Cover abc in Benutzung
+        referenced = {os.path.join(self.root, '1_a.mp3'), '1_c.mp3'}
+        self.mock_song.referenced_files.side_effect = lambda keys: referenced & set(keys)
+        self.mock_song.referenced_art.side_effect = lambda ids: {'abc'} & set(ids)
+    
+    def tearDown(self):
+        shutil.rmtree(self.root)
+    
+    def remaining(self):
+        return sorted(key for key, _ in self.storage.list_keys())
+    
+    def test_full_run_deletes_orphans(self):
+        """Test: Nur unreferenzierte Dateien und Cover werden gelöscht"""
+        scanned, deleted = file_gc.run(self.storage, batch_size=2, min_age=3600)
+        
+        self.assertEqual((scanned, deleted), (5, 2))
+        self.assertEqual(self.remaining(), ['1_a.mp3', '1_c.mp3', 'art/abc/96.jpg'])
+        self.assertIsNone(self.state['last_key'])
+    
+    def test_checkpoint_resumes(self):
+        """Test: Der nächste Batch setzt hinter dem Checkpoint an"""
+        scanned, deleted, done = file_gc.collect_batch(self.storage, 2, 3600)
+        
+        self.assertEqual((scanned, deleted, done), (2, 1, False))
+        self.assertEqual(self.state['last_key'], '1_b.mp3')
+        
+        file_gc.collect_batch(self.storage, 2, 3600)
+        
+        self.assertEqual(self.state['last_key'], 'art/abc/96.jpg')
+    
+    def test_recent_files_are_kept(self):
+        """Test: Frische Dateien (laufender Upload) bleiben liegen"""
+        self.storage.put('1_new.mp3', BytesIO(b'x'))
+        
+        file_gc.run(self.storage, batch_size=10, min_age=3600)
+        
+        self.assertIn('1_new.mp3', self.remaining())
+    
+    def test_delete_song_files_keeps_shared(self):
+        """Test: Dateien, die ein anderer Song nutzt, bleiben erhalten"""
+        songs = [
+            SimpleNamespace(file_path='1_b.mp3', art_id='def'),
+            SimpleNamespace(file_path='1_c.mp3', art_id='abc')
+        ]
+        
+        file_gc.delete_song_files(self.storage, songs)
+        
+        self.assertEqual(self.remaining(), ['1_a.mp3', '1_c.mp3', 'art/abc/96.jpg'])
+    
+    def test_delete_song_files_checks_aliases(self):
+        """Test: Ein Altbestand-Song mit absolutem Pfad schützt die Datei eines neuen Songs"""
+        file_gc.delete_song_files(self.storage, [SimpleNamespace(file_path='1_a.mp3', art_id=None)])
+        
+        self.assertIn('1_a.mp3', self.remaining())
+    
+    def test_run_with_owner_needs_lease(self):
+        """Test: Die CLI arbeitet nur mit Lease, sonst bricht sie ab"""
+        self.mock_maintenance.acquire_lease.return_value = False
+        
+        with self.assertRaises(RuntimeError):
+            file_gc.run(self.storage, batch_size=2, min_age=3600, owner='cli-1')
+        
+        self.assertEqual(len(self.remaining()), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Unit Tests für gunicorn.conf.py
+- Worker-Anzahl aus CPU-Zahl
+- post_worker_init lädt vor, worker_exit schreibt gepufferte Events
+"""
+import importlib.util
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+CONF_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'gunicorn.conf.py')
+
+def load_conf():
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONF_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Die Konfiguration setzt PROMETHEUS_MULTIPROC_DIR; nicht in andere Tests tragen
+    with patch.dict(os.environ):
+        spec.loader.exec_module(module)
+    return module
+
+class GunicornConfTestCase(unittest.TestCase):
+    """Test suite für die Server-Konfiguration"""
+    
+    def test_default_workers(self):
+        """Test: Sync/gthread 2 * CPU + 1, gevent einer pro CPU"""
+        conf = load_conf()
+        
+        self.assertEqual(conf.default_workers('gthread', cpu_count=4), 9)
+        self.assertEqual(conf.default_workers('sync', cpu_count=4), 9)
+        self.assertEqual(conf.default_workers('gevent', cpu_count=4), 4)
+    
+    def test_defaults(self):
+        """Test: gthread mit sendfile ist Standard"""
+        conf = load_conf()
+        
+        self.assertEqual(conf.worker_class, 'gthread')
+        self.assertGreater(conf.threads, 1)
+        self.assertTrue(conf.sendfile)
+        self.assertGreaterEqual(conf.timeout, 60)
+    
+    def test_worker_exit_closes_event_buffer(self):
+        """Test: Beim Beenden eines Workers wird der Eventpuffer geleert"""
+        conf = load_conf()
+        buffer = MagicMock()
+        worker = SimpleNamespace(wsgi=SimpleNamespace(extensions={'event_buffer': buffer}))
+        
+        conf.worker_exit(None, worker)
+        
+        buffer.close.assert_called_once()
+    
+    def test_post_worker_init_runs_warm_up(self):
+        """Test: Vorladen läuft beim Worker-Start, Fehler stoppen den Worker nicht"""
+        conf = load_conf()
+        warm_up = MagicMock()
+        failing = MagicMock(side_effect=OSError('kaputt'))
+        worker = SimpleNamespace(wsgi=SimpleNamespace(extensions={'warm_up': [failing, warm_up]}), log=MagicMock())
+        
+        conf.post_worker_init(worker)
+        
+        warm_up.assert_called_once()
+        worker.log.exception.assert_called_once()
+    
+    @patch('prometheus_client.multiprocess.mark_process_dead')
+    def test_child_exit_marks_metrics_dead(self, mock_mark):
+        """Test: Metriken eines beendeten Workers zählen nicht mehr als live"""
+        conf = load_conf()
+        
+        conf.child_exit(None, SimpleNamespace(pid=4242))
+        
+        mock_mark.assert_called_once_with(4242)
+    
+    def test_worker_exit_without_app(self):
+        """Test: Worker ohne geladene App wird ignoriert"""
+        conf = load_conf()
+        
+        conf.worker_exit(None, SimpleNamespace())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Unit Tests für logging_config.py
+- JSON-Format und Request-ID
+- Sampling und nicht-blockierende Queue
+"""
+import unittest
+import logging
+import queue
+import json
+from flask import Flask, jsonify
+from app.logging_config import (
+    JsonFormatter, SamplingFilter, NonBlockingQueueHandler, init_logging, parse_sampling, _stop_listener
+)
+
+class LoggingConfigTestCase(unittest.TestCase):
+    """Test suite für strukturiertes Logging"""
+    
+    def _record(self, name='app.routes.favorite_routes', level=logging.INFO, **extra):
+        record = logging.LogRecord(name, level, __file__, 1, 'list %s', ('favorites',), None)
+        for key, value in extra.items():
+            setattr(record, key, value)
+        return record
+    
+    def test_json_formatter_includes_extra_fields(self):
+        """Test: JSON enthält Nachricht, request_id und extra-Felder"""
+        output = json.loads(JsonFormatter().format(self._record(request_id='abc', user_id='42')))
+        
+        self.assertEqual(output['message'], 'list favorites')
+        self.assertEqual(output['request_id'], 'abc')
+        self.assertEqual(output['user_id'], '42')
+        self.assertEqual(output['level'], 'INFO')
+    
+    def test_sampling_filter_drops_info_keeps_warnings(self):
+        """Test: Sampling betrifft nur Records unter WARNING"""
+        sampling = SamplingFilter(parse_sampling('app.routes=0'))
+        
+        self.assertFalse(sampling.filter(self._record()))
+        self.assertTrue(sampling.filter(self._record(level=logging.WARNING)))
+        self.assertTrue(sampling.filter(self._record(name='app.services')))
+    
+    def test_full_queue_does_not_block(self):
+        """Test: Volle Queue verwirft Records statt zu blockieren"""
+        handler = NonBlockingQueueHandler(queue.Queue(1))
+        handler.handle(self._record())
+        handler.handle(self._record())
+        
+        self.assertEqual(handler.queue.qsize(), 1)
+    
+    def test_request_id_header(self):
+        """Test: Request-ID wird übernommen bzw. erzeugt und zurückgegeben"""
+        app = Flask(__name__)
+        app.config['TESTING'] = True
+        init_logging(app)
+        self.addCleanup(_stop_listener)
+        
+        @app.route('/ping')
+        def ping():
+            return jsonify({})
+        
+        client = app.test_client()
+        self.assertEqual(client.get('/ping', headers={'X-Request-ID': 'req-1'}).headers['X-Request-ID'], 'req-1')
+        generated = client.get('/ping', headers={'X-Request-ID': 'bad id'}).headers['X-Request-ID']
+        self.assertEqual(len(generated), 32)
+
+
+if __name__ == '__main__':
+    unittest.main()
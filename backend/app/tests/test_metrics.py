@@ -0,0 +1,66 @@
+"""
+Unit Tests für metrics.py
+- Request-Middleware und /metrics
+- Zugriffsschutz per Token und erlaubten Adressen
+- Zusammenfassung mehrerer Worker (Multiprocess-Modus)
+"""
+import unittest
+from unittest.mock import patch
+from flask import Flask, jsonify
+from app import metrics
+
+class MetricsTestCase(unittest.TestCase):
+    """Test suite für Metriken"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['METRICS_ALLOWED_IPS'] = '127.0.0.1'
+        self.app.config['METRICS_TOKEN'] = 'scrape-token'
+        metrics.init_app(self.app)
+        
+        @self.app.route('/songs/<song_id>')
+        def song(song_id):
+            return jsonify({'id': song_id})
+        
+        self.client = self.app.test_client()
+    
+    def test_request_middleware_and_endpoint(self):
+        """Test: Requests werden pro URL-Regel gezählt und exportiert"""
+        self.client.get('/songs/1')
+        self.client.get('/songs/2')
+        response = self.client.get('/metrics')
+        
+        self.assertEqual(response.status_code, 200)
+        output = response.get_data(as_text=True)
+        self.assertIn('skipify_http_requests_total{endpoint="/songs/<song_id>",method="GET",status="200"}', output)
+        self.assertIn('skipify_http_request_duration_seconds_count{endpoint="/songs/<song_id>",method="GET"}', output)
+    
+    def test_metrics_forbidden_from_other_address(self):
+        """Test: Fremde Adressen ohne Token bekommen 403"""
+        response = self.client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'})
+        
+        self.assertEqual(response.status_code, 403)
+    
+    def test_metrics_with_token(self):
+        """Test: Mit gültigem Token ist /metrics von überall erreichbar"""
+        response = self.client.get(
+            '/metrics',
+            headers={'Authorization': 'Bearer scrape-token'},
+            environ_base={'REMOTE_ADDR': '203.0.113.7'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+    
+    @patch('app.metrics.multiprocess')
+    def test_multiprocess_collector_when_configured(self, mock_multiprocess):
+        """Test: Mit PROMETHEUS_MULTIPROC_DIR werden alle Worker zusammengefasst"""
+        with patch.dict('os.environ', {'PROMETHEUS_MULTIPROC_DIR': '/tmp/metrics'}):
+            metrics.render()
+        
+        mock_multiprocess.MultiProcessCollector.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,7 @@ import unittest
 from unittest.mock import Mock, patch, MagicMock
 from flask import Flask
 from flask_jwt_extended import JWTManager, create_access_token
-from app.routes.playlist_routes import playlist_bp
+from app.routes.playlist_routes import playlist_bp, parse_operations
 from app.models.mongo_models import Playlist
 from bson import ObjectId
 import json
@@ -47,6 +47,7 @@ class PlaylistRoutesTestCase(unittest.TestCase):
             'songs': []
         }
         mock_playlist_class.create.return_value = mock_playlist_instance
+        mock_playlist_class.validate_songs.return_value = ([], [])
         
         payload = {
             'name': 'Meine Lieblingssongs',
@@ -80,6 +81,7 @@ class PlaylistRoutesTestCase(unittest.TestCase):
             'songs': [song_id_1, song_id_2]
         }
         mock_playlist_class.create.return_value = mock_playlist_instance
+        mock_playlist_class.validate_songs.return_value = ([ObjectId(song_id_1), ObjectId(song_id_2)], [])
         
         payload = {
             'name': 'Rock Classics',
@@ -234,6 +236,7 @@ class PlaylistRoutesTestCase(unittest.TestCase):
         mock_playlist_instance = MagicMock()
         mock_playlist_instance.user_id = self.user_id
         mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        mock_playlist_class.validate_songs.return_value = ([ObjectId(song_id_1), ObjectId(song_id_2)], [])
         
         payload = {
             'songs': [song_id_1, song_id_2]
@@ -257,6 +260,7 @@ class PlaylistRoutesTestCase(unittest.TestCase):
         mock_playlist_instance = MagicMock()
         mock_playlist_instance.user_id = self.user_id
         mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        mock_playlist_class.validate_songs.return_value = ([ObjectId(song_id)], [])
         
         payload = {
             'name': 'Updated Playlist',
@@ -273,6 +277,23 @@ class PlaylistRoutesTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         mock_playlist_class.update.assert_called_once()
     
+    @patch('app.routes.playlist_routes.Playlist')
+    def test_update_playlist_invalid_version(self, mock_playlist_class):
+        """Test: Eine version, die keine Zahl ist, wird mit 400 abgelehnt"""
+        mock_playlist_instance = MagicMock()
+        mock_playlist_instance.user_id = self.user_id
+        mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        
+        response = self.client.put(
+            f'/playlists/{self.playlist_id}',
+            data=json.dumps({'name': 'Neu', 'version': '3'}),
+            headers={'Authorization': f'Bearer {self.access_token}'},
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 400)
+        mock_playlist_class.update.assert_not_called()
+    
     @patch('app.routes.playlist_routes.Playlist')
     def test_update_playlist_not_found(self, mock_playlist_class):
         """Test: Update fehlschlagen wenn Playlist nicht existiert"""
@@ -336,7 +357,7 @@ class PlaylistRoutesTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         response_data = json.loads(response.data)
         self.assertEqual(response_data['message'], 'Playlist gelöscht')
-        mock_playlist_class.delete.assert_called_once_with(self.playlist_id)
+        mock_playlist_class.delete.assert_called_once_with(self.playlist_id, self.user_id)
     
     @patch('app.routes.playlist_routes.Playlist')
     def test_delete_playlist_not_found(self, mock_playlist_class):
@@ -374,6 +395,284 @@ class PlaylistRoutesTestCase(unittest.TestCase):
         
         self.assertEqual(response.status_code, 401)
 
+    
+    # ============== OPERATIONEN-TESTS ==============
+    
+    def _patch_songs(self, payload):
+        return self.client.patch(
+            f'/playlists/{self.playlist_id}/songs',
+            data=json.dumps(payload),
+            headers={'Authorization': f'Bearer {self.access_token}'},
+            content_type='application/json'
+        )
+    
+    @patch('app.routes.playlist_routes.Playlist')
+    def test_edit_songs_add_at_position(self, mock_playlist_class):
+        """Test: Song an Position einfügen"""
+        existing = ObjectId()
+        mock_playlist_instance = MagicMock()
+        mock_playlist_instance.user_id = self.user_id
+        mock_playlist_instance.version = 3
+        mock_playlist_instance.songs = [existing]
+        mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        mock_playlist_class.apply_operations.return_value = 4
+        mock_playlist_class.validate_songs.return_value = ([], [])
+        
+        song_id = str(ObjectId())
+        response = self._patch_songs({
+            'version': 3,
+            'ops': [{'op': 'add', 'song_id': song_id, 'position': 0}]
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['version'], 4)
+        mock_playlist_class.apply_operations.assert_called_once_with(
+            self.playlist_id,
+            [{'op': 'add', 'song_id': song_id, 'position': 0}],
+            3
+        )
+    
+    @patch('app.routes.playlist_routes.Playlist')
+    def test_edit_songs_stale_version(self, mock_playlist_class):
+        """Test: Veraltete Version wird mit 409 abgelehnt"""
+        mock_playlist_instance = MagicMock()
+        mock_playlist_instance.user_id = self.user_id
+        mock_playlist_instance.version = 5
+        mock_playlist_instance.songs = []
+        mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        
+        response = self._patch_songs({
+            'version': 4,
+            'ops': [{'op': 'add', 'song_id': str(ObjectId())}]
+        })
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.data)['version'], 5)
+        mock_playlist_class.apply_operations.assert_not_called()
+    
+    @patch('app.routes.playlist_routes.Playlist')
+    def test_edit_songs_concurrent_conflict(self, mock_playlist_class):
+        """Test: Konflikt beim Schreiben meldet 409 mit der aktuellen Version"""
+        song_id = ObjectId()
+        mock_playlist_instance = MagicMock()
+        mock_playlist_instance.user_id = self.user_id
+        mock_playlist_instance.version = 0
+        mock_playlist_instance.songs = [song_id]
+        changed = MagicMock()
+        changed.version = 1
+        mock_playlist_class.get_by_id.side_effect = [mock_playlist_instance, changed]
+        mock_playlist_class.apply_operations.return_value = None
+        
+        response = self._patch_songs({
+            'version': 0,
+            'ops': [
+                {'op': 'move', 'song_id': str(song_id), 'position': 0},
+                {'op': 'remove', 'song_id': str(song_id)}
+            ]
+        })
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.data)['version'], 1)
+        ops = mock_playlist_class.apply_operations.call_args[0][1]
+        self.assertEqual([op['op'] for op in ops], ['move', 'remove'])
+    
+    @patch('app.routes.playlist_routes.Playlist')
+    def test_edit_songs_remove_missing_song(self, mock_playlist_class):
+        """Test: Entfernen eines Songs, der nicht in der Playlist ist"""
+        mock_playlist_instance = MagicMock()
+        mock_playlist_instance.user_id = self.user_id
+        mock_playlist_instance.version = 0
+        mock_playlist_instance.songs = []
+        mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        
+        response = self._patch_songs({
+            'version': 0,
+            'ops': [{'op': 'remove', 'song_id': str(ObjectId())}]
+        })
+        
+        self.assertEqual(response.status_code, 400)
+        mock_playlist_class.apply_operations.assert_not_called()
+    
+    @patch('app.models.mongo_models.mongo')
+    @patch('app.models.mongo_models.Song')
+    def test_apply_operations_single_pipeline(self, mock_song_class, mock_mongo):
+        """Test: Alle Ops laufen als ein Pipeline-Update, gebunden an die Version"""
+        first, second = ObjectId(), ObjectId()
+        mock_song_class.get_durations.return_value = {second: 2500}
+        collection = mock_mongo.connect.return_value.playlists
+        collection.update_one.return_value.matched_count = 1
+        ops = [
+            {'op': 'add', 'song_id': str(second), 'position': 0},
+            {'op': 'move', 'song_id': str(first), 'position': None}
+        ]
+        
+        version = Playlist.apply_operations(self.playlist_id, ops, 3)
+        
+        self.assertEqual(version, 4)
+        mock_song_class.get_durations.assert_called_once_with({second})
+        collection.update_one.assert_called_once()
+        query, pipeline = collection.update_one.call_args[0]
+        self.assertEqual(query, {'_id': ObjectId(self.playlist_id), 'version': 3})
+        self.assertEqual(len(pipeline), 3)
+        self.assertIn(second, pipeline[0]['$set']['songs']['$let']['in']['$concatArrays'][1])
+        self.assertEqual(pipeline[0]['$set']['song_count'], {'$add': ['$song_count', 1]})
+        self.assertEqual(pipeline[0]['$set']['total_duration_ms'], {'$add': ['$total_duration_ms', 2500]})
+        self.assertEqual(list(pipeline[1]['$set']), ['songs'])
+    
+    def test_op_stage_remove_decrements_every_occurrence(self):
+        """Test: remove filtert alle Vorkommen und zieht Anzahl und Dauer dafür ab"""
+        song_id = ObjectId()
+        stage = Playlist._op_stage({'op': 'remove', 'song_id': str(song_id), 'position': None}, 1000)['$set']
+        
+        self.assertEqual(stage['songs']['$filter']['cond'], {'$ne': ['$$this', song_id]})
+        occurrences = stage['song_count']['$subtract'][1]
+        self.assertEqual(occurrences['$size']['$filter']['cond'], {'$eq': ['$$this', song_id]})
+        self.assertEqual(stage['total_duration_ms']['$subtract'][1], {'$multiply': [occurrences, 1000]})
+    
+    @patch('app.models.mongo_models.mongo')
+    @patch('app.models.mongo_models.Song')
+    def test_apply_operations_conflict_writes_nothing(self, mock_song_class, mock_mongo):
+        """Test: Bei Versionskonflikt liefert apply_operations None"""
+        mock_song_class.get_durations.return_value = {}
+        mock_mongo.connect.return_value.playlists.update_one.return_value.matched_count = 0
+        
+        self.assertIsNone(Playlist.apply_operations(self.playlist_id, [], 0))
+    
+    def test_parse_operations_counts_and_rejects_duplicates(self):
+        """Test: Doppeltes add wird abgelehnt, remove entfernt alle Vorkommen"""
+        song_id = str(ObjectId())
+        
+        _, _, error = parse_operations([{'op': 'add', 'song_id': song_id}], [song_id])
+        self.assertIn('bereits', error)
+        
+        ops, songs, error = parse_operations([{'op': 'remove', 'song_id': song_id}], [song_id, song_id])
+        self.assertIsNone(error)
+        self.assertEqual(len(ops), 1)
+        self.assertEqual(songs, [])
+    
+    @patch('app.models.mongo_models.mongo')
+    @patch('app.models.mongo_models.Song')
+    def test_create_stores_aggregates(self, mock_song_class, mock_mongo):
+        """Test: Neue Playlists speichern Anzahl und Gesamtdauer mit"""
+        first, second = ObjectId(), ObjectId()
+        mock_song_class.get_durations.return_value = {first: 1000, second: 2500}
+        
+        playlist = Playlist.create({'name': 'Mix', 'user_id': self.user_id, 'songs': [first, second]})
+        
+        stored = mock_mongo.connect.return_value.playlists.insert_one.call_args[0][0]
+        self.assertEqual(stored['song_count'], 2)
+        self.assertEqual(stored['total_duration_ms'], 3500)
+        self.assertEqual(playlist.to_dict()['total_duration_ms'], 3500)
+    
+    @patch('app.models.mongo_models.mongo')
+    def test_recompute_aggregates_fixes_drift(self, mock_mongo):
+        """Test: Nur abweichende Playlists werden versionsgebunden korrigiert"""
+        playlists = mock_mongo.connect.return_value.playlists
+        ok, drifted = ObjectId(), ObjectId()
+        playlists.aggregate.return_value = [
+            {'_id': ok, 'version': 1, 'song_count': 2, 'total_duration_ms': 500, 'actual_count': 2, 'actual_duration': 500},
+            {'_id': drifted, 'song_count': 1, 'actual_count': 3, 'actual_duration': 900}
+        ]
+        playlists.bulk_write.return_value.modified_count = 1
+        
+        self.assertEqual(Playlist.recompute_aggregates(), (2, 1))
+        
+        requests = playlists.bulk_write.call_args[0][0]
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0]._filter, {'_id': drifted, 'version': None})
+        fields = requests[0]._doc['$set']
+        self.assertEqual((fields['song_count'], fields['total_duration_ms']), (3, 900))
+        self.assertIn('updated_at', fields)
+    
+    @patch('app.models.mongo_models.mongo')
+    def test_recompute_aggregates_missing_only(self, mock_mongo):
+        """Test: Für init-db werden nur Playlists ohne song_count/total_duration_ms betrachtet"""
+        playlists = mock_mongo.connect.return_value.playlists
+        legacy = ObjectId()
+        playlists.aggregate.return_value = [{'_id': legacy, 'actual_count': 2, 'actual_duration': 700}]
+        playlists.bulk_write.return_value.modified_count = 1
+        
+        self.assertEqual(Playlist.recompute_aggregates(missing_only=True), (1, 1))
+        
+        pipeline = playlists.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0]['$match'], {'$or': [{'song_count': None}, {'total_duration_ms': None}]})
+        fields = playlists.bulk_write.call_args[0][0][0]._doc['$set']
+        self.assertEqual((fields['song_count'], fields['total_duration_ms']), (2, 700))
+    
+    @patch('app.models.mongo_models.Song')
+    def test_validate_songs_dedupes_and_rejects(self, mock_song_class):
+        """Test: Eine Abfrage, Reihenfolge bleibt, Duplikate und fremde IDs fallen weg"""
+        own_1, own_2, foreign = ObjectId(), ObjectId(), ObjectId()
+        mock_song_class.filter_owned.return_value = {own_1, own_2}
+        
+        accepted, rejected = Playlist.validate_songs(
+            self.user_id,
+            [str(own_2), str(foreign), str(own_1), str(own_2), 'kaputt']
+        )
+        
+        self.assertEqual(accepted, [own_2, own_1])
+        self.assertEqual(rejected, [str(foreign), 'kaputt'])
+        mock_song_class.filter_owned.assert_called_once_with(
+            self.user_id, [str(own_2), str(foreign), str(own_1), 'kaputt']
+        )
+    
+    @patch('app.routes.playlist_routes.Playlist')
+    def test_edit_songs_add_foreign_song(self, mock_playlist_class):
+        """Test: Fremde Songs können nicht per add eingefügt werden"""
+        mock_playlist_instance = MagicMock()
+        mock_playlist_instance.user_id = self.user_id
+        mock_playlist_instance.version = 1
+        mock_playlist_instance.songs = []
+        mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        foreign = str(ObjectId())
+        mock_playlist_class.validate_songs.return_value = ([], [foreign])
+        
+        response = self._patch_songs({'version': 1, 'ops': [{'op': 'add', 'song_id': foreign}]})
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['rejected'], [foreign])
+        mock_playlist_class.apply_operations.assert_not_called()
+    
+    # ============== QUEUE-TESTS ==============
+    
+    @patch('app.routes.playlist_routes.shuffle', autospec=True)
+    @patch('app.routes.playlist_routes.Playlist')
+    def test_playlist_queue(self, mock_playlist_class, mock_shuffle):
+        """Test: Queue wird aus den gecachten Gewichten erzeugt"""
+        song_ids = [ObjectId(), ObjectId()]
+        mock_playlist_instance = MagicMock()
+        mock_playlist_instance.user_id = self.user_id
+        mock_playlist_instance.songs = song_ids
+        mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        mock_shuffle.generate_queue.return_value = [str(song_ids[1]), str(song_ids[0])]
+        
+        response = self.client.get(
+            f'/playlists/{self.playlist_id}/queue?seed=7',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['songs'], [str(song_ids[1]), str(song_ids[0])])
+        mock_shuffle.get_weights.assert_called_once_with(self.user_id, 300)
+        mock_shuffle.generate_queue.assert_called_once_with(
+            song_ids, mock_shuffle.get_weights.return_value, 7
+        )
+    
+    @patch('app.routes.playlist_routes.shuffle', autospec=True)
+    @patch('app.routes.playlist_routes.Playlist')
+    def test_playlist_queue_unauthorized(self, mock_playlist_class, mock_shuffle):
+        """Test: Queue für fremde Playlist wird verweigert"""
+        mock_playlist_instance = MagicMock()
+        mock_playlist_instance.user_id = 'different_user_id'
+        mock_playlist_class.get_by_id.return_value = mock_playlist_instance
+        
+        response = self.client.get(
+            f'/playlists/{self.playlist_id}/queue',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 404)
+        mock_shuffle.get_weights.assert_not_called()
 
 class PlaylistValidationTestCase(unittest.TestCase):
     """Test suite für Playlist Validierung"""
@@ -395,7 +694,7 @@ class PlaylistValidationTestCase(unittest.TestCase):
     
     @patch('app.routes.playlist_routes.Playlist')
     def test_invalid_object_id_in_songs(self, mock_playlist_class):
-        """Test: Ungültige ObjectIds in Songs werden gefiltert"""
+        """Test: Ungültige ObjectIds in Songs werden gefiltert und gemeldet"""
         mock_playlist_instance = MagicMock()
         mock_playlist_instance.to_dict.return_value = {
             'id': str(ObjectId()),
@@ -406,6 +705,7 @@ class PlaylistValidationTestCase(unittest.TestCase):
         
         invalid_id = 'not-a-valid-id'
         valid_id = str(ObjectId())
+        mock_playlist_class.validate_songs.return_value = ([ObjectId(valid_id)], [invalid_id])
         
         payload = {
             'name': 'Test Playlist',
@@ -420,6 +720,8 @@ class PlaylistValidationTestCase(unittest.TestCase):
         )
         
         self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.data)['rejected'], [invalid_id])
+        self.assertEqual(mock_playlist_class.create.call_args[0][0]['songs'], [ObjectId(valid_id)])
     
     @patch('app.routes.playlist_routes.Playlist')
     def test_empty_songs_list_valid(self, mock_playlist_class):
@@ -431,6 +733,7 @@ class PlaylistValidationTestCase(unittest.TestCase):
             'songs': []
         }
         mock_playlist_class.create.return_value = mock_playlist_instance
+        mock_playlist_class.validate_songs.return_value = ([], [])
         
         payload = {
             'name': 'Empty Playlist',
@@ -0,0 +1,83 @@
+"""
+Unit Tests für profiling.py
+- Profiling aus, per Sampling und per Admin-Header
+"""
+import unittest
+import os
+import shutil
+import tempfile
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token
+from app import profiling
+
+class ProfilingTestCase(unittest.TestCase):
+    """Test suite für das Request-Profiling"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.profile_dir = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+        self.app.config['PROFILING_DIR'] = self.profile_dir
+        self.app.config['PROFILING_ADMIN_IDS'] = ['admin']
+        JWTManager(self.app)
+    
+    def tearDown(self):
+        """Nach jedem Test ausführen"""
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+    
+    def _client(self):
+        @self.app.route('/songs/<song_id>')
+        def song(song_id):
+            return jsonify({'id': song_id})
+        return self.app.test_client()
+    
+    def _token(self, identity):
+        with self.app.app_context():
+            return create_access_token(identity=identity)
+    
+    def test_disabled_registers_no_hooks(self):
+        """Test: Ohne PROFILING_ENABLED keine Hooks"""
+        profiling.init_app(self.app)
+        
+        self.assertEqual(self.app.before_request_funcs, {})
+    
+    def test_sampled_request_writes_profile(self):
+        """Test: Gezogene Requests schreiben eine pstats-Datei"""
+        self.app.config.update(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0)
+        profiling.init_app(self.app)
+        
+        response = self._client().get('/songs/1')
+        
+        files = os.listdir(self.profile_dir)
+        self.assertEqual(len(files), 1)
+        self.assertIn('GET_songs_song_id', files[0])
+        self.assertNotIn('X-Profile-File', response.headers)
+    
+    def test_profile_header_only_in_debug(self):
+        """Test: Den Dateinamen bekommt der Client nur im Debug-Modus"""
+        self.app.config.update(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0)
+        self.app.debug = True
+        profiling.init_app(self.app)
+        
+        with self.assertLogs('app.profiling', level='INFO'):
+            response = self._client().get('/songs/1')
+        
+        self.assertEqual(response.headers['X-Profile-File'], os.listdir(self.profile_dir)[0])
+    
+    def test_header_requires_admin(self):
+        """Test: X-Profile wirkt nur für Admins"""
+        self.app.config.update(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0)
+        profiling.init_app(self.app)
+        client = self._client()
+        
+        client.get('/songs/1', headers={'X-Profile': '1', 'Authorization': f"Bearer {self._token('user')}"})
+        self.assertEqual(os.listdir(self.profile_dir), [])
+        
+        client.get('/songs/1', headers={'X-Profile': '1', 'Authorization': f"Bearer {self._token('admin')}"})
+        self.assertEqual(len(os.listdir(self.profile_dir)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
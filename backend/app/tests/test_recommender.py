@@ -0,0 +1,96 @@
+"""
+Unit Tests für services/recommender.py
+- Co-Occurrence-Index
+- Inkrementelle Updates
+- Gespeicherte Top-K-Listen und lokale Änderungen beim Neuladen
+"""
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from app.services.recommender import SimilarityIndex
+
+class SimilarityIndexTestCase(unittest.TestCase):
+    """Test suite für den Index ähnlicher Songs"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.index = SimilarityIndex()
+        self.index.build({
+            'playlist:1': ['s1', 's2', 's3'],
+            'playlist:2': ['s1', 's2'],
+            'favorites:u1': ['s3', 's4']
+        })
+    
+    def _rebuilt(self):
+        baskets = {
+            key: [self.index.song_ids[i] for i in members]
+            for key, members in self.index.baskets.items()
+        }
+        reference = SimilarityIndex()
+        reference.build(baskets)
+        return reference
+    
+    def test_similar_ranked_by_cooccurrence(self):
+        """Test: Songs werden nach gemeinsamen Vorkommen sortiert"""
+        similar = self.index.similar('s1')
+        self.assertEqual(similar[0], {'song_id': 's2', 'score': 2})
+        self.assertEqual(similar[1], {'song_id': 's3', 'score': 1})
+    
+    def test_unknown_song_returns_empty(self):
+        """Test: Unbekannter Song liefert leere Liste"""
+        self.assertEqual(self.index.similar('unknown'), [])
+    
+    def test_incremental_update_matches_rebuild(self):
+        """Test: Inkrementelle Updates entsprechen einem Neuaufbau"""
+        self.index.replace_basket('playlist:2', ['s1', 's4', 's5'])
+        self.index.add_to_basket('favorites:u1', ['s1'])
+        self.index.remove_from_basket('playlist:1', ['s2'])
+        self.index.drop_basket('playlist:3')
+        
+        reference = self._rebuilt()
+        for song_id in self.index.song_ids:
+            self.assertCountEqual(self.index.similar(song_id), reference.similar(song_id))
+    
+    def test_merged_delta_matches_rebuild(self):
+        """Test: Zusammengeführtes Delta bleibt korrekt"""
+        self.index.replace_basket('playlist:1', ['s3', 's5'])
+        self.index._merge_delta()
+        
+        reference = self._rebuilt()
+        for song_id in self.index.song_ids:
+            self.assertCountEqual(self.index.similar(song_id), reference.similar(song_id))
+    
+    def test_save_and_load(self):
+        """Test: Index kann gespeichert und geladen werden"""
+        path = os.path.join(tempfile.mkdtemp(), 'similarity.npz')
+        self.index.save(path)
+        
+        loaded = SimilarityIndex()
+        with patch.object(SimilarityIndex, '_rank_rows') as rank, \
+                patch.object(SimilarityIndex, '_cooc_from_baskets') as cooc:
+            loaded.load(path)
+        
+        rank.assert_not_called()
+        cooc.assert_not_called()
+        for song_id in self.index.song_ids:
+            self.assertEqual(loaded.similar(song_id), self.index.similar(song_id))
+    
+    def test_reload_keeps_local_changes(self):
+        """Test: Nach dem Neuladen einer Datei gelten lokale Änderungen weiter"""
+        path = os.path.join(tempfile.mkdtemp(), 'similarity.npz')
+        self.index.save(path)
+        worker = SimilarityIndex()
+        worker.load(path)
+        worker.replace_basket('playlist:2', ['s1', 's4'])
+        
+        worker.load(path)
+        
+        self.index.replace_basket('playlist:2', ['s1', 's4'])
+        for song_id in self.index.song_ids:
+            self.assertCountEqual(worker.similar(song_id), self.index.similar(song_id))
+        self.assertEqual(list(worker.local_changes), ['playlist:2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
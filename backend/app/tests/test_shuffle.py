@@ -0,0 +1,92 @@
+"""
+Unit Tests für services/shuffle.py
+- Gewichte aus Skips und Favoriten
+- Gewichtete Queue mit gestreuten Künstlern
+"""
+import unittest
+from unittest.mock import patch
+from app.services.shuffle import UserWeights, generate_queue
+from bson import ObjectId
+import numpy as np
+
+class ShuffleTestCase(unittest.TestCase):
+    """Test suite für den Skip-bewussten Shuffle"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.song_ids = [ObjectId() for _ in range(4)]
+    
+    @patch('app.services.shuffle.Favorite', autospec=True)
+    @patch('app.services.shuffle.Stats', autospec=True)
+    @patch('app.services.shuffle.Song', autospec=True)
+    def test_weights_from_skips_and_favorites(self, mock_song, mock_stats, mock_favorite):
+        """Test: Oft übersprungene Songs wiegen weniger, Favoriten mehr"""
+        skipped, favorite, plain, _ = self.song_ids
+        mock_song.get_artists_by_user.return_value = {s: 'Artist' for s in self.song_ids}
+        mock_stats.get_songs_by_user.return_value = [
+            {'song_id': skipped, 'plays': 10, 'skips': 10},
+            {'song_id': plain, 'plays': 10, 'skips': 0}
+        ]
+        mock_favorite.get_song_ids.return_value = {favorite}
+        
+        weights = UserWeights.load('user_1')
+        
+        def weight(song_id):
+            return weights.weights[weights.index[str(song_id)]]
+        self.assertLess(weight(skipped), weight(plain))
+        self.assertGreater(weight(favorite), weight(self.song_ids[3]))
+    
+    @patch('app.services.shuffle.Favorite', autospec=True)
+    @patch('app.services.shuffle.Stats', autospec=True)
+    @patch('app.services.shuffle.Song', autospec=True)
+    def test_skip_only_song_below_unheard(self, mock_song, mock_stats, mock_favorite):
+        """Test: Nur übersprungene Songs (ohne Plays) wiegen weniger als ungehörte"""
+        skipped, unheard = self.song_ids[:2]
+        mock_song.get_artists_by_user.return_value = {skipped: 'A', unheard: 'B'}
+        mock_stats.get_songs_by_user.return_value = [{'song_id': skipped, 'plays': 0, 'skips': 5}]
+        mock_favorite.get_song_ids.return_value = set()
+        
+        weights = UserWeights.load('user_1')
+        
+        self.assertAlmostEqual(weights.weights[weights.index[str(unheard)]], 0.5)
+        self.assertAlmostEqual(weights.weights[weights.index[str(skipped)]], 1 / 7, places=5)
+    
+    def test_queue_is_permutation(self):
+        """Test: Queue enthält jeden Song genau einmal"""
+        weights = UserWeights(
+            self.song_ids,
+            np.ones(4, dtype=np.float32),
+            np.array([0, 1, 2, 3], dtype=np.int32)
+        )
+        
+        queue = generate_queue(self.song_ids, weights, seed=1)
+        
+        self.assertCountEqual(queue, [str(s) for s in self.song_ids])
+    
+    def test_queue_spreads_artists(self):
+        """Test: Gleiche Künstler folgen möglichst nicht aufeinander"""
+        song_ids = [ObjectId() for _ in range(20)]
+        artists = np.array([0] * 10 + [1] * 10, dtype=np.int32)
+        weights = UserWeights(song_ids, np.ones(20, dtype=np.float32), artists)
+        
+        queue = generate_queue(song_ids, weights, seed=3)
+        
+        codes = [artists[weights.index[s]] for s in queue]
+        repeats = sum(a == b for a, b in zip(codes, codes[1:]))
+        self.assertLessEqual(repeats, 1)
+    
+    def test_queue_prefers_heavy_songs(self):
+        """Test: Stark gewichtete Songs landen im Mittel weiter vorne"""
+        weights = UserWeights(
+            self.song_ids[:2],
+            np.array([10.0, 0.1], dtype=np.float32),
+            np.array([-1, -1], dtype=np.int32)
+        )
+        
+        first = [generate_queue(self.song_ids[:2], weights, seed=i)[0] for i in range(200)]
+        
+        self.assertGreater(first.count(str(self.song_ids[0])), 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
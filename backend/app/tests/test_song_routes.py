@@ -8,7 +8,9 @@ from unittest.mock import Mock, patch, MagicMock
 from flask import Flask
 from flask_jwt_extended import JWTManager, create_access_token
 from app.routes.song_routes import song_bp, allowed_file
-from app.models.mongo_models import Song, Favorite
+from app.models.mongo_models import Song, Favorite, Library
+from app.storage import StoredFile
+from datetime import datetime, timezone
 from bson import ObjectId
 import json
 import tempfile
@@ -216,6 +218,46 @@ class SongRoutesTestCase(unittest.TestCase):
         self.assertIsInstance(response_data, list)
         mock_song.get_by_user.assert_called_with(self.user_id)
     
+    @patch('app.routes.song_routes.Favorite')
+    @patch('app.routes.song_routes.Song')
+    def test_list_songs_with_favorites(self, mock_song, mock_favorite):
+        """Test: list_songs markiert Favoriten mit einem einzigen Lookup"""
+        favorite_id = ObjectId()
+        songs = []
+        for song_id in (favorite_id, ObjectId()):
+            mock_song_instance = MagicMock()
+            mock_song_instance.id = song_id
+            mock_song_instance.to_dict.return_value = {'id': str(song_id)}
+            songs.append(mock_song_instance)
+        mock_song.get_by_user.return_value = songs
+        mock_favorite.get_song_ids.return_value = {favorite_id}
+        
+        response = self.client.get(
+            '/songs/list?with_favorites=1',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        response_data = json.loads(response.data)
+        self.assertEqual([s['is_favorite'] for s in response_data], [True, False])
+        mock_favorite.get_song_ids.assert_called_once_with(self.user_id)
+    
+    @patch('app.models.mongo_models.mongo')
+    def test_library_version_tracks_writes_and_deletes(self, mock_mongo):
+        """Test: Der Bibliotheksstand besteht aus Anzahl, letztem updated_at und letzter Löschung"""
+        updated = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        deleted = datetime(2024, 1, 2, tzinfo=timezone.utc)
+        songs, tombstones = MagicMock(), MagicMock()
+        songs.find_one.return_value = {'updated_at': updated}
+        songs.count_documents.return_value = 3
+        tombstones.find_one.return_value = {'deleted_at': deleted}
+        mock_mongo.connect.return_value.reader.side_effect = lambda name, method: {
+            'songs': songs, 'tombstones': tombstones
+        }[name]
+        
+        self.assertEqual(Library.version(self.user_id, ('songs',)), (3, updated, deleted))
+        self.assertEqual(tombstones.find_one.call_args[0][0], {'user_id': self.user_id, 'kind': {'$in': ['songs']}})
+    
     @patch('app.routes.song_routes.Song')
     def test_list_songs_without_jwt(self, mock_song):
         """Test: list_songs fehlschlagen ohne JWT Token"""
@@ -294,6 +336,312 @@ class SongRoutesTestCase(unittest.TestCase):
         
         self.assertEqual(response.status_code, 200)
 
+    
+    def _mock_audio(self, mock_song, content=b'0123456789abcdef'):
+        temp_file = os.path.join(self.temp_dir, 'cached.mp3')
+        with open(temp_file, 'wb') as f:
+            f.write(content)
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = self.user_id
+        mock_song_instance.file_path = temp_file
+        mock_song.get_by_id.return_value = mock_song_instance
+        return temp_file
+    
+    @patch('app.routes.song_routes.Song')
+    def test_stream_range_has_validators(self, mock_song):
+        """Test: 206-Antworten tragen ETag, Last-Modified und Cache-Control"""
+        self._mock_audio(mock_song)
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/stream',
+            headers={'Authorization': f'Bearer {self.access_token}', 'Range': 'bytes=4-7'}
+        )
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'4567')
+        self.assertEqual(response.headers['Content-Range'], 'bytes 4-7/16')
+        self.assertIsNotNone(response.headers.get('ETag'))
+        self.assertIsNotNone(response.headers.get('Last-Modified'))
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('private', response.headers['Cache-Control'])
+        response.close()
+    
+    @patch('app.routes.song_routes.Song')
+    def test_stream_if_none_match_returns_304(self, mock_song):
+        """Test: Bekanntes ETag beim Replay liefert 304"""
+        self._mock_audio(mock_song)
+        headers = {'Authorization': f'Bearer {self.access_token}'}
+        first = self.client.get('/songs/507f1f77bcf86cd799439011/stream', headers=headers)
+        etag = first.headers['ETag']
+        first.close()
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/stream',
+            headers=dict(headers, **{'If-None-Match': etag, 'Range': 'bytes=0-3'})
+        )
+        
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+    
+    @patch('app.routes.song_routes.Song')
+    def test_download_if_modified_since_returns_304(self, mock_song):
+        """Test: Download mit If-Modified-Since liefert 304"""
+        self._mock_audio(mock_song)
+        headers = {'Authorization': f'Bearer {self.access_token}'}
+        first = self.client.get('/songs/507f1f77bcf86cd799439011/download', headers=headers)
+        last_modified = first.headers['Last-Modified']
+        first.close()
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/download',
+            headers=dict(headers, **{'If-Modified-Since': last_modified})
+        )
+        
+        self.assertEqual(response.status_code, 304)
+    
+    @patch('app.routes.song_routes.Song')
+    def test_etag_changes_when_file_replaced(self, mock_song):
+        """Test: Ersetzte Datei bekommt ein neues ETag"""
+        temp_file = self._mock_audio(mock_song)
+        headers = {'Authorization': f'Bearer {self.access_token}'}
+        first = self.client.get('/songs/507f1f77bcf86cd799439011/stream', headers=headers)
+        first.close()
+        with open(temp_file, 'wb') as f:
+            f.write(b'new content, other size')
+        
+        second = self.client.get('/songs/507f1f77bcf86cd799439011/stream', headers=headers)
+        second.close()
+        
+        self.assertNotEqual(first.headers['ETag'], second.headers['ETag'])
+    
+    @patch('app.routes.song_routes.Song')
+    def test_stream_missing_file(self, mock_song):
+        """Test: Fehlende Datei liefert 404 statt 500"""
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = self.user_id
+        mock_song_instance.file_path = os.path.join(self.temp_dir, 'missing.mp3')
+        mock_song.get_by_id.return_value = mock_song_instance
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/stream',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 404)
+    
+    def _remote_storage(self, mock_song, content=b'0123456789'):
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = self.user_id
+        mock_song_instance.file_path = '12345_song.mp3'
+        mock_song.get_by_id.return_value = mock_song_instance
+        storage = MagicMock()
+        storage.local_path.return_value = None
+        storage.presign.return_value = None
+        storage.stat.return_value = StoredFile(len(content), datetime(2024, 1, 1, tzinfo=timezone.utc), 'abc')
+        storage.open_range.side_effect = lambda key, start, stop: iter([content[start:stop]])
+        self.app.extensions['storage'] = storage
+        return storage
+    
+    @patch('app.routes.song_routes.Song')
+    def test_stream_remote_range(self, mock_song):
+        """Test: Entfernter Storage liefert nur den angefragten Bereich"""
+        storage = self._remote_storage(mock_song)
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/stream',
+            headers={'Authorization': f'Bearer {self.access_token}', 'Range': 'bytes=2-4'}
+        )
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'234')
+        self.assertEqual(response.headers['Content-Range'], 'bytes 2-4/10')
+        storage.open_range.assert_called_once_with('12345_song.mp3', 2, 5)
+    
+    @patch('app.routes.song_routes.Song')
+    def test_stream_redirects_to_presigned_url(self, mock_song):
+        """Test: Mit STORAGE_REDIRECT wird auf die signierte URL umgeleitet"""
+        storage = self._remote_storage(mock_song)
+        storage.presign.return_value = 'https://minio.local/signed'
+        self.app.config['STORAGE_REDIRECT'] = True
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/stream',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.headers['Location'], 'https://minio.local/signed')
+        storage.open_range.assert_not_called()
+    
+    @patch('app.routes.song_routes.Song')
+    def test_stream_x_accel_redirect(self, mock_song):
+        """Test: Im nginx-Modus nur Header, kein Body aus Flask"""
+        self._mock_audio(mock_song)
+        self.app.config['AUDIO_OFFLOAD'] = 'x-accel'
+        self.app.config['AUDIO_OFFLOAD_PREFIX'] = '/protected-audio/'
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/stream',
+            headers={'Authorization': f'Bearer {self.access_token}', 'Range': 'bytes=0-3'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], '/protected-audio/cached.mp3')
+        self.assertEqual(response.mimetype, 'audio/mpeg')
+        self.assertEqual(response.data, b'')
+    
+    @patch('app.routes.song_routes.Song')
+    def test_download_x_sendfile(self, mock_song):
+        """Test: X-Sendfile-Modus verweist auf den absoluten Pfad"""
+        temp_file = self._mock_audio(mock_song)
+        self.app.config['AUDIO_OFFLOAD'] = 'x-sendfile'
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/download',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.headers['X-Sendfile'], os.path.abspath(temp_file))
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+    
+    @patch('app.routes.song_routes.Song')
+    def test_song_art(self, mock_song):
+        """Test: Cover in passender Größe mit Cache-Headern"""
+        art_dir = os.path.join(self.temp_dir, 'art', 'abc')
+        os.makedirs(art_dir)
+        with open(os.path.join(art_dir, '96.jpg'), 'wb') as f:
+            f.write(b'jpeg')
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = self.user_id
+        mock_song_instance.art_id = 'abc'
+        mock_song.get_by_id.return_value = mock_song_instance
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/art?size=64',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertEqual(response.data, b'jpeg')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        response.close()
+    
+    @patch('app.routes.song_routes.Song')
+    def test_song_art_missing(self, mock_song):
+        """Test: Song ohne Cover liefert 404"""
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = self.user_id
+        mock_song_instance.art_id = None
+        mock_song.get_by_id.return_value = mock_song_instance
+        
+        response = self.client.get(
+            '/songs/507f1f77bcf86cd799439011/art',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 404)
+    
+    # ============== LÖSCH-TESTS ==============
+    
+    @patch('app.routes.song_routes.shuffle', autospec=True)
+    @patch('app.routes.song_routes.recommender')
+    @patch('app.routes.song_routes.file_gc')
+    @patch('app.routes.song_routes.Favorite')
+    @patch('app.routes.song_routes.Playlist')
+    @patch('app.routes.song_routes.Song')
+    def test_delete_song_cascades(self, mock_song, mock_playlist, mock_favorite, mock_gc, mock_recommender, mock_shuffle):
+        """Test: Löschen entfernt Song aus Playlists, Favoriten und Storage"""
+        song_id = '507f1f77bcf86cd799439011'
+        deleted = MagicMock()
+        deleted.id = ObjectId(song_id)
+        mock_song.delete_many.return_value = [deleted]
+        mock_playlist.remove_songs.return_value = ['p1']
+        
+        response = self.client.delete(
+            f'/songs/{song_id}',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        mock_song.delete_many.assert_called_once_with(self.user_id, [song_id])
+        mock_playlist.remove_songs.assert_called_once_with(self.user_id, [deleted])
+        mock_favorite.delete_many.assert_called_once_with(self.user_id, [song_id])
+        mock_gc.delete_song_files.assert_called_once()
+        mock_recommender.songs_deleted.assert_called_once_with(self.user_id, [song_id], ['p1'])
+        mock_shuffle.invalidate.assert_called_once_with(self.user_id)
+    
+    @patch('app.routes.song_routes.Playlist')
+    @patch('app.routes.song_routes.Song')
+    def test_delete_song_not_found(self, mock_song, mock_playlist):
+        """Test: Fremder oder fehlender Song liefert 404 ohne Kaskade"""
+        mock_song.delete_many.return_value = []
+        
+        response = self.client.delete(
+            '/songs/507f1f77bcf86cd799439011',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 404)
+        mock_playlist.remove_songs.assert_not_called()
+    
+    @patch('app.routes.song_routes.shuffle', autospec=True)
+    @patch('app.routes.song_routes.recommender')
+    @patch('app.routes.song_routes.file_gc')
+    @patch('app.routes.song_routes.Favorite')
+    @patch('app.routes.song_routes.Playlist')
+    @patch('app.routes.song_routes.Song')
+    def test_delete_batch_reports_rejected(self, mock_song, mock_playlist, mock_favorite, mock_gc, mock_recommender, mock_shuffle):
+        """Test: Bulk-Löschen meldet nicht gelöschte IDs zurück"""
+        own, foreign = '507f1f77bcf86cd799439011', '507f1f77bcf86cd799439012'
+        deleted = MagicMock()
+        deleted.id = ObjectId(own)
+        mock_song.delete_many.return_value = [deleted]
+        mock_playlist.remove_songs.return_value = []
+        
+        response = self.client.delete(
+            '/songs/delete-batch',
+            json={'song_ids': [own, foreign, own]},
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['deleted'], 1)
+        self.assertEqual(data['rejected'], [foreign])
+        mock_song.delete_many.assert_called_once_with(self.user_id, [own, foreign])
+    
+    def test_delete_batch_invalid_ids(self):
+        """Test: Ungültige IDs werden abgelehnt"""
+        response = self.client.delete(
+            '/songs/delete-batch',
+            json={'song_ids': ['kaputt']},
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 400)
+    
+    @patch('app.routes.song_routes.recommender')
+    @patch('app.routes.song_routes.Song')
+    def test_similar_songs(self, mock_song, mock_recommender):
+        """Test: Ähnliche Songs aus dem vorberechneten Index"""
+        song_id = '507f1f77bcf86cd799439011'
+        mock_song_instance = MagicMock()
+        mock_song_instance.user_id = self.user_id
+        mock_song.get_by_id.return_value = mock_song_instance
+        mock_recommender.TOP_K = 50
+        mock_recommender.get_index.return_value.similar.return_value = [
+            {'song_id': '507f1f77bcf86cd799439012', 'score': 3}
+        ]
+        
+        response = self.client.get(
+            f'/songs/{song_id}/similar?k=5',
+            headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.data)), 1)
+        mock_recommender.get_index.return_value.similar.assert_called_once_with(song_id, 5)
 
 class SongValidationTestCase(unittest.TestCase):
     """Test suite für Song Upload Validierung"""
@@ -0,0 +1,188 @@
+"""
+Unit Tests für stats_routes.py und die Rollup-Aggregation
+- Auslesen der vorab aggregierten Zähler
+- Zusammenfassen eines Event-Batches zu $inc-Updates
+- Idempotentes Speichern von Events bei erneutem Versuch
+- Neuaufbau der Rollups neben der laufenden Aufnahme
+"""
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from pymongo.errors import BulkWriteError
+from app.models.mongo_models import Event
+from app.routes.stats_routes import stats_bp
+from app.services import rollups
+from app.services.rollups import aggregate
+from bson import ObjectId
+from datetime import datetime, timezone
+import json
+
+class StatsRoutesTestCase(unittest.TestCase):
+    """Test suite für Statistik-Endpunkte"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+        
+        JWTManager(self.app)
+        self.app.register_blueprint(stats_bp, url_prefix='/stats')
+        
+        self.client = self.app.test_client()
+        self.user_id = 'user_12345'
+        
+        with self.app.app_context():
+            self.access_token = create_access_token(identity=self.user_id)
+        self.headers = {'Authorization': f'Bearer {self.access_token}'}
+    
+    @patch('app.routes.stats_routes.Stats')
+    def test_overview_reads_monthly_rollup(self, mock_stats):
+        """Test: Übersicht liest genau ein Rollup-Dokument"""
+        mock_stats.get_monthly.return_value = {'user_id': self.user_id, 'month': '2024-05', 'plays': 7, 'listened_ms': 1000}
+        
+        response = self.client.get('/stats/overview?month=2024-05', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        response_data = json.loads(response.data)
+        self.assertEqual(response_data['plays'], 7)
+        self.assertEqual(response_data['skips'], 0)
+        self.assertNotIn('user_id', response_data)
+        mock_stats.get_monthly.assert_called_once_with(self.user_id, '2024-05')
+    
+    @patch('app.routes.stats_routes.Stats')
+    def test_overview_invalid_month(self, mock_stats):
+        """Test: Ungültiger Monat wird abgelehnt"""
+        response = self.client.get('/stats/overview?month=Mai', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 400)
+        mock_stats.get_monthly.assert_not_called()
+    
+    @patch('app.routes.stats_routes.Stats')
+    def test_top_artists_limit(self, mock_stats):
+        """Test: Top-Künstler werden mit begrenztem Limit abgefragt"""
+        mock_stats.get_top_artists.return_value = [{'artist': 'A', 'plays': 3}]
+        
+        response = self.client.get('/stats/top-artists?month=2024-05&limit=500', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        mock_stats.get_top_artists.assert_called_once_with(self.user_id, '2024-05', 50)
+    
+    @patch('app.routes.stats_routes.Stats')
+    def test_song_skip_rate(self, mock_stats):
+        """Test: Skip-Rate wird aus den Song-Zählern berechnet"""
+        song_id = str(ObjectId())
+        mock_stats.get_song.return_value = {'plays': 3, 'skips': 1}
+        
+        response = self.client.get(f'/stats/songs/{song_id}', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['skip_rate'], 0.25)
+    
+    @patch('app.routes.stats_routes.Stats')
+    def test_song_skip_rate_skip_only_and_empty(self, mock_stats):
+        """Test: Nur Skips ergeben 1.0, ganz ohne Events 0.0"""
+        song_id = str(ObjectId())
+        mock_stats.get_song.return_value = {'plays': 0, 'skips': 5}
+        
+        response = self.client.get(f'/stats/songs/{song_id}', headers=self.headers)
+        self.assertEqual(json.loads(response.data)['skip_rate'], 1.0)
+        
+        mock_stats.get_song.return_value = {}
+        response = self.client.get(f'/stats/songs/{song_id}', headers=self.headers)
+        self.assertEqual(json.loads(response.data)['skip_rate'], 0.0)
+    
+    @patch('app.routes.stats_routes.Stats')
+    def test_daily_range_too_large(self, mock_stats):
+        """Test: Zu großer Zeitraum wird abgelehnt"""
+        response = self.client.get('/stats/daily?from=2020-01-01&to=2024-01-01', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 400)
+
+
+class RollupAggregationTestCase(unittest.TestCase):
+    """Test suite für die Rollup-Aggregation"""
+    
+    def test_aggregate_batch(self):
+        """Test: Ein Batch ergibt ein $inc pro Rollup-Schlüssel"""
+        song_a, song_b = ObjectId(), ObjectId()
+        ts = datetime(2024, 5, 17, 12, 0, tzinfo=timezone.utc)
+        events = [
+            {'type': 'play', 'user_id': 'u1', 'song_id': song_a, 'ts': ts, 'listened_ms': 1000},
+            {'type': 'skip', 'user_id': 'u1', 'song_id': song_a, 'ts': ts, 'listened_ms': 500},
+            {'type': 'play', 'user_id': 'u1', 'song_id': song_b, 'ts': ts}
+        ]
+        
+        rollups = aggregate(events, {song_a: 'Artist A'})
+        
+        self.assertEqual(rollups['stats_daily'], [
+            ({'user_id': 'u1', 'day': '2024-05-17'}, {'plays': 2, 'skips': 1, 'listened_ms': 1500})
+        ])
+        songs = dict((key['song_id'], inc) for key, inc in rollups['stats_songs'])
+        self.assertEqual(songs[song_a], {'plays': 1, 'skips': 1, 'listened_ms': 1500})
+        artists = dict((key['artist'], inc) for key, inc in rollups['stats_artists'])
+        self.assertEqual(artists['Artist A']['plays'], 1)
+        self.assertEqual(artists['Unbekannt']['plays'], 1)
+    
+    @patch('app.models.mongo_models.mongo')
+    def test_insert_many_splits_partial_failure(self, mock_mongo):
+        """Test: Duplikate gelten als geschrieben, nur andere Fehler werden wiederholt"""
+        events = [{'_id': ObjectId()} for _ in range(3)]
+        mock_mongo.connect.return_value.events.insert_many.side_effect = BulkWriteError({
+            'writeErrors': [{'index': 0, 'code': 11000}, {'index': 2, 'code': 91}]
+        })
+        
+        written, retry = Event.insert_many(events)
+        
+        self.assertEqual(written, [events[1]])
+        self.assertEqual(retry, [events[2]])
+    
+    @patch('app.services.rollups.Maintenance')
+    @patch('app.services.rollups.apply')
+    @patch('app.services.rollups.Event')
+    def test_record_counts_only_written_events(self, mock_event, mock_apply, mock_maintenance):
+        """Test: Rollups nur für neu geschriebene Events, der Rest geht zurück"""
+        written, retry = [{'_id': 1}], [{'_id': 2}]
+        mock_event.insert_many.return_value = (written, retry)
+        mock_maintenance.get.return_value = {}
+        
+        self.assertEqual(rollups.record(written + retry), retry)
+        mock_apply.assert_called_once_with(written)
+    
+    @patch('app.services.rollups.Maintenance')
+    @patch('app.services.rollups.apply')
+    @patch('app.services.rollups.Event')
+    def test_record_feeds_running_rebuild(self, mock_event, mock_apply, mock_maintenance):
+        """Test: Während eines Neuaufbaus gehen neue Events auch in die _rebuild-Collections"""
+        since = datetime(2024, 5, 17, 12, 0)
+        before = {'_id': 1, 'received_at': datetime(2024, 5, 17, 11, 59, tzinfo=timezone.utc)}
+        after = {'_id': 2, 'received_at': datetime(2024, 5, 17, 12, 1, tzinfo=timezone.utc)}
+        mock_event.insert_many.return_value = ([before, after], [])
+        mock_maintenance.get.return_value = {'since': since}
+        
+        rollups.record([before, after])
+        
+        mock_apply.assert_any_call([after], '_rebuild')
+        mock_apply.assert_any_call([before, after])
+    
+    @patch('app.services.rollups.mongo')
+    @patch('app.services.rollups.Maintenance')
+    @patch('app.services.rollups.Stats')
+    @patch('app.services.rollups.apply')
+    def test_rebuild_swaps_in_new_collections(self, mock_apply, mock_stats, mock_maintenance, mock_mongo):
+        """Test: Der Neuaufbau liest nur ältere Events und ersetzt die Rollups am Ende"""
+        events = [{'_id': 1}, {'_id': 2}]
+        mock_mongo.connect.return_value.events.find.return_value.sort.return_value = events
+        
+        self.assertEqual(rollups.rebuild(grace=0), 2)
+        
+        query = mock_mongo.connect.return_value.events.find.call_args[0][0]
+        self.assertIn('$lt', query['received_at'])
+        mock_apply.assert_called_once_with(events, '_rebuild')
+        mock_stats.swap_rebuild.assert_called_once()
+        self.assertEqual(mock_maintenance.save.call_args_list[-1].args[1], {'since': None})
+
+
+if __name__ == '__main__':
+    unittest.main()
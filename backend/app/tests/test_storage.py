@@ -0,0 +1,172 @@
+"""
+Unit Tests für app/storage
+- LocalStorage: Schreiben, Bereiche lesen, Löschen, Pfadprüfung
+- S3Storage gegen einen gemockten boto3-Client
+- Abstrakte Schnittstelle
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from io import BytesIO
+from unittest.mock import MagicMock
+from flask import Flask
+from app import storage
+from app.storage import LocalStorage, create_storage
+from app.storage.base import Storage
+from app.storage.s3 import S3Storage
+
+class LocalStorageTestCase(unittest.TestCase):
+    """Test suite für den lokalen Storage"""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage = LocalStorage(self.root)
+    
+    def tearDown(self):
+        shutil.rmtree(self.root)
+    
+    def test_put_stat_and_range(self):
+        """Test: Datei schreiben und Teilbereich lesen"""
+        self.storage.put('1_song.mp3', BytesIO(b'0123456789'))
+        
+        info = self.storage.stat('1_song.mp3')
+        
+        self.assertEqual(info.size, 10)
+        self.assertEqual(b''.join(self.storage.open_range('1_song.mp3', 2, 5)), b'234')
+        self.assertEqual(os.listdir(self.root), ['1_song.mp3'])
+    
+    def test_replacing_file_changes_etag(self):
+        """Test: Neue Datei unter gleichem Schlüssel bekommt neues ETag"""
+        self.storage.put('1_song.mp3', BytesIO(b'alt'))
+        first = self.storage.stat('1_song.mp3').etag
+        self.storage.put('1_song.mp3', BytesIO(b'neu'))
+        
+        self.assertNotEqual(first, self.storage.stat('1_song.mp3').etag)
+    
+    def test_legacy_absolute_path(self):
+        """Test: Absolute Pfade im Upload-Ordner funktionieren weiter"""
+        self.storage.put('1_song.mp3', BytesIO(b'abc'))
+        
+        self.assertEqual(self.storage.stat(os.path.join(self.root, '1_song.mp3')).size, 3)
+    
+    def test_path_outside_root_rejected(self):
+        """Test: Schlüssel außerhalb des Upload-Ordners werden abgelehnt"""
+        with self.assertRaises(ValueError):
+            self.storage.stat('../etc/passwd')
+    
+    def test_delete_missing_is_noop(self):
+        """Test: Löschen fehlender Dateien ist idempotent"""
+        self.storage.put('1_song.mp3', BytesIO(b'abc'))
+        self.storage.delete('1_song.mp3')
+        self.storage.delete('1_song.mp3')
+        
+        with self.assertRaises(FileNotFoundError):
+            self.storage.stat('1_song.mp3')
+    
+    def test_list_keys_in_key_order(self):
+        """Test: Schlüssel kommen sortiert wie Strings, auch über Unterordner"""
+        for key in ('b.mp3', 'a/z.jpg', 'a-b.mp3', 'art/x/96.jpg'):
+            self.storage.put(key, BytesIO(b'x'))
+        
+        keys = [key for key, _ in self.storage.list_keys()]
+        
+        self.assertEqual(keys, ['a-b.mp3', 'a/z.jpg', 'art/x/96.jpg', 'b.mp3'])
+    
+    def test_list_keys_after_checkpoint(self):
+        """Test: start_after und limit liefern den nächsten Batch"""
+        for key in ('a/1.mp3', 'a/2.mp3', 'b/1.mp3', 'c.mp3'):
+            self.storage.put(key, BytesIO(b'x'))
+        
+        keys = [key for key, _ in self.storage.list_keys(start_after='a/1.mp3', limit=2)]
+        
+        self.assertEqual(keys, ['a/2.mp3', 'b/1.mp3'])
+    
+    def test_key_aliases_for_both_spellings(self):
+        """Test: Relativer Schlüssel und absoluter Pfad ergeben dieselben Aliase"""
+        absolute = os.path.join(self.root, '1_song.mp3')
+        
+        self.assertEqual(self.storage.key_aliases('1_song.mp3'), ['1_song.mp3', absolute])
+        self.assertEqual(self.storage.key_aliases(absolute), ['1_song.mp3', absolute])
+    
+    def test_create_storage_unknown_backend(self):
+        """Test: Unbekanntes Backend ist ein Konfigurationsfehler"""
+        with self.assertRaises(ValueError):
+            create_storage({'STORAGE_BACKEND': 'ftp', 'UPLOAD_FOLDER': self.root})
+    
+    def test_init_app_rejects_unknown_offload(self):
+        """Test: Ein unbekannter AUDIO_OFFLOAD-Modus verhindert den Start"""
+        app = Flask(__name__)
+        app.config.update(UPLOAD_FOLDER=self.root, AUDIO_OFFLOAD='x-acel')
+        
+        with self.assertRaises(ValueError):
+            storage.init_app(app)
+        
+        app.config['AUDIO_OFFLOAD'] = 'x-accel'
+        storage.init_app(app)
+        self.assertIsInstance(app.extensions['storage'], LocalStorage)
+
+class S3StorageTestCase(unittest.TestCase):
+    """Test suite für den S3-Storage"""
+    
+    def setUp(self):
+        self.client = MagicMock()
+        self.storage = S3Storage('bucket', client=self.client)
+    
+    def test_stat(self):
+        """Test: head_object wird auf StoredFile abgebildet"""
+        modified = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.client.head_object.return_value = {'ContentLength': 42, 'LastModified': modified, 'ETag': '"abc"'}
+        
+        info = self.storage.stat('1_song.mp3')
+        
+        self.assertEqual((info.size, info.last_modified, info.etag), (42, modified, 'abc'))
+    
+    def test_stat_missing(self):
+        """Test: 404 von S3 wird zu FileNotFoundError"""
+        error = Exception('not found')
+        error.response = {'Error': {'Code': '404'}}
+        self.client.head_object.side_effect = error
+        
+        with self.assertRaises(FileNotFoundError):
+            self.storage.stat('fehlt.mp3')
+    
+    def test_open_range_uses_http_range(self):
+        """Test: Nur der angefragte Bereich wird geholt"""
+        body = MagicMock()
+        body.iter_chunks.return_value = iter([b'ab', b'c'])
+        self.client.get_object.return_value = {'Body': body}
+        
+        data = b''.join(self.storage.open_range('1_song.mp3', 10, 13))
+        
+        self.assertEqual(data, b'abc')
+        self.client.get_object.assert_called_once_with(Bucket='bucket', Key='1_song.mp3', Range='bytes=10-12')
+        body.close.assert_called_once()
+    
+    def test_presign_download(self):
+        """Test: Download-URL setzt Content-Disposition"""
+        self.client.generate_presigned_url.return_value = 'https://s3/signed'
+        
+        url = self.storage.presign('1_song.mp3', 600, download_name='1_song.mp3')
+        
+        self.assertEqual(url, 'https://s3/signed')
+        params = self.client.generate_presigned_url.call_args[1]['Params']
+        self.assertIn('attachment', params['ResponseContentDisposition'])
+
+
+class StorageInterfaceTestCase(unittest.TestCase):
+    """Test suite für die Storage-Schnittstelle"""
+    
+    def test_incomplete_backend_fails_on_instantiation(self):
+        """Test: Ein Backend ohne alle Pflichtmethoden lässt sich nicht anlegen"""
+        class Incomplete(Storage):
+            def put(self, key, stream, content_type=None):
+                pass
+        
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+if __name__ == '__main__':
+    unittest.main()
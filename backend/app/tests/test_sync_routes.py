@@ -0,0 +1,125 @@
+"""
+Unit Tests für sync_routes.py
+- Voll-Sync ohne since-Token
+- Delta mit Tombstones und Überlappung (SYNC_LOOKBACK)
+"""
+import unittest
+from unittest.mock import patch, MagicMock
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from app.routes.sync_routes import sync_bp, encode_token, decode_token
+from bson import ObjectId
+from datetime import datetime, timezone, timedelta
+import json
+
+class SyncRoutesTestCase(unittest.TestCase):
+    """Test suite für den Delta-Sync"""
+    
+    def setUp(self):
+        """Vor jedem Test ausführen"""
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+        self.app.config['SYNC_LOOKBACK'] = 10
+        self.app.config['SYNC_TOMBSTONE_TTL'] = 3600
+        
+        JWTManager(self.app)
+        self.app.register_blueprint(sync_bp, url_prefix='/sync')
+        
+        self.client = self.app.test_client()
+        self.user_id = 'user_12345'
+        
+        with self.app.app_context():
+            self.access_token = create_access_token(identity=self.user_id)
+        self.headers = {'Authorization': f'Bearer {self.access_token}'}
+    
+    def make_item(self, item_id):
+        item = MagicMock()
+        item.to_dict.return_value = {'id': str(item_id)}
+        return item
+    
+    @patch('app.routes.sync_routes.Tombstone')
+    @patch('app.routes.sync_routes.Favorite')
+    @patch('app.routes.sync_routes.Playlist')
+    @patch('app.routes.sync_routes.Song')
+    def test_full_sync_without_token(self, mock_song, mock_playlist, mock_favorite, mock_tombstone):
+        """Test: Ohne since kommt die ganze Bibliothek samt neuem Token"""
+        song_id, favorite_id = ObjectId(), ObjectId()
+        mock_song.get_by_user.return_value = [self.make_item(song_id)]
+        mock_playlist.get_by_user.return_value = []
+        mock_favorite.get_song_ids.return_value = {favorite_id}
+        
+        response = self.client.get('/sync', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['full'])
+        self.assertEqual(data['songs'], [{'id': str(song_id)}])
+        self.assertEqual(data['favorites'], [str(favorite_id)])
+        self.assertEqual(data['deleted'], {'songs': [], 'playlists': [], 'favorites': []})
+        self.assertLessEqual(decode_token(data['token']), datetime.now(timezone.utc))
+        mock_song.get_changed.assert_not_called()
+        mock_tombstone.get_since.assert_not_called()
+    
+    @patch('app.routes.sync_routes.Tombstone')
+    @patch('app.routes.sync_routes.Favorite')
+    @patch('app.routes.sync_routes.Playlist')
+    @patch('app.routes.sync_routes.Song')
+    def test_delta_returns_changes_and_tombstones(self, mock_song, mock_playlist, mock_favorite, mock_tombstone):
+        """Test: Mit since nur Änderungen und Löschungen, mit Überlappung abgefragt"""
+        last_sync = datetime.now(timezone.utc) - timedelta(minutes=5)
+        playlist_id, deleted_song, readded, removed = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+        mock_song.get_changed.return_value = []
+        mock_playlist.get_changed.return_value = [self.make_item(playlist_id)]
+        mock_favorite.get_changed.return_value = {readded: last_sync + timedelta(minutes=2)}
+        mock_tombstone.get_since.return_value = {
+            'songs': {deleted_song: last_sync},
+            'playlists': {},
+            'favorites': {readded: last_sync + timedelta(minutes=1), removed: last_sync + timedelta(minutes=1)}
+        }
+        
+        response = self.client.get(f'/sync?since={encode_token(last_sync)}', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertFalse(data['full'])
+        self.assertEqual(data['playlists'], [{'id': str(playlist_id)}])
+        self.assertEqual(data['favorites'], [str(readded)])
+        self.assertEqual(data['deleted']['songs'], [str(deleted_song)])
+        self.assertEqual(data['deleted']['favorites'], [str(removed)])
+        
+        since = mock_song.get_changed.call_args[0][1]
+        self.assertEqual(since, decode_token(encode_token(last_sync)) - timedelta(seconds=10))
+        mock_song.get_by_user.assert_not_called()
+    
+    @patch('app.routes.sync_routes.Tombstone')
+    @patch('app.routes.sync_routes.Favorite')
+    @patch('app.routes.sync_routes.Playlist')
+    @patch('app.routes.sync_routes.Song')
+    def test_expired_token_forces_full_sync(self, mock_song, mock_playlist, mock_favorite, mock_tombstone):
+        """Test: Token älter als die Tombstones führt zum Voll-Sync"""
+        mock_song.get_by_user.return_value = []
+        mock_playlist.get_by_user.return_value = []
+        mock_favorite.get_song_ids.return_value = set()
+        old = datetime.now(timezone.utc) - timedelta(hours=2)
+        
+        response = self.client.get(f'/sync?since={encode_token(old)}', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.data)['full'])
+        mock_tombstone.get_since.assert_not_called()
+    
+    def test_invalid_token(self):
+        """Test: Kaputtes since-Token wird abgelehnt"""
+        response = self.client.get('/sync?since=gestern', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 400)
+    
+    def test_sync_without_jwt(self):
+        """Test: Sync ohne Token wird abgelehnt"""
+        response = self.client.get('/sync')
+        
+        self.assertEqual(response.status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
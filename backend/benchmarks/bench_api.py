@@ -0,0 +1,240 @@
+"""
+Reproduzierbarer Benchmark der Kern-Endpunkte.
+
+Startet create_app gegen lokale Stand-ins (mongomock oder eine lokale
+mongod über --mongo-uri, SQLite für User), legt eine synthetische
+Bibliothek an und misst Durchsatz sowie p50/p99-Latenz pro Szenario.
+Die Ergebnisse werden mit benchmarks/baselines.json verglichen; liegt ein
+Wert um mehr als --threshold daneben, endet das Skript mit Exit-Code 1.
+Baselines sind hardwareabhängig: die mitgelieferten Werte stammen aus
+einem mongomock-Lauf mit 1k Songs; auf einer neuen Maschine zuerst mit
+--update-baseline eigene Werte erzeugen.
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.bench_api --songs 1000
+    python -m benchmarks.bench_api --songs 100000 --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.bench_api --songs 1000 --update-baseline
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from bson import ObjectId
+
+from app import create_app
+from app.config import Config
+from app.models.mongo_models import mongo
+from app.models.mysql_user import db
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+AUDIO_FILES = 8
+AUDIO_FILE_SIZE = 1024 * 1024
+RANGE_SIZE = 64 * 1024
+FAVORITE_SHARE = 0.1
+PASSWORD = 'benchmark-password'
+
+
+def make_config(upload_dir, mongo_uri):
+    class BenchConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'benchmark-secret-key-benchmark-secret'
+        JWT_SECRET_KEY = 'benchmark-secret-key-benchmark-secret'
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        MONGO_URI = mongo_uri or 'mongodb://localhost:27017'
+        UPLOAD_FOLDER = upload_dir
+        SIMILARITY_INDEX_PATH = os.path.join(upload_dir, 'similarity.npz')
+        LOG_LEVEL = 'WARNING'
+        METRICS_ENABLED = False
+    return BenchConfig
+
+
+def use_stand_ins(mongo_uri):
+    mongo.reset()
+    if mongo_uri is None:
+        import mongomock
+        mongo.client_factory = lambda uri, **kwargs: mongomock.MongoClient()
+
+
+def seed(app, song_count, upload_dir, rng):
+    client = app.test_client()
+    client.post('/auth/register', json={'name': 'Bench', 'email': 'bench@example.com', 'password': PASSWORD})
+    login = client.post('/auth/login', json={'email': 'bench@example.com', 'password': PASSWORD})
+    token = login.get_json()['access_token']
+    user_id = str(login.get_json()['user']['id'])
+
+    paths = []
+    for i in range(AUDIO_FILES):
+        path = os.path.join(upload_dir, f'{user_id}_bench_{i}.mp3')
+        with open(path, 'wb') as f:
+            f.write(rng.randbytes(AUDIO_FILE_SIZE))
+        paths.append(path)
+
+    with app.app_context():
+        database = mongo.connect()
+        database.songs.delete_many({'user_id': user_id})
+        database.favorites.delete_many({'user_id': user_id})
+        song_ids = []
+        batch = []
+        for i in range(song_count):
+            song_id = ObjectId()
+            song_ids.append(song_id)
+            batch.append({
+                '_id': song_id,
+                'title': f'Song {i}',
+                'artist': f'Artist {i % 500}',
+                'album': f'Album {i % 2000}',
+                'genre': rng.choice(['Rock', 'Pop', 'Jazz', 'Techno']),
+                'file_path': paths[i % len(paths)],
+                'user_id': user_id
+            })
+            if len(batch) >= 5000:
+                database.songs.insert_many(batch)
+                batch = []
+        if batch:
+            database.songs.insert_many(batch)
+        favorites = rng.sample(song_ids, int(song_count * FAVORITE_SHARE))
+        if favorites:
+            database.favorites.insert_many([{'user_id': user_id, 'song_id': s} for s in favorites])
+    return token, [str(s) for s in song_ids]
+
+
+def scenarios(token, song_ids, rng):
+    auth = {'Authorization': f'Bearer {token}'}
+
+    def songs_list(client):
+        return client.get('/songs/list', headers=auth)
+
+    def favorites_list(client):
+        return client.get('/favorites/list', headers=auth)
+
+    def stream_range(client):
+        start = rng.randrange(0, AUDIO_FILE_SIZE - RANGE_SIZE)
+        headers = dict(auth, Range=f'bytes={start}-{start + RANGE_SIZE - 1}')
+        return client.get(f'/songs/{rng.choice(song_ids)}/stream', headers=headers)
+
+    def upload(client):
+        data = {'file': (BytesIO(rng.randbytes(256 * 1024)), f'upload_{rng.random()}.mp3'), 'title': 'Upload'}
+        return client.post('/songs/upload', data=data, headers=auth, content_type='multipart/form-data')
+
+    def auth_login(client):
+        return client.post('/auth/login', json={'email': 'bench@example.com', 'password': PASSWORD})
+
+    # (Name, Funktion, Wiederholungen relativ zu --requests)
+    return [
+        ('songs_list', songs_list, 0.2),
+        ('favorites_list', favorites_list, 0.2),
+        ('stream_range', stream_range, 1.0),
+        ('upload', upload, 0.5),
+        ('auth_login', auth_login, 0.1)
+    ]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def measure(app, func, requests, warmup):
+    client = app.test_client()
+    for _ in range(warmup):
+        func(client)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        response = func(client)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code >= 400:
+            raise RuntimeError(f'Status {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        response.close()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'rps': round(requests / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3)
+    }
+
+
+def compare(results, baselines, threshold):
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if not baseline:
+            continue
+        if result['p99_ms'] > baseline['p99_ms'] * (1 + threshold):
+            regressions.append(f"{key}: p99 {result['p99_ms']}ms > Baseline {baseline['p99_ms']}ms")
+        if result['rps'] < baseline['rps'] * (1 - threshold):
+            regressions.append(f"{key}: {result['rps']} req/s < Baseline {baseline['rps']} req/s")
+    return regressions
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    upload_dir = tempfile.mkdtemp(prefix='skipify-bench-')
+    try:
+        use_stand_ins(args.mongo_uri)
+        app = create_app(make_config(upload_dir, args.mongo_uri))
+        with app.app_context():
+            db.create_all()
+            mongo.connect().ensure_indexes()
+        token, song_ids = seed(app, args.songs, upload_dir, rng)
+
+        results = {}
+        for name, func, share in scenarios(token, song_ids, rng):
+            if args.only and name not in args.only:
+                continue
+            requests = max(1, int(args.requests * share))
+            key = f'{name}@{args.songs}'
+            results[key] = measure(app, func, requests, args.warmup)
+            r = results[key]
+            print(f"{key:<28} {r['rps']:>10.1f} req/s  p50 {r['p50_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms")
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Skip-ify API Benchmark')
+    parser.add_argument('--songs', type=int, default=1000, help='Größe der synthetischen Bibliothek')
+    parser.add_argument('--requests', type=int, default=500, help='Requests für das größte Szenario')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mongo-uri', default=None, help='Lokale mongod statt mongomock')
+    parser.add_argument('--only', nargs='*', help='Nur diese Szenarien')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.25, help='Erlaubte Abweichung (0.25 = 25 %%)')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    if args.update_baseline:
+        baselines.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline aktualisiert: {args.baseline}')
+        return 0
+
+    regressions = compare(results, baselines, args.threshold)
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# Gunicorn-Konfiguration für den Produktivbetrieb. Alle Werte lassen sich
+# per Umgebungsvariable überschreiben, die Defaults richten sich nach der
+# Anzahl der CPUs. Audio-Streams halten Verbindungen lange offen, daher
+# standardmäßig gthread-Worker (ein langsamer Client blockiert nur einen
+# Thread, nicht den ganzen Worker). Mit GUNICORN_WORKER_CLASS=gevent
+# (Paket gevent nötig) sind sehr viele gleichzeitige Streams möglich; das
+# gilt auch für SSE-Clients (GET /events/stream), die bei gthread je einen
+# Thread dauerhaft belegen (daher begrenzt SSE_MAX_CONNECTIONS sie pro
+# Worker; mit gevent ist der Default entsprechend höher).
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#   kill -HUP <master-pid>   # Graceful Reload: neue Worker, alte laufen aus
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+# Prometheus-Metriken aller Worker über ein gemeinsames Verzeichnis; muss
+# gesetzt sein, bevor die App (und damit prometheus_client) geladen wird
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'skipify-metrics')
+)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def default_workers(worker_class, cpu_count=CPU_COUNT):
+    # Async-Worker bedienen viele Verbindungen pro Prozess: einer pro CPU
+    # reicht. Sync/gthread nach der üblichen Faustregel 2 * CPU + 1
+    if worker_class in ('gevent', 'eventlet'):
+        return max(1, cpu_count)
+    return cpu_count * 2 + 1
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = _env_int('WEB_CONCURRENCY', default_workers(worker_class))
+threads = _env_int('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1)
+worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 1000)
+
+# Keep-Alive hält Player-Verbindungen zwischen Range-Requests offen. Der
+# Timeout ist großzügig, weil ein Sync-Worker während eines ganzen
+# Downloads kein Heartbeat senden kann
+keepalive = _env_int('GUNICORN_KEEPALIVE', 15)
+timeout = _env_int('GUNICORN_TIMEOUT', 120)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Worker regelmäßig erneuern (begrenzt Speicherwachstum), mit Jitter,
+# damit nicht alle gleichzeitig neu starten
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 5000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 500)
+
+# send_file/send_from_directory nutzen wsgi.file_wrapper; gunicorn schickt
+# solche Antworten per sendfile() direkt aus dem Page-Cache
+sendfile = os.environ.get('GUNICORN_SENDFILE', '1') != '0'
+
+# Ohne preload lädt ein HUP auch neuen Code. Mit preload teilen sich die
+# Worker den Speicher der App; Verbindungen entstehen ohnehin erst im Worker
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+# Zugriffe protokolliert die App selbst als JSON, gunicorn nur Fehler
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def on_starting(server):
+    # Werte eines früheren Laufs verwerfen (Zähler starten bei 0)
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Gauges (livesum) des beendeten Workers nicht mehr mitzählen
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Vorberechnete Daten (z. B. den Ähnlichkeitsindex) laden, bevor der
+    # Worker Requests annimmt, statt beim ersten Request
+    app = getattr(worker, 'wsgi', None)
+    for warm_up in getattr(app, 'extensions', {}).get('warm_up', ()):
+        try:
+            warm_up()
+        except Exception:
+            # Lieber beim ersten Request erneut versuchen als nicht starten
+            worker.log.exception('Vorladen fehlgeschlagen')
+
+
+def worker_exit(server, worker):
+    # Gepufferte Player-Events vor dem Beenden des Workers noch schreiben
+    app = getattr(worker, 'wsgi', None)
+    buffer = getattr(app, 'extensions', {}).get('event_buffer')
+    if buffer is not None:
+        buffer.close()
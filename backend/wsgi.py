@@ -0,0 +1,6 @@
+# Einstiegspunkt für den Produktionsserver:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# run.py bleibt für die lokale Entwicklung (Flask-Dev-Server mit Debug)
+from app import create_app
+
+app = create_app()
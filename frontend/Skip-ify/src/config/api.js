@@ -21,4 +21,18 @@ const getHost = () => {
   }
 };
 
-export const API_URL = getHost();
\ No newline at end of file
+export const API_URL = getHost();
+
+// Letzter X-Causal-Token vom Backend. Wird bei jedem Request mitgeschickt,
+// damit Listen (auch von einem MongoDB-Secondary) die eigenen Änderungen
+// sofort enthalten, z. B. /songs/list direkt nach dem Upload
+let causalToken = null;
+
+export const apiFetch = async (url, options = {}) => {
+  const headers = { ...(options.headers || {}) };
+  if (causalToken) headers['X-Causal-Token'] = causalToken;
+  const res = await fetch(url, { ...options, headers });
+  const token = res?.headers?.get?.('X-Causal-Token');
+  if (token) causalToken = token;
+  return res;
+};
@@ -2,6 +2,7 @@ import React, { createContext, useContext, useEffect, useState } from 'react';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import { Alert } from 'react-native';
 import { useAuth, API_URL } from './AuthContext';
+import { apiFetch } from '../config/api';
 
 const FavoritesContext = createContext();
 export const useFavorites = () => useContext(FavoritesContext);
@@ -39,7 +40,7 @@ export const FavoritesProvider = ({ children }) => {
     try {
       const controller = new AbortController();
       const timeout = setTimeout(() => controller.abort(), 8000);
-      const res = await fetch(`${API_URL}/favorites/list`, {
+      const res = await apiFetch(`${API_URL}/favorites/list`, {
         headers: { Authorization: `Bearer ${token}` },
         signal: controller.signal,
       });
@@ -87,7 +88,7 @@ export const FavoritesProvider = ({ children }) => {
   const markOnline = async (songId) => {
     if (!token) return Alert.alert('Fehler', 'Nicht angemeldet');
     try {
-      const res = await fetch(`${API_URL}/favorites/mark`, {
+      const res = await apiFetch(`${API_URL}/favorites/mark`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
         body: JSON.stringify({ song_id: songId }),
@@ -103,7 +104,7 @@ export const FavoritesProvider = ({ children }) => {
   const unmarkOnline = async (songId) => {
     if (!token) return Alert.alert('Fehler', 'Nicht angemeldet');
     try {
-      const res = await fetch(`${API_URL}/favorites/unmark`, {
+      const res = await apiFetch(`${API_URL}/favorites/unmark`, {
         method: 'DELETE',
         headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
         body: JSON.stringify({ song_id: songId }),
@@ -5,6 +5,7 @@ import * as FileSystem from 'expo-file-system/legacy';
 import * as DocumentPicker from 'expo-document-picker';
 import { Alert } from 'react-native';
 import { useAuth, API_URL } from './AuthContext';
+import { apiFetch } from '../config/api';
 
 const LibraryContext = createContext();
 export const useLibrary = () => useContext(LibraryContext);
@@ -58,7 +59,7 @@ export const LibraryProvider = ({ children }) => {
       // Use AbortController to avoid hanging fetch requests
       const controller = new AbortController();
       const timeout = setTimeout(() => controller.abort(), 8000);
-      const res = await fetch(`${API_URL}/songs/list`, {
+      const res = await apiFetch(`${API_URL}/songs/list`, {
         headers: { Authorization: `Bearer ${token}` },
         signal: controller.signal,
       });
@@ -119,7 +120,7 @@ export const LibraryProvider = ({ children }) => {
       const timeout = setTimeout(() => controller.abort(), 15000);
 
       console.log('uploadOnlineFile', { API_URL, uri, name, mimeType, token: !!token });
-      const res = await fetch(`${API_URL}/songs/upload`, {
+      const res = await apiFetch(`${API_URL}/songs/upload`, {
         method: 'POST',
         headers: {
           Authorization: `Bearer ${token}`,
@@ -195,7 +196,7 @@ export const LibraryProvider = ({ children }) => {
     try {
       const controller = new AbortController();
       const timeout = setTimeout(() => controller.abort(), 8000);
-      const res = await fetch(`${API_URL}/songs/${songId}`, {
+      const res = await apiFetch(`${API_URL}/songs/${songId}`, {
         method: 'DELETE',
         headers: { Authorization: `Bearer ${token}` },
         signal: controller.signal,
@@ -2,6 +2,7 @@ import React, { createContext, useContext, useState, useEffect } from 'react';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import { Alert } from 'react-native';
 import { useAuth, API_URL } from './AuthContext';
+import { apiFetch } from '../config/api';
 
 const PlaylistsContext = createContext();
 export const usePlaylists = () => useContext(PlaylistsContext);
@@ -39,7 +40,7 @@ export const PlaylistsProvider = ({ children }) => {
     try {
       const controller = new AbortController();
       const timeout = setTimeout(() => controller.abort(), 8000);
-      const res = await fetch(`${API_URL}/playlists/list`, {
+      const res = await apiFetch(`${API_URL}/playlists/list`, {
         headers: { Authorization: `Bearer ${token}` },
         signal: controller.signal,
       });
@@ -90,7 +91,7 @@ export const PlaylistsProvider = ({ children }) => {
   const createOnlinePlaylist = async (name, songs = []) => {
     if (!token) return Alert.alert('Fehler', 'Nicht angemeldet');
     try {
-      const res = await fetch(`${API_URL}/playlists/create`, {
+      const res = await apiFetch(`${API_URL}/playlists/create`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
         body: JSON.stringify({ name, songs }),
@@ -109,7 +110,7 @@ export const PlaylistsProvider = ({ children }) => {
     try {
       const controller = new AbortController();
       const timeout = setTimeout(() => controller.abort(), 8000);
-      const res = await fetch(`${API_URL}/playlists/${id}`, {
+      const res = await apiFetch(`${API_URL}/playlists/${id}`, {
         method: 'DELETE',
         headers: { Authorization: `Bearer ${token}` },
         signal: controller.signal,
@@ -130,7 +131,7 @@ export const PlaylistsProvider = ({ children }) => {
   const updateOnlinePlaylist = async (playlistId, updates = {}) => {
     if (!token) return Alert.alert('Fehler', 'Nicht angemeldet');
     try {
-      const res = await fetch(`${API_URL}/playlists/${playlistId}`, {
+      const res = await apiFetch(`${API_URL}/playlists/${playlistId}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
         body: JSON.stringify(updates),